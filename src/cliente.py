@@ -5,124 +5,428 @@ import time
 import json
 import threading
 from configuracao import ID_CUSTOMIZADO, PORTA_SERVIDOR
+from parser_http import ParserRespostaHTTP, RespostaVazia
+
+#Limites de reuso das conexoes persistentes, abaixo dos limites dos servidores
+#(nginx: keepalive_timeout 65 | Apache: KeepAliveTimeout 5, MaxKeepAliveRequests 100)
+TEMPO_OCIOSO_MAXIMO = 4.0
+USOS_MAXIMOS_CONEXAO = 100
+
+#Buffer de recepcao reutilizado por thread
+TAMANHO_BUFFER_RECEPCAO = 64 * 1024
+_local_thread = threading.local()
+
+
+def _buffer_recepcao():
+    buffer = getattr(_local_thread, 'buffer', None)
+    if buffer is None:
+        buffer = _local_thread.buffer = bytearray(TAMANHO_BUFFER_RECEPCAO)
+    return buffer
+
+
+#Fases de uma requisicao, na ordem; somadas dao o tempo de resposta
+FASES = ('conexao', 'envio', 'primeiro_byte', 'cabecalho', 'corpo')
+
+
+def calcular_fases(resultado, inicio_ns, conectado_ns):
+    #Converte os instantes (perf_counter_ns) registrados na troca de mensagens em duracoes:
+    #  conexao: inicio ate a conexao pronta (aquisicao no pool, se reutilizada)
+    #  envio: escrita da requisicao
+    #  primeiro_byte: fim da escrita ate o primeiro byte da resposta (processamento no servidor)
+    #  cabecalho: primeiro byte ate o fim dos cabecalhos
+    #  corpo: fim dos cabecalhos ate o fim do corpo (transferencia)
+    enviado = resultado.pop('instante_enviado')
+    primeiro_byte = resultado.pop('instante_primeiro_byte')
+    cabecalho = resultado.pop('instante_cabecalho')
+    fim = resultado.pop('instante_fim')
+    resultado['fases_ns'] = {
+        'conexao': conectado_ns - inicio_ns,
+        'envio': enviado - conectado_ns,
+        'primeiro_byte': primeiro_byte - enviado,
+        'cabecalho': cabecalho - primeiro_byte,
+        'corpo': fim - cabecalho
+    }
+    resultado['tempo_resposta_ns'] = fim - inicio_ns
+    #Mesmos intervalos em segundos, nos campos de antes
+    resultado['tempo_resposta'] = (fim - inicio_ns) / 1e9
+    resultado['tempo_conexao'] = (conectado_ns - inicio_ns) / 1e9
+    resultado['tempo_envio'] = (enviado - conectado_ns) / 1e9
+    resultado['tempo_recepcao'] = (fim - enviado) / 1e9
+    return resultado
+
+#Requisicoes ja codificadas, por (metodo, caminho, destino, modo de conexao, cabecalhos extras), compartilhadas
+#pelo ClienteHTTP e pelo ClienteHTTPAssincrono
+_cache_requisicoes = {}
+MAX_CACHE_REQUISICOES = 1024
+
+
+def montar_requisicao(metodo, caminho, host, porta, conexao, cabecalhos=None, corpo=None):
+    #Retorna a requisicao em bytes; sem corpo, o resultado fica em cache e e reutilizado
+    #Os cabecalhos recebidos nao sao alterados; conexao: 'keep-alive' ou 'close'
+    chave = None
+    if corpo is None:
+        chave = (metodo, caminho, host, porta, conexao, tuple(cabecalhos.items()) if cabecalhos else ())
+        requisicao = _cache_requisicoes.get(chave)
+        if requisicao is not None:
+            return requisicao
+    
+    #Adiciona o cabeçalho customizado obrigatório
+    todos = dict(cabecalhos) if cabecalhos else {}
+    todos['X-Custom-ID'] = ID_CUSTOMIZADO
+    todos['Host'] = f"{host}:{porta}"
+    todos['Connection'] = conexao
+    if corpo:
+        todos['Content-Length'] = str(len(corpo.encode('utf-8')))
+    
+    linhas_cabecalho = "\r\n".join([f"{chave_cab}: {valor}" for chave_cab, valor in todos.items()])
+    requisicao = f"{metodo} {caminho} HTTP/1.1\r\n{linhas_cabecalho}\r\n\r\n{corpo or ''}".encode('utf-8')
+    
+    if chave is not None:
+        if len(_cache_requisicoes) >= MAX_CACHE_REQUISICOES:
+            _cache_requisicoes.clear()
+        _cache_requisicoes[chave] = requisicao
+    return requisicao
+
+
+def resultado_falha(erro, decorrido_ns):
+    #Resultado de uma requisicao que falhou, com os mesmos campos de uma resposta (ambos os clientes)
+    return {
+        'codigo_status': 0,
+        'corpo': "",
+        'cabecalhos': {},
+        'trailers': {},
+        'tamanho_corpo': 0,
+        'bytes_fio': 0,
+        'hash_corpo': None,
+        'validacao': None,
+        'fases_ns': {},
+        'tempo_resposta_ns': decorrido_ns,
+        'tempo_resposta': decorrido_ns / 1e9,
+        'tempo_conexao': 0,
+        'tempo_envio': 0,
+        'tempo_recepcao': 0,
+        'conexao_reutilizada': False,
+        'sucesso': False,
+        'erro': str(erro) or type(erro).__name__
+    }
+
+
+class ConexaoPersistente:
+    #Socket TCP mantido aberto entre requisicoes (keep-alive)
+    def __init__(self, host, porta, timeout=10):
+        self.host = host
+        self.porta = porta
+        self.socket = socket.create_connection((host, porta), timeout=timeout)
+        self.socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.timeout = timeout
+        self.usos = 0
+        self.ultimo_uso = time.monotonic()
+    
+    def fechada_pelo_servidor(self):
+        #Espia o socket sem bloquear: b'' significa que o servidor ja enviou FIN
+        try:
+            self.socket.setblocking(False)
+            try:
+                return self.socket.recv(1, socket.MSG_PEEK) == b""
+            finally:
+                self.socket.settimeout(self.timeout)
+        except (BlockingIOError, InterruptedError):
+            return False
+        except OSError:
+            return True
+    
+    def fechar(self):
+        try:
+            self.socket.close()
+        except OSError:
+            pass
+
+
+class PoolConexoes:
+    #Mantem conexoes keep-alive ociosas por (host, porta), compartilhadas entre threads
+    def __init__(self, tempo_ocioso_maximo=TEMPO_OCIOSO_MAXIMO, usos_maximos=USOS_MAXIMOS_CONEXAO):
+        self.tempo_ocioso_maximo = tempo_ocioso_maximo
+        self.usos_maximos = usos_maximos
+        self.ociosas = {}
+        self.lock = threading.Lock()
+        
+        #Contadores para o relatorio
+        self.conexoes_abertas = 0
+        self.reutilizacoes = 0
+        self.reconexoes = 0
+    
+    def obter(self, host, porta, timeout=10):
+        #Retorna (conexao, reutilizada); descarta as expiradas ou fechadas pelo servidor
+        agora = time.monotonic()
+        while True:
+            with self.lock:
+                livres = self.ociosas.get((host, porta))
+                conexao = livres.pop() if livres else None
+            if conexao is None:
+                break
+            if agora - conexao.ultimo_uso > self.tempo_ocioso_maximo or conexao.fechada_pelo_servidor():
+                conexao.fechar()
+                continue
+            with self.lock:
+                self.reutilizacoes += 1
+            return conexao, True
+        
+        conexao = ConexaoPersistente(host, porta, timeout)
+        with self.lock:
+            self.conexoes_abertas += 1
+        return conexao, False
+    
+    def devolver(self, conexao, usos=1):
+        #Devolve a conexao ao pool, a menos que ja tenha atingido o limite de usos
+        #(usos > 1 quando varias requisicoes seguiram em pipeline na mesma conexao)
+        conexao.usos += usos
+        conexao.ultimo_uso = time.monotonic()
+        if conexao.usos >= self.usos_maximos:
+            conexao.fechar()
+            return
+        with self.lock:
+            self.ociosas.setdefault((conexao.host, conexao.porta), []).append(conexao)
+    
+    def registrar_reconexao(self):
+        with self.lock:
+            self.reconexoes += 1
+    
+    def fechar_todas(self):
+        with self.lock:
+            conexoes = [c for livres in self.ociosas.values() for c in livres]
+            self.ociosas = {}
+        for conexao in conexoes:
+            conexao.fechar()
+
 
 class ClienteHTTP:
-    def __init__(self, host_servidor, porta_servidor=PORTA_SERVIDOR):
+    def __init__(self, host_servidor, porta_servidor=PORTA_SERVIDOR, pool=None):
         self.host_servidor = host_servidor
         self.porta_servidor = porta_servidor
+        #Com pool, as conexoes sao persistentes (keep-alive); sem pool, uma conexao por requisicao
+        self.pool = pool
+        #Algum byte da resposta em curso ja chegou: a partir dai, uma conexao derrubada e falha do servidor
+        #(reset no meio da resposta), nao uma conexao ociosa fechada por ele, e a requisicao nao e reenviada
+        self.resposta_iniciada = False
+    
+    def montar_requisicao(self, metodo, caminho, cabecalhos=None, corpo=None):
+        return montar_requisicao(metodo, caminho, self.host_servidor, self.porta_servidor,
+                                 'keep-alive' if self.pool is not None else 'close', cabecalhos, corpo)
         
-    def enviar_requisicao(self, metodo='GET', caminho='/', cabecalhos=None, corpo=None):
+    def enviar_requisicao(self, metodo='GET', caminho='/', cabecalhos=None, corpo=None,
+                          descartar_corpo=False, algoritmo_hash=None, validador=None):
         #Envia uma requisição HTTP para o servidor
-        if cabecalhos is None:
-            cabecalhos = {}
-        
-        #Adiciona o cabeçalho customizado obrigatório
-        cabecalhos['X-Custom-ID'] = ID_CUSTOMIZADO
-        cabecalhos['Host'] = f"{self.host_servidor}:{self.porta_servidor}"
-        cabecalhos['Connection'] = 'close'
-        
+        #descartar_corpo: conta os bytes do corpo conforme chegam, sem guarda-lo (memoria constante)
+        #algoritmo_hash: nome para hashlib (ex. 'sha256'); calcula o resumo do corpo durante a recepcao
+        #validador: fabrica de validadores do corpo (ver ParserRespostaHTTP); o da resposta vai em 'validacao'
         try:
-            #Cria conexão
-            socket_cliente = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            socket_cliente.settimeout(10)  #Timeout de 10 segundos
-            
-            tempo_inicio = time.time()
-            socket_cliente.connect((self.host_servidor, self.porta_servidor))
-            tempo_conexao = time.time() - tempo_inicio
+            inicio_ns = time.perf_counter_ns()
+            requisicao = self.montar_requisicao(metodo, caminho, cabecalhos, corpo)
             
-            #Monta a requisição HTTP
-            linha_requisicao = f"{metodo} {caminho} HTTP/1.1\r\n"
-            linhas_cabecalho = "\r\n".join([f"{chave}: {valor}" for chave, valor in cabecalhos.items()])
-            
-            if corpo:
-                cabecalhos['Content-Length'] = str(len(corpo))
-                requisicao = f"{linha_requisicao}{linhas_cabecalho}\r\n\r\n{corpo}"
+            if self.pool is None:
+                #Cria conexão
+                socket_cliente = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+                socket_cliente.settimeout(10)  #Timeout de 10 segundos
+                socket_cliente.connect((self.host_servidor, self.porta_servidor))
+                conectado_ns = time.perf_counter_ns()
+                try:
+                    resultado = self._trocar_mensagens(socket_cliente, requisicao, metodo, descartar_corpo,
+                                                       algoritmo_hash, validador)
+                finally:
+                    socket_cliente.close()
+                resultado.pop('reutilizavel')
+                resultado['conexao_reutilizada'] = False
             else:
-                requisicao = f"{linha_requisicao}{linhas_cabecalho}\r\n\r\n"
-            
-            #Envia requisição
-            inicio_envio = time.time()
-            socket_cliente.send(requisicao.encode('utf-8'))
-            tempo_envio = time.time() - inicio_envio
-            
-            #Recebe resposta
-            inicio_recepcao = time.time()
-            dados_resposta = b""
-            while True:
-                pedaco = socket_cliente.recv(4096)
-                if not pedaco:
-                    break
-                dados_resposta += pedaco
-                
-                #Verifica se recebeu a resposta completa
-                if b"\r\n\r\n" in dados_resposta:
-                    fim_cabecalho = dados_resposta.find(b"\r\n\r\n")
-                    parte_cabecalhos = dados_resposta[:fim_cabecalho].decode('utf-8')
-                    
-                    #Verifica se tem Content-Length
-                    tamanho_conteudo = 0
-                    for linha in parte_cabecalhos.split('\r\n'):
-                        if linha.lower().startswith('content-length:'):
-                            tamanho_conteudo = int(linha.split(':')[1].strip())
-                            break
-                    
-                    if tamanho_conteudo > 0:
-                        inicio_corpo = fim_cabecalho + 4
-                        corpo_recebido = len(dados_resposta) - inicio_corpo
-                        if corpo_recebido >= tamanho_conteudo:
-                            break
-                    else:
-                        break
+                resultado, conectado_ns = self._enviar_persistente(requisicao, metodo, descartar_corpo,
+                                                                   algoritmo_hash, validador)
             
-            tempo_recepcao = time.time() - inicio_recepcao
-            tempo_total = time.time() - tempo_inicio
+            calcular_fases(resultado, inicio_ns, conectado_ns)
+            resultado['sucesso'] = True
+            return resultado
             
-            socket_cliente.close()
-            
-            #Parse da resposta
-            texto_resposta = dados_resposta.decode('utf-8')
+        except Exception as e:
+            return resultado_falha(e, time.perf_counter_ns() - inicio_ns if 'inicio_ns' in locals() else 0)
+    
+    def enviar_pipeline(self, metodo='GET', caminho='/', quantidade=1, cabecalhos=None,
+                        descartar_corpo=False, algoritmo_hash=None, validador=None):
+        #HTTP/1.1 pipelining: envia `quantidade` requisicoes seguidas numa conexao persistente e
+        #le as respostas na ordem. Retorna uma lista de resultados no formato de enviar_requisicao;
+        #o tempo de resposta e as fases de cada uma contam a partir do inicio do lote em que ela seguiu
+        if self.pool is None:
+            raise ValueError("Pipelining exige conexoes persistentes (ClienteHTTP com pool)")
+        requisicao = self.montar_requisicao(metodo, caminho, cabecalhos)
+        resultados = []
+        pode_reconectar = True
+        while len(resultados) < quantidade:
+            inicio_ns = time.perf_counter_ns()
+            recebidas = 0
+            reutilizavel = False
+            sobra = b""
+            self.resposta_iniciada = False
+            try:
+                conexao, reutilizada = self.pool.obter(self.host_servidor, self.porta_servidor)
+            except Exception as e:
+                resultados.extend(resultado_falha(e, time.perf_counter_ns() - inicio_ns)
+                                  for _ in range(quantidade - len(resultados)))
+                break
+            conectado_ns = time.perf_counter_ns()
             
-            #Dicionário de cabeçalhos
-            cabecalhos = {}
+            #Nao envia mais requisicoes do que a conexao ainda pode atender antes de ser descartada
+            lote = min(quantidade - len(resultados), max(self.pool.usos_maximos - conexao.usos, 1))
+            try:
+                conexao.socket.sendall(requisicao * lote)
+                enviado_ns = time.perf_counter_ns()
+                reutilizavel = True
+                while recebidas < lote and reutilizavel:
+                    self.resposta_iniciada = False
+                    resultado = self._receber_resposta(conexao.socket, metodo, descartar_corpo, algoritmo_hash,
+                                                       validador, sobra)
+                    sobra = resultado.pop('sobra')
+                    reutilizavel = resultado.pop('reutilizavel')
+                    resultado['instante_enviado'] = enviado_ns
+                    calcular_fases(resultado, inicio_ns, conectado_ns)
+                    resultado['conexao_reutilizada'] = reutilizada or recebidas > 0
+                    resultado['sucesso'] = True
+                    resultados.append(resultado)
+                    recebidas += 1
+            except ConnectionError as e:
+                #Conexao fechada no meio do lote: as requisicoes sem resposta sao reenviadas numa
+                #nova conexao (GET e idempotente); sem nenhuma resposta, so reconecta uma vez
+                conexao.fechar()
+                if recebidas:
+                    pode_reconectar = True
+                    continue
+                if reutilizada and not self.resposta_iniciada and pode_reconectar:
+                    pode_reconectar = False
+                    self.pool.registrar_reconexao()
+                    continue
+                resultados.extend(resultado_falha(e, time.perf_counter_ns() - inicio_ns)
+                                  for _ in range(quantidade - len(resultados)))
+                break
+            except Exception as e:
+                conexao.fechar()
+                resultados.extend(resultado_falha(e, time.perf_counter_ns() - inicio_ns)
+                                  for _ in range(quantidade - len(resultados)))
+                break
             
-            if "\r\n\r\n" in texto_resposta:
-                parte_cabecalhos, parte_corpo = texto_resposta.split("\r\n\r\n", 1)
-                linhas_cabecalhos = parte_cabecalhos.split('\r\n')
-                linha_status = linhas_cabecalhos[0]
-                codigo_status = int(linha_status.split(' ')[1])
-                
-                #Parse dos cabeçalhos
-                for linha in linhas_cabecalhos[1:]:
-                    if ': ' in linha:
-                        chave, valor = linha.split(': ', 1)
-                        cabecalhos[chave] = valor
+            #Servidor pediu para fechar antes do fim do lote: o restante segue em outra conexao
+            if reutilizavel and recebidas == lote and not sobra:
+                self.pool.devolver(conexao, recebidas)
             else:
-                codigo_status = 0
-                parte_corpo = ""
-            
-            return {
-                'codigo_status': codigo_status,
-                'corpo': parte_corpo,
-                'cabecalhos': cabecalhos,
-                'tempo_resposta': tempo_total,
-                'tempo_conexao': tempo_conexao,
-                'tempo_envio': tempo_envio,
-                'tempo_recepcao': tempo_recepcao,
-                'sucesso': True
-            }
+                conexao.fechar()
+            if recebidas:
+                pode_reconectar = True
+        return resultados
+    
+    def _enviar_persistente(self, requisicao, metodo, descartar_corpo, algoritmo_hash, validador=None):
+        #Usa uma conexao do pool; se o servidor a fechou (timeout ou limite de
+        #requisicoes por conexao) antes de responder, reconecta uma unica vez
+        #Retorna (resultado, instante em que a conexao ficou pronta)
+        for tentativa in range(2):
+            conexao, reutilizada = self.pool.obter(self.host_servidor, self.porta_servidor)
+            conectado_ns = time.perf_counter_ns()
+            self.resposta_iniciada = False
+            try:
+                resultado = self._trocar_mensagens(conexao.socket, requisicao, metodo, descartar_corpo,
+                                                   algoritmo_hash, validador)
+            except ConnectionError:
+                #Inclui RespostaVazia, ConnectionResetError e BrokenPipeError
+                conexao.fechar()
+                if reutilizada and not self.resposta_iniciada and tentativa == 0:
+                    self.pool.registrar_reconexao()
+                    continue
+                raise
+            except Exception:
+                conexao.fechar()
+                raise
             
-        except Exception as e:
-            return {
-                'codigo_status': 0,
-                'corpo': "",
-                'cabecalhos': {},
-                'tempo_resposta': time.time() - tempo_inicio if 'tempo_inicio' in locals() else 0,
-                'tempo_conexao': 0,
-                'tempo_envio': 0,
-                'tempo_recepcao': 0,
-                'sucesso': False,
-                'erro': str(e)
-            }
+            if resultado.pop('reutilizavel'):
+                self.pool.devolver(conexao)
+            else:
+                conexao.fechar()
+            resultado['conexao_reutilizada'] = reutilizada
+            return resultado, conectado_ns
+    
+    def _trocar_mensagens(self, socket_cliente, requisicao, metodo='GET', descartar_corpo=False,
+                          algoritmo_hash=None, validador=None):
+        #Envia requisição
+        socket_cliente.sendall(requisicao)
+        enviado_ns = time.perf_counter_ns()
+        
+        resultado = self._receber_resposta(socket_cliente, metodo, descartar_corpo, algoritmo_hash, validador)
+        resultado['instante_enviado'] = enviado_ns
+        #Bytes alem do fim da resposta deixariam a conexao dessincronizada
+        if resultado.pop('sobra'):
+            resultado['reutilizavel'] = False
+        return resultado
+    
+    def _receber_resposta(self, socket_cliente, metodo='GET', descartar_corpo=False, algoritmo_hash=None,
+                          validador=None, pendentes=b""):
+        #Le uma resposta do socket. `pendentes` sao bytes ja recebidos depois da resposta anterior
+        #(pipelining); o que for lido alem do fim desta resposta volta em 'sobra'
+        #O buffer da thread e reaproveitado a cada recv_into; o parser copia so o que guarda
+        #Instantes (perf_counter_ns) do primeiro byte, do fim dos cabecalhos e do fim do corpo
+        primeiro_byte_ns = cabecalho_ns = None
+        parser = ParserRespostaHTTP(metodo, not descartar_corpo, algoritmo_hash, validador)
+        sobra = b""
+        if pendentes:
+            self.resposta_iniciada = True
+            primeiro_byte_ns = time.perf_counter_ns()
+            consumidos = parser.alimentar(pendentes)
+            sobra = pendentes[consumidos:]
+            if parser.cabecalho_completo:
+                cabecalho_ns = time.perf_counter_ns()
+        
+        if not parser.completa:
+            visao = memoryview(_buffer_recepcao())
+            try:
+                while not parser.completa:
+                    #Corpo com Content-Length a guardar: recebido direto no espaco final
+                    destino = parser.espaco_corpo()
+                    if destino is not None:
+                        with destino:
+                            lidos = socket_cliente.recv_into(destino)
+                        if lidos:
+                            self.resposta_iniciada = True
+                            parser.corpo_recebido(lidos)
+                            continue
+                    else:
+                        lidos = socket_cliente.recv_into(visao)
+                    if not lidos:
+                        if not parser.bytes_fio:
+                            raise RespostaVazia("Conexao encerrada pelo servidor sem resposta")
+                        #Corpo sem delimitacao termina aqui; qualquer outro caso e resposta truncada
+                        parser.finalizar()
+                        break
+                    self.resposta_iniciada = True
+                    if primeiro_byte_ns is None:
+                        primeiro_byte_ns = time.perf_counter_ns()
+                    consumidos = parser.alimentar(visao[:lidos])
+                    if cabecalho_ns is None and parser.cabecalho_completo:
+                        cabecalho_ns = time.perf_counter_ns()
+                    if consumidos < lidos:
+                        sobra = bytes(visao[consumidos:lidos])
+            finally:
+                visao.release()
+        fim_ns = time.perf_counter_ns()
+        
+        return {
+            'codigo_status': parser.codigo_status,
+            'corpo': parser.corpo.decode('utf-8', errors='replace'),
+            'cabecalhos': parser.cabecalhos,
+            'trailers': parser.trailers,
+            'tamanho_corpo': parser.tamanho_corpo,
+            'bytes_fio': parser.bytes_fio,
+            'hash_corpo': parser.hash_corpo,
+            'validacao': parser.validacao,
+            'instante_primeiro_byte': primeiro_byte_ns,
+            'instante_cabecalho': cabecalho_ns,
+            'instante_fim': fim_ns,
+            #A conexao so volta ao pool se o corpo terminou onde o framing indica
+            #e o servidor nao pediu para fechar
+            'reutilizavel': parser.reutilizavel,
+            'sobra': sobra
+        }
 
 if __name__ == "__main__":
     print("Este e o modulo cliente.py")
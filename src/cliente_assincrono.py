@@ -0,0 +1,236 @@
+#Cliente HTTP assincrono (asyncio streams) para gerar carga com milhares de conexoes
+
+import asyncio
+import time
+from configuracao import PORTA_SERVIDOR
+from parser_http import ParserRespostaHTTP, RespostaVazia
+from cliente import (calcular_fases, montar_requisicao, resultado_falha, USOS_MAXIMOS_CONEXAO,
+                     TEMPO_OCIOSO_MAXIMO)
+
+#Tamanho maximo de cada leitura do socket
+TAMANHO_LEITURA = 64 * 1024
+
+try:
+    import resource
+except ImportError:  #Windows
+    resource = None
+
+
+def ajustar_limite_descritores(minimo):
+    #Cada conexao consome um descritor; eleva o limite flexivel ate o rigido se preciso
+    if resource is None:
+        return None
+    flexivel, rigido = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if flexivel != resource.RLIM_INFINITY and flexivel < minimo:
+        novo = minimo if rigido == resource.RLIM_INFINITY else min(minimo, rigido)
+        try:
+            resource.setrlimit(resource.RLIMIT_NOFILE, (novo, rigido))
+            flexivel = novo
+        except (ValueError, OSError):
+            pass
+    return flexivel
+
+
+class ClienteHTTPAssincrono:
+    #Equivalente nao bloqueante do ClienteHTTP; cada instancia mantem no maximo uma conexao, descartada como
+    #as do PoolConexoes: depois de `usos_maximos` respostas ou ociosa por mais de `tempo_ocioso_maximo`
+    def __init__(self, host_servidor, porta_servidor=PORTA_SERVIDOR, manter_conexao=False, timeout=10,
+                 usos_maximos=USOS_MAXIMOS_CONEXAO, tempo_ocioso_maximo=TEMPO_OCIOSO_MAXIMO):
+        self.host_servidor = host_servidor
+        self.porta_servidor = porta_servidor
+        self.manter_conexao = manter_conexao
+        self.timeout = timeout
+        self.usos_maximos = usos_maximos
+        self.tempo_ocioso_maximo = tempo_ocioso_maximo
+        self.leitor = None
+        self.escritor = None
+        self.usos = 0
+        self.ultimo_uso = 0.0
+        self.resposta_iniciada = False
+        self.sobra = b""
+
+    async def enviar_requisicao(self, metodo='GET', caminho='/', cabecalhos=None,
+                                descartar_corpo=False, algoritmo_hash=None, validador=None):
+        #Envia uma requisição HTTP e devolve o mesmo dicionario do ClienteHTTP
+        #descartar_corpo, algoritmo_hash e validador funcionam como no ClienteHTTP
+        requisicao = self.montar_requisicao(metodo, caminho, cabecalhos)
+
+        inicio_ns = time.perf_counter_ns()
+        try:
+            resultado = await asyncio.wait_for(
+                self._executar(requisicao, inicio_ns, metodo, descartar_corpo, algoritmo_hash, validador),
+                self.timeout)
+            resultado['sucesso'] = True
+            return resultado
+        except Exception as e:
+            await self.fechar()
+            return resultado_falha(e, time.perf_counter_ns() - inicio_ns)
+
+    def montar_requisicao(self, metodo, caminho, cabecalhos=None):
+        return montar_requisicao(metodo, caminho, self.host_servidor, self.porta_servidor,
+                                 'keep-alive' if self.manter_conexao else 'close', cabecalhos)
+
+    async def _descartar_expirada(self):
+        #Antes de reutilizar: fecha a conexao ociosa alem do limite ou ja encerrada pelo servidor (FIN recebido),
+        #como PoolConexoes.obter, em vez de descobrir isso por uma escrita que falha
+        if self.escritor is not None and (time.monotonic() - self.ultimo_uso > self.tempo_ocioso_maximo
+                                          or self.leitor.at_eof()):
+            await self.fechar()
+
+    async def enviar_pipeline(self, metodo='GET', caminho='/', quantidade=1, cabecalhos=None,
+                              descartar_corpo=False, algoritmo_hash=None, validador=None):
+        #HTTP/1.1 pipelining na conexao desta instancia (exige manter_conexao);
+        #mesmo retorno e mesmas regras de reenvio do ClienteHTTP.enviar_pipeline
+        if not self.manter_conexao:
+            raise ValueError("Pipelining exige conexoes persistentes (manter_conexao=True)")
+        requisicao = self.montar_requisicao(metodo, caminho, cabecalhos)
+        resultados = []
+        pode_reconectar = True
+        while len(resultados) < quantidade:
+            inicio_ns = time.perf_counter_ns()
+            recebidas = 0
+            reutilizavel = False
+            await self._descartar_expirada()
+            reutilizada = self.escritor is not None
+            self.resposta_iniciada = False
+            try:
+                if not reutilizada:
+                    self.leitor, self.escritor = await asyncio.wait_for(
+                        asyncio.open_connection(self.host_servidor, self.porta_servidor), self.timeout)
+                conectado_ns = time.perf_counter_ns()
+
+                #Nao envia mais requisicoes do que a conexao ainda pode atender antes de ser descartada
+                lote = min(quantidade - len(resultados), max(self.usos_maximos - self.usos, 1))
+                self.escritor.write(requisicao * lote)
+                await self.escritor.drain()
+                enviado_ns = time.perf_counter_ns()
+                reutilizavel = True
+                while recebidas < lote and reutilizavel:
+                    self.resposta_iniciada = False
+                    resultado, reutilizavel = await asyncio.wait_for(
+                        self._receber_resposta(metodo, descartar_corpo, algoritmo_hash, validador), self.timeout)
+                    resultado['instante_enviado'] = enviado_ns
+                    calcular_fases(resultado, inicio_ns, conectado_ns)
+                    resultado['conexao_reutilizada'] = reutilizada or recebidas > 0
+                    resultado['sucesso'] = True
+                    resultados.append(resultado)
+                    recebidas += 1
+                    self.usos += 1
+                    self.ultimo_uso = time.monotonic()
+            except ConnectionError as e:
+                await self.fechar()
+                if recebidas:
+                    pode_reconectar = True
+                    continue
+                if reutilizada and not self.resposta_iniciada and pode_reconectar:
+                    pode_reconectar = False
+                    continue
+                resultados.extend(resultado_falha(e, time.perf_counter_ns() - inicio_ns)
+                                  for _ in range(quantidade - len(resultados)))
+                break
+            except Exception as e:
+                await self.fechar()
+                resultados.extend(resultado_falha(e, time.perf_counter_ns() - inicio_ns)
+                                  for _ in range(quantidade - len(resultados)))
+                break
+
+            #Servidor pediu para fechar antes do fim do lote, bytes alem da ultima resposta ou limite de usos:
+            #o restante segue em outra conexao
+            if not reutilizavel or self.sobra or self.usos >= self.usos_maximos:
+                await self.fechar()
+            if recebidas:
+                pode_reconectar = True
+        return resultados
+
+    async def _executar(self, requisicao, inicio_ns, metodo, descartar_corpo, algoritmo_hash, validador=None):
+        #Se a conexao reutilizada ja foi fechada pelo servidor, reconecta uma unica vez
+        for tentativa in range(2):
+            await self._descartar_expirada()
+            reutilizada = self.escritor is not None
+            if not reutilizada:
+                self.leitor, self.escritor = await asyncio.open_connection(self.host_servidor, self.porta_servidor)
+            conectado_ns = time.perf_counter_ns()
+
+            self.resposta_iniciada = False
+            try:
+                resultado, reutilizavel = await self._trocar_mensagens(requisicao, metodo, descartar_corpo,
+                                                                       algoritmo_hash, validador)
+            except ConnectionError:
+                await self.fechar()
+                if reutilizada and not self.resposta_iniciada and tentativa == 0:
+                    continue
+                raise
+
+            self.usos += 1
+            self.ultimo_uso = time.monotonic()
+            if not (self.manter_conexao and reutilizavel) or self.usos >= self.usos_maximos:
+                await self.fechar()
+            calcular_fases(resultado, inicio_ns, conectado_ns)
+            resultado['conexao_reutilizada'] = reutilizada
+            return resultado
+
+    async def _trocar_mensagens(self, requisicao, metodo='GET', descartar_corpo=False, algoritmo_hash=None,
+                                validador=None):
+        #Envia requisição
+        self.escritor.write(requisicao)
+        await self.escritor.drain()
+        enviado_ns = time.perf_counter_ns()
+
+        resultado, reutilizavel = await self._receber_resposta(metodo, descartar_corpo, algoritmo_hash, validador)
+        resultado['instante_enviado'] = enviado_ns
+        #Bytes alem do fim da resposta deixariam a conexao dessincronizada
+        if self.sobra:
+            reutilizavel = False
+        return resultado, reutilizavel
+
+    async def _receber_resposta(self, metodo='GET', descartar_corpo=False, algoritmo_hash=None, validador=None):
+        #Le uma resposta completa; o que vier depois dela (pipelining) fica em self.sobra
+        #Os instantes sao tomados quando a corrotina retoma, ja incluindo a espera no event loop
+        primeiro_byte_ns = cabecalho_ns = None
+        parser = ParserRespostaHTTP(metodo, not descartar_corpo, algoritmo_hash, validador)
+        bloco = self.sobra
+        self.sobra = b""
+        while True:
+            if bloco:
+                self.resposta_iniciada = True
+                if primeiro_byte_ns is None:
+                    primeiro_byte_ns = time.perf_counter_ns()
+                consumidos = parser.alimentar(bloco)
+                if cabecalho_ns is None and parser.cabecalho_completo:
+                    cabecalho_ns = time.perf_counter_ns()
+                if parser.completa:
+                    self.sobra = bloco[consumidos:]
+                    break
+            bloco = await self.leitor.read(TAMANHO_LEITURA)
+            if not bloco:
+                if not parser.bytes_fio:
+                    raise RespostaVazia("Conexao encerrada pelo servidor sem resposta")
+                #Corpo sem delimitacao termina aqui; qualquer outro caso e resposta truncada
+                parser.finalizar()
+                break
+
+        return {
+            'codigo_status': parser.codigo_status,
+            'corpo': parser.corpo.decode('utf-8', errors='replace'),
+            'cabecalhos': parser.cabecalhos,
+            'trailers': parser.trailers,
+            'tamanho_corpo': parser.tamanho_corpo,
+            'bytes_fio': parser.bytes_fio,
+            'hash_corpo': parser.hash_corpo,
+            'validacao': parser.validacao,
+            'instante_primeiro_byte': primeiro_byte_ns,
+            'instante_cabecalho': cabecalho_ns,
+            'instante_fim': time.perf_counter_ns()
+        }, parser.reutilizavel
+
+    async def fechar(self):
+        if self.escritor is not None:
+            escritor = self.escritor
+            self.leitor = self.escritor = None
+            self.usos = 0
+            self.sobra = b""
+            escritor.close()
+            try:
+                await escritor.wait_closed()
+            except (ConnectionError, OSError):
+                pass
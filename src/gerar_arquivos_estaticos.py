@@ -1,4 +1,9 @@
 import os
+import sys
+import hashlib
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from manifesto_estaticos import TAMANHO_BLOCO_MANIFESTO, ARQUIVO_MANIFESTO, salvar_manifesto
 
 #Classe para cores no terminal
 class Cores:
@@ -35,29 +40,165 @@ class Cores:
     def titulo(texto):
         return f"{Cores.CIANO}{Cores.NEGRITO}{texto}{Cores.RESET}"
 
-def gerar_arquivo(caminho, tamanho_bytes, nome):
+
+#Conteudo dos arquivos: os caracteres abaixo em sequencia, com uma quebra de linha extra a cada 80.
+#O padrao se repete a cada mmc(64, 80) = 320 caracteres (+ 4 quebras): um bloco fixo de 324 bytes, e um
+#arquivo de N caracteres sao os primeiros N + N // 80 bytes desse bloco repetido
+CARACTERES = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 \n"
+BLOCO_PADRAO = ''.join(CARACTERES[i % len(CARACTERES)] + ('\n' if i % 80 == 79 else '')
+                       for i in range(320)).encode()
+
+#Bytes por escrita (multiplo do bloco, para a fase nao mudar entre escritas) e por tarefa paralela
+TAMANHO_ESCRITA = len(BLOCO_PADRAO) * 3236      #~1 MiB
+TAMANHO_SEGMENTO = 64 * 1024 * 1024
+
+#Arquivos gerados por padrao: (nome, caracteres)
+ARQUIVOS = [
+    ('pequeno-1kb.txt', 1 * 1024),           #1 KB
+    ('pequeno-10kb.txt', 10 * 1024),         #10 KB
+    ('pequeno-50kb.txt', 50 * 1024),         #50 KB
+    ('medio-100kb.txt', 100 * 1024),         #100 KB
+    ('medio-500kb.txt', 500 * 1024),         #500 KB
+    ('medio-700kb.txt', 700 * 1024),         #700 KB
+    ('grande-1mb.txt', 1 * 1024 * 1024),     #1 MB
+    ('grande-5mb.txt', 5 * 1024 * 1024),     #5 MB
+    ('grande-7mb.txt', 7 * 1024 * 1024),     #7 MB
+    ('enorme-10mb.txt', 10 * 1024 * 1024),   #10 MB
+    ('enorme-20mb.txt', 20 * 1024 * 1024),   #20 MB
+    ('enorme-50mb.txt', 50 * 1024 * 1024),   #50 MB
+]
+
+#Incluido com --incluir-1gb
+ARQUIVO_1GB = ('enormosauro-1gb.txt', 1 * 1024 * 1024 * 1024)
+
+
+def tamanho_arquivo(tamanho_bytes):
+    #Bytes no disco de um arquivo de `tamanho_bytes` caracteres (com as quebras extras)
+    return tamanho_bytes + tamanho_bytes // 80
+
+
+def blocos_padrao(tamanho_bytes, inicio=0, fim=None, tamanho_escrita=TAMANHO_ESCRITA):
+    #Conteudo do arquivo de `tamanho_bytes` caracteres entre os bytes `inicio` e `fim` (exclusivo),
+    #em fatias de ate `tamanho_escrita` bytes (memoryview de um unico buffer: memoria limitada)
+    fim = tamanho_arquivo(tamanho_bytes) if fim is None else fim
+    repeticoes = max(1, tamanho_escrita // len(BLOCO_PADRAO))
+    largura = repeticoes * len(BLOCO_PADRAO)
+    buffer = memoryview(BLOCO_PADRAO * (repeticoes + 1))
+    fase = inicio % len(BLOCO_PADRAO)
+    posicao = inicio
+    while posicao < fim:
+        quantidade = min(largura, fim - posicao)
+        yield buffer[fase:fase + quantidade]
+        posicao += quantidade
+
+
+def sha256_padrao(tamanho_bytes):
+    resumo = hashlib.sha256()
+    for bloco in blocos_padrao(tamanho_bytes):
+        resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def sha256_arquivo(arquivo):
+    resumo = hashlib.sha256()
+    with open(arquivo, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_ESCRITA), b''):
+            resumo.update(bloco)
+    return resumo.hexdigest()
+
+
+def entrada_manifesto(tamanho_bytes, tamanho_bloco=TAMANHO_BLOCO_MANIFESTO):
+    #Tamanho, SHA-256 e SHA-256 de cada bloco calculados a partir do padrao, sem ler o disco
+    #Blocos completos que comecam na mesma fase do bloco de 324 bytes tem o mesmo conteudo: cada fase e
+    #resumida uma vez so (no maximo 81 fases para blocos de 1 MiB, mesmo no arquivo de 1 GB)
+    total = tamanho_arquivo(tamanho_bytes)
+    por_fase = {}
+    blocos = []
+    for inicio in range(0, total, tamanho_bloco):
+        fim = min(inicio + tamanho_bloco, total)
+        chave = (inicio % len(BLOCO_PADRAO), fim - inicio)
+        if chave not in por_fase:
+            resumo = hashlib.sha256()
+            for bloco in blocos_padrao(tamanho_bytes, inicio, fim):
+                resumo.update(bloco)
+            por_fase[chave] = resumo.hexdigest()
+        blocos.append(por_fase[chave])
+    return {'tamanho': total, 'sha256': sha256_padrao(tamanho_bytes), 'blocos': blocos}
+
+
+def arquivo_valido(arquivo, tamanho_bytes, sha256=None):
+    #O arquivo ja existe com o tamanho e o SHA-256 do padrao (`sha256`, se ja calculado)?
+    try:
+        if os.path.getsize(arquivo) != tamanho_arquivo(tamanho_bytes):
+            return False
+        return sha256_arquivo(arquivo) == (sha256 or sha256_padrao(tamanho_bytes))
+    except OSError:
+        return False
+
+
+def escrever_segmento(arquivo, tamanho_bytes, inicio, fim):
+    #Escreve os bytes [inicio, fim) num arquivo ja criado com o tamanho final (tarefa de um processo)
+    with open(arquivo, 'r+b') as f:
+        f.seek(inicio)
+        for bloco in blocos_padrao(tamanho_bytes, inicio, fim):
+            f.write(bloco)
+    return fim - inicio
+
+
+def gerar_arquivos(caminho, arquivos, processos=None, forcar=False):
+    #Gera varios arquivos em paralelo: cada arquivo e dividido em segmentos de TAMANHO_SEGMENTO,
+    #escritos por processos diferentes na posicao certa de um arquivo temporario, renomeado no fim
+    #(uma interrupcao nunca deixa um arquivo incompleto com o nome final)
+    #Arquivos que ja existem com o tamanho e o SHA-256 certos sao mantidos, exceto com `forcar`
+    #No fim, o manifesto (tamanho, SHA-256 e SHA-256 por bloco de cada arquivo) e gravado no mesmo diretorio
+    #Retorna (criados, mantidos)
     os.makedirs(caminho, exist_ok=True)
-    arquivo_completo = os.path.join(caminho, nome)
-    
-    #Gera conteúdo com caracteres variados
-    conteudo = ""
-    chars = "ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789 \n"
-    indice_char = 0
-    
-    for i in range(tamanho_bytes):
-        conteudo += chars[indice_char % len(chars)]
-        indice_char += 1
-        if i % 80 == 79:  #Quebra de linha a cada 80 caracteres
-            conteudo += "\n"
-    
-    with open(arquivo_completo, 'w') as f:
-        f.write(conteudo)
-    
-    tamanho_real = os.path.getsize(arquivo_completo)
-    print(Cores.sucesso(f"Criado: {nome} ({tamanho_real:,} bytes)"))
+    with ProcessPoolExecutor(max_workers=processos or os.cpu_count()) as executor:
+        entradas = dict(zip([nome for nome, _ in arquivos],
+                            executor.map(entrada_manifesto, [tamanho for _, tamanho in arquivos])))
+        if forcar:
+            pendentes = list(arquivos)
+        else:
+            validos = executor.map(arquivo_valido, [os.path.join(caminho, nome) for nome, _ in arquivos],
+                                   [tamanho for _, tamanho in arquivos],
+                                   [entradas[nome]['sha256'] for nome, _ in arquivos])
+            pendentes = []
+            for (nome, tamanho), valido in zip(arquivos, validos):
+                if valido:
+                    print(Cores.info(f"Mantido: {nome} ({tamanho_arquivo(tamanho):,} bytes, SHA-256 conferido)"))
+                else:
+                    pendentes.append((nome, tamanho))
+        
+        tarefas = {}
+        for nome, tamanho in pendentes:
+            temporario = os.path.join(caminho, f".{nome}.parcial")
+            total = tamanho_arquivo(tamanho)
+            with open(temporario, 'wb') as f:
+                f.truncate(total)
+            tarefas[nome] = [executor.submit(escrever_segmento, temporario, tamanho, inicio,
+                                             min(inicio + TAMANHO_SEGMENTO, total))
+                             for inicio in range(0, total, TAMANHO_SEGMENTO)]
+        for nome, tamanho in pendentes:
+            for futuro in tarefas[nome]:
+                futuro.result()
+            arquivo_completo = os.path.join(caminho, nome)
+            os.replace(os.path.join(caminho, f".{nome}.parcial"), arquivo_completo)
+            print(Cores.sucesso(f"Criado: {nome} ({os.path.getsize(arquivo_completo):,} bytes)"))
+    salvar_manifesto(caminho, entradas)
+    print(Cores.info(f"Manifesto: {os.path.join(caminho, ARQUIVO_MANIFESTO)} ({len(entradas)} arquivos)"))
+    return len(pendentes), len(arquivos) - len(pendentes)
 
 
 def principal():
+    parser = argparse.ArgumentParser(description='Gera os arquivos estaticos de teste')
+    parser.add_argument('--diretorio', default='arquivos_estaticos', help='Destino (padrao: arquivos_estaticos)')
+    parser.add_argument('--processos', type=int, help='Processos de escrita (padrao: um por nucleo)')
+    parser.add_argument('--forcar', action='store_true', help='Recria mesmo os arquivos ja corretos')
+    parser.add_argument('--incluir-1gb', action='store_true', help=f"Gera tambem {ARQUIVO_1GB[0]}")
+    args = parser.parse_args()
+    if args.processos is not None and args.processos < 1:
+        parser.error("--processos deve ser positivo")
+    
     print("=" * 70)
     print("Gerador de Arquivos Estáticos de Teste")
     print("Trabalho de Redes II - 2025.2")
@@ -65,36 +206,23 @@ def principal():
     print()
     
     #Diretório onde os arquivos serão criados
-    diretorio_estatico = 'arquivos_estaticos'
-    
-    #Gerar arquivos de diferentes tamanhos
-    arquivos = [
-        ('pequeno-1kb.txt', 1 * 1024),           #1 KB
-        ('pequeno-10kb.txt', 10 * 1024),         #10 KB
-        ('pequeno-50kb.txt', 50 * 1024),         #50 KB
-        ('medio-100kb.txt', 100 * 1024),         #100 KB
-        ('medio-500kb.txt', 500 * 1024),         #500 KB
-        ('medio-700kb.txt', 700 * 1024),         #700 KB
-        ('grande-1mb.txt', 1 * 1024 * 1024),     #1 MB
-        ('grande-5mb.txt', 5 * 1024 * 1024),     #5 MB
-        ('grande-7mb.txt', 7 * 1024 * 1024),     #7 MB
-        ('enorme-10mb.txt', 10 * 1024 * 1024),   #10 MB
-        ('enorme-20mb.txt', 20 * 1024 * 1024),   #20 MB
-        ('enorme-50mb.txt', 50 * 1024 * 1024),   #50 MB
-        # ('enormosauro-1gb.txt', 1 * 1024 * 1024 * 1024)  #1 GB
-    ]
+    diretorio_estatico = args.diretorio
+    arquivos = ARQUIVOS + [ARQUIVO_1GB] if args.incluir_1gb else ARQUIVOS
     
     print(f"Criando arquivos em: {diretorio_estatico}/\n")
     
-    for nome, tamanho in arquivos:
-        gerar_arquivo(diretorio_estatico, tamanho, nome)
+    try:
+        criados, mantidos = gerar_arquivos(diretorio_estatico, arquivos, args.processos, args.forcar)
+    except OSError as e:
+        print(Cores.erro(f"Falha ao gerar arquivos: {e}"))
+        sys.exit(1)
     
     print()
     print("=" * 70)
     print(Cores.sucesso("Todos os arquivos foram criados com sucesso!"))
     print("=" * 70)
     print()
-    print(f"Total de arquivos: {len(arquivos)}")
+    print(f"Total de arquivos: {len(arquivos)} ({criados} criados, {mantidos} ja existentes)")
     print(f"Tamanho total aproximado: {sum([t for _, t in arquivos]) / (1024 * 1024):.2f} MB")
     print()
 
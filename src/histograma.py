@@ -0,0 +1,162 @@
+#Histograma de latencia com memoria constante (buckets logaritmicos no estilo HdrHistogram)
+
+import base64
+import math
+import struct
+import zlib
+from array import array
+
+#Cabecalho da serializacao: assinatura, versao, digitos, maior valor, total, minimo, maximo, soma, soma dos quadrados
+FORMATO_CABECALHO = '<4sBBQQQQdd'
+ASSINATURA = b'HLAT'
+VERSAO = 1
+
+#Percentis reportados por padrao
+PERCENTIS_PADRAO = (50, 90, 95, 99, 99.9, 99.99)
+
+
+class HistogramaLatencia:
+    #Registra valores inteiros (microssegundos) com precisao relativa de `digitos_significativos`
+    #A memoria depende apenas da faixa e da precisao, nunca do numero de amostras
+    #Nao e thread-safe: use uma instancia por thread/processo e una com mesclar()
+    def __init__(self, digitos_significativos=3, maior_valor=3600 * 1000 * 1000):
+        if not 1 <= digitos_significativos <= 5:
+            raise ValueError("digitos_significativos deve estar entre 1 e 5")
+        if maior_valor < 2:
+            raise ValueError("maior_valor deve ser pelo menos 2")
+        self.digitos_significativos = digitos_significativos
+        self.maior_valor = maior_valor
+
+        #Cada bucket cobre uma potencia de 2; dentro dele, sub-buckets lineares garantem a precisao
+        maior_unidade = 2 * 10 ** digitos_significativos
+        magnitude = int(math.ceil(math.log2(maior_unidade)))
+        self.magnitude_meio = magnitude - 1
+        self.sub_buckets = 1 << magnitude
+        self.meio_sub_buckets = self.sub_buckets >> 1
+        self.mascara_sub_bucket = self.sub_buckets - 1
+
+        limite = self.sub_buckets
+        num_buckets = 1
+        while limite <= maior_valor:
+            limite <<= 1
+            num_buckets += 1
+        self.num_buckets = num_buckets
+        self.contagens = array('Q', bytes(8 * (num_buckets + 1) * self.meio_sub_buckets))
+
+        self.total = 0
+        self.minimo = 0
+        self.maximo = 0
+        self.soma = 0.0
+        self.soma_quadrados = 0.0
+
+    def _indice(self, valor):
+        indice_bucket = (valor | self.mascara_sub_bucket).bit_length() - (self.magnitude_meio + 1)
+        indice_sub_bucket = valor >> indice_bucket
+        return ((indice_bucket + 1) << self.magnitude_meio) + (indice_sub_bucket - self.meio_sub_buckets)
+
+    def _valor_do_indice(self, indice):
+        #Maior valor equivalente ao bucket (o mesmo criterio do HdrHistogram para percentis)
+        indice_bucket = (indice >> self.magnitude_meio) - 1
+        indice_sub_bucket = (indice & (self.meio_sub_buckets - 1)) + self.meio_sub_buckets
+        if indice_bucket < 0:
+            indice_sub_bucket -= self.meio_sub_buckets
+            indice_bucket = 0
+        return ((indice_sub_bucket + 1) << indice_bucket) - 1
+
+    def registrar(self, valor, contagem=1):
+        #Valores fora da faixa sao saturados em [0, maior_valor]
+        valor = min(max(int(valor), 0), self.maior_valor)
+        self.contagens[self._indice(valor)] += contagem
+        if self.total == 0 or valor < self.minimo:
+            self.minimo = valor
+        if valor > self.maximo:
+            self.maximo = valor
+        self.total += contagem
+        self.soma += valor * contagem
+        self.soma_quadrados += valor * valor * contagem
+
+    def mesclar(self, outro):
+        if (outro.digitos_significativos, outro.maior_valor) != (self.digitos_significativos, self.maior_valor):
+            raise ValueError("Histogramas com configuracoes diferentes nao podem ser mesclados")
+        if outro.total == 0:
+            return self
+        contagens = self.contagens
+        for indice, contagem in enumerate(outro.contagens):
+            if contagem:
+                contagens[indice] += contagem
+        self.minimo = outro.minimo if self.total == 0 else min(self.minimo, outro.minimo)
+        self.maximo = max(self.maximo, outro.maximo)
+        self.total += outro.total
+        self.soma += outro.soma
+        self.soma_quadrados += outro.soma_quadrados
+        return self
+
+    def media(self):
+        return self.soma / self.total if self.total else 0.0
+
+    def desvio_padrao(self):
+        #Desvio padrao amostral (n - 1), como statistics.stdev
+        if self.total < 2:
+            return 0.0
+        variancia = (self.soma_quadrados - self.soma * self.soma / self.total) / (self.total - 1)
+        return math.sqrt(max(variancia, 0.0))
+
+    def percentis(self, percentis=PERCENTIS_PADRAO):
+        #Calcula varios percentis numa unica passada pelos buckets; retorna {percentil: valor}
+        resultado = {}
+        if self.total == 0:
+            return {p: 0 for p in percentis}
+        alvos = sorted((max(1, math.ceil(p / 100.0 * self.total)), p) for p in percentis)
+        posicao = 0
+        acumulado = 0
+        for indice, contagem in enumerate(self.contagens):
+            if not contagem:
+                continue
+            acumulado += contagem
+            while posicao < len(alvos) and acumulado >= alvos[posicao][0]:
+                resultado[alvos[posicao][1]] = min(self._valor_do_indice(indice), self.maximo)
+                posicao += 1
+            if posicao == len(alvos):
+                break
+        return resultado
+
+    def percentil(self, percentil):
+        return self.percentis((percentil,))[percentil]
+
+    def para_bytes(self):
+        cabecalho = struct.pack(FORMATO_CABECALHO, ASSINATURA, VERSAO, self.digitos_significativos,
+                                self.maior_valor, self.total, self.minimo, self.maximo,
+                                self.soma, self.soma_quadrados)
+        return cabecalho + zlib.compress(self.contagens.tobytes())
+
+    @classmethod
+    def de_bytes(cls, dados):
+        tamanho = struct.calcsize(FORMATO_CABECALHO)
+        assinatura, versao, digitos, maior_valor, total, minimo, maximo, soma, soma_quadrados = \
+            struct.unpack(FORMATO_CABECALHO, dados[:tamanho])
+        if assinatura != ASSINATURA or versao != VERSAO:
+            raise ValueError("Dados nao sao um histograma de latencia valido")
+        histograma = cls(digitos, maior_valor)
+        contagens = array('Q')
+        contagens.frombytes(zlib.decompress(dados[tamanho:]))
+        if len(contagens) != len(histograma.contagens):
+            raise ValueError("Tamanho das contagens nao corresponde a configuracao")
+        histograma.contagens = contagens
+        histograma.total = total
+        histograma.minimo = minimo
+        histograma.maximo = maximo
+        histograma.soma = soma
+        histograma.soma_quadrados = soma_quadrados
+        return histograma
+
+    def codificar(self):
+        #Texto base64, adequado para CSV/JSON
+        return base64.b64encode(self.para_bytes()).decode('ascii')
+
+    @classmethod
+    def decodificar(cls, texto):
+        return cls.de_bytes(base64.b64decode(texto))
+
+    def __reduce__(self):
+        #Envio entre processos (multiprocessing) usa a forma compactada
+        return (HistogramaLatencia.de_bytes, (self.para_bytes(),))
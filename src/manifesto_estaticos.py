@@ -0,0 +1,205 @@
+#Manifesto dos arquivos estaticos (tamanho, SHA-256 do arquivo e de cada bloco) e validacao do corpo
+#recebido contra o conteudo esperado durante a propria recepcao, pedaco a pedaco
+
+import os
+import json
+import mmap
+import hashlib
+
+ARQUIVO_MANIFESTO = 'manifesto.json'
+VERSAO_MANIFESTO = 1
+ALGORITMO_MANIFESTO = 'sha256'
+TAMANHO_BLOCO_MANIFESTO = 1024 * 1024
+
+#Classificacao de um corpo completo pelo framing, mas diferente do esperado (None: identico)
+CORPO_CURTO = 'curta'            #prefixo correto do arquivo, com menos bytes
+CORPO_CORROMPIDO = 'corrompida'  #algum byte diferente, ou bytes alem do fim do arquivo
+
+
+class ErroManifesto(ValueError):
+    #Manifesto ilegivel ou em formato nao suportado
+    pass
+
+
+def resumo_blocos(pedacos, tamanho_bloco=TAMANHO_BLOCO_MANIFESTO):
+    #SHA-256 do conteudo inteiro e de cada bloco de `tamanho_bloco` bytes, a partir de pedacos de qualquer tamanho
+    #Retorna (tamanho, sha256, [sha256 de cada bloco])
+    total = hashlib.new(ALGORITMO_MANIFESTO)
+    bloco = hashlib.new(ALGORITMO_MANIFESTO)
+    no_bloco = 0
+    tamanho = 0
+    blocos = []
+    for pedaco in pedacos:
+        total.update(pedaco)
+        tamanho += len(pedaco)
+        with memoryview(pedaco) as visao:
+            while len(visao):
+                parte = visao[:tamanho_bloco - no_bloco]
+                bloco.update(parte)
+                no_bloco += len(parte)
+                visao = visao[len(parte):]
+                if no_bloco == tamanho_bloco:
+                    blocos.append(bloco.hexdigest())
+                    bloco = hashlib.new(ALGORITMO_MANIFESTO)
+                    no_bloco = 0
+    if no_bloco:
+        blocos.append(bloco.hexdigest())
+    return tamanho, total.hexdigest(), blocos
+
+
+def resumo_arquivo(arquivo, tamanho_bloco=TAMANHO_BLOCO_MANIFESTO):
+    with open(arquivo, 'rb') as f:
+        return resumo_blocos(iter(lambda: f.read(tamanho_bloco), b''), tamanho_bloco)
+
+
+def ler_manifesto(diretorio):
+    #Manifesto do diretorio, ou None se nao existir
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    try:
+        with open(caminho, encoding='utf-8') as f:
+            manifesto = json.load(f)
+    except FileNotFoundError:
+        return None
+    except (OSError, ValueError) as e:
+        raise ErroManifesto(f"{caminho}: {e}")
+    if (not isinstance(manifesto, dict) or manifesto.get('versao') != VERSAO_MANIFESTO
+            or manifesto.get('algoritmo') != ALGORITMO_MANIFESTO or not isinstance(manifesto.get('arquivos'), dict)):
+        raise ErroManifesto(f"{caminho}: formato nao suportado")
+    return manifesto
+
+
+def salvar_manifesto(diretorio, entradas, tamanho_bloco=TAMANHO_BLOCO_MANIFESTO):
+    #Grava (ou atualiza) o manifesto com `entradas` {nome: {'tamanho', 'sha256', 'blocos'}}; entradas ja existentes
+    #de outros arquivos sao mantidas enquanto o arquivo existir com o mesmo tamanho (ex.: o de 1 GB gerado antes)
+    try:
+        anterior = ler_manifesto(diretorio)
+    except ErroManifesto:
+        anterior = None
+    arquivos = {}
+    if anterior is not None and anterior.get('tamanho_bloco') == tamanho_bloco:
+        for nome, entrada in anterior['arquivos'].items():
+            try:
+                if os.path.getsize(os.path.join(diretorio, nome)) == entrada['tamanho']:
+                    arquivos[nome] = entrada
+            except (OSError, KeyError, TypeError):
+                pass
+    arquivos.update(entradas)
+    manifesto = {
+        'versao': VERSAO_MANIFESTO,
+        'algoritmo': ALGORITMO_MANIFESTO,
+        'tamanho_bloco': tamanho_bloco,
+        'arquivos': dict(sorted(arquivos.items()))
+    }
+    caminho = os.path.join(diretorio, ARQUIVO_MANIFESTO)
+    temporario = os.path.join(diretorio, f".{ARQUIVO_MANIFESTO}.parcial")
+    with open(temporario, 'w', encoding='utf-8') as f:
+        json.dump(manifesto, f, indent=1)
+        f.write('\n')
+    os.replace(temporario, caminho)
+    return caminho
+
+
+class ReferenciaEstatica:
+    #Conteudo esperado de um arquivo estatico: o arquivo de origem mapeado em memoria (somente leitura,
+    #compartilhado pelas threads e herdado pelos processos trabalhadores) ou, sem ele, os SHA-256 dos blocos
+    #do manifesto. validador() cria o objeto alimentado pelo parser com o corpo de uma resposta
+    def __init__(self, tamanho, mapa=None, blocos=None, tamanho_bloco=TAMANHO_BLOCO_MANIFESTO, origem=''):
+        self.tamanho = tamanho
+        self.mapa = mapa
+        self.blocos = blocos
+        self.tamanho_bloco = tamanho_bloco
+        self.origem = origem
+
+    @classmethod
+    def carregar(cls, diretorio, nome, manifesto=None):
+        #Referencia de `nome` em `diretorio`, conferindo o arquivo com o manifesto (se houver); arquivo
+        #diferente do manifesto e descartado, porque o servidor serviria o conteudo errado como se fosse o certo
+        #Retorna (referencia ou None, aviso ou None)
+        entrada = manifesto['arquivos'].get(nome) if manifesto is not None else None
+        tamanho_bloco = manifesto['tamanho_bloco'] if manifesto is not None else TAMANHO_BLOCO_MANIFESTO
+        arquivo = os.path.join(diretorio, nome)
+        aviso = None
+        if os.path.isfile(arquivo):
+            if entrada is None:
+                if manifesto is not None:
+                    aviso = f"{nome} nao consta do manifesto; comparando com o arquivo de origem sem conferi-lo"
+                return cls._mapear(arquivo, os.path.getsize(arquivo), tamanho_bloco, 'arquivo'), aviso
+            tamanho, _, blocos = resumo_arquivo(arquivo, tamanho_bloco)
+            if tamanho == entrada['tamanho'] and blocos == entrada['blocos']:
+                return cls._mapear(arquivo, tamanho, tamanho_bloco, 'arquivo+manifesto'), None
+            aviso = f"{nome} no disco difere do manifesto; validando pelos blocos do manifesto"
+        if entrada is None:
+            return None, f"{nome} nao encontrado em {diretorio} nem no manifesto; integridade nao verificada"
+        return cls(entrada['tamanho'], blocos=entrada['blocos'], tamanho_bloco=tamanho_bloco,
+                   origem='manifesto'), aviso
+
+    @classmethod
+    def _mapear(cls, arquivo, tamanho, tamanho_bloco, origem):
+        if not tamanho:
+            #mmap nao aceita arquivo vazio
+            return cls(0, mapa=b'', tamanho_bloco=tamanho_bloco, origem=origem)
+        with open(arquivo, 'rb') as f:
+            mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        return cls(tamanho, mapa=mapa, tamanho_bloco=tamanho_bloco, origem=origem)
+
+    def validador(self):
+        return ValidadorCorpo(self)
+
+    def fechar(self):
+        if isinstance(self.mapa, mmap.mmap):
+            self.mapa.close()
+        self.mapa = None
+
+
+class ValidadorCorpo:
+    #Recebe os pedacos do corpo em ordem (atualizar) e compara cada um com a mesma faixa da referencia;
+    #a primeira divergencia encerra a comparacao. concluir() classifica o corpo inteiro
+    def __init__(self, referencia):
+        self.referencia = referencia
+        self.posicao = 0
+        self.corrompido = False
+        self.resumo = None
+        self.no_bloco = 0
+
+    def atualizar(self, pedaco):
+        quantidade = len(pedaco)
+        fim = self.posicao + quantidade
+        if self.corrompido:
+            self.posicao = fim
+            return
+        referencia = self.referencia
+        if fim > referencia.tamanho:
+            self.corrompido = True
+        elif referencia.mapa is not None:
+            #find numa janela do tamanho exato do pedaco: comparacao direta com o mapa, sem copia
+            self.corrompido = referencia.mapa.find(pedaco, self.posicao, fim) != self.posicao
+        else:
+            self._conferir_blocos(pedaco)
+        self.posicao = fim
+
+    def _conferir_blocos(self, pedaco):
+        #Sem o arquivo de origem: SHA-256 de cada bloco conferido assim que o bloco termina
+        referencia = self.referencia
+        with memoryview(pedaco) as visao:
+            while len(visao) and not self.corrompido:
+                if self.resumo is None:
+                    self.resumo = hashlib.new(ALGORITMO_MANIFESTO)
+                indice = (self.posicao + len(pedaco) - len(visao)) // referencia.tamanho_bloco
+                limite = min(referencia.tamanho_bloco, referencia.tamanho - indice * referencia.tamanho_bloco)
+                parte = visao[:limite - self.no_bloco]
+                self.resumo.update(parte)
+                self.no_bloco += len(parte)
+                visao = visao[len(parte):]
+                if self.no_bloco == limite:
+                    self.corrompido = self.resumo.hexdigest() != referencia.blocos[indice]
+                    self.resumo = None
+                    self.no_bloco = 0
+
+    def concluir(self):
+        #None se o corpo e identico a referencia; CORPO_CURTO ou CORPO_CORROMPIDO caso contrario
+        #(no modo por blocos, o ultimo bloco incompleto de um corpo curto nao tem como ser conferido)
+        if self.corrompido:
+            return CORPO_CORROMPIDO
+        if self.posicao < self.referencia.tamanho:
+            return CORPO_CURTO
+        return None
@@ -0,0 +1,283 @@
+#Parser incremental de respostas HTTP/1.1 (maquina de estados alimentada por blocos de bytes)
+
+import hashlib
+
+#Limites do bloco de cabecalhos e de cada linha de tamanho de chunk/trailer
+TAMANHO_MAXIMO_CABECALHO = 64 * 1024
+TAMANHO_MAXIMO_LINHA = 8 * 1024
+
+#Maior pre-alocacao do corpo pelo Content-Length anunciado; alem disso o corpo cresce conforme chega
+#(um cabecalho falso ou um arquivo de 1 GB em cada thread nao aloca tudo antes do primeiro byte)
+PREALOCACAO_MAXIMA_CORPO = 4 * 1024 * 1024
+
+#Quantidade copiada por vez do bloco recebido ao procurar o fim dos cabecalhos
+JANELA_CABECALHO = 4096
+
+#Estados do parser
+CABECALHO = 0
+CORPO_TAMANHO = 1      #Delimitado por Content-Length
+CORPO_ATE_FECHAR = 2   #Sem delimitacao: termina quando o servidor fecha a conexao
+CHUNK_TAMANHO = 3
+CHUNK_DADOS = 4
+CHUNK_FIM = 5
+TRAILER = 6
+COMPLETA = 7
+
+
+class ErroProtocoloHTTP(ValueError):
+    #Resposta que nao segue o formato HTTP/1.1
+    pass
+
+
+class RespostaIncompleta(ErroProtocoloHTTP):
+    #Conexao encerrada antes do fim da resposta (cabecalhos ou corpo truncados)
+    pass
+
+
+class RespostaVazia(ConnectionError):
+    #Servidor fechou a conexao sem enviar nenhum byte de resposta
+    pass
+
+
+class ParserRespostaHTTP:
+    #Recebe a resposta em blocos de qualquer tamanho via alimentar() e acompanha:
+    #  - linha de status, cabecalhos e trailers
+    #  - corpo delimitado por Content-Length, chunked ou pelo fechamento da conexao;
+    #    HEAD, 1xx, 204 e 304 nao tem corpo
+    #  - bytes no fio (status, cabecalhos, framing dos chunks) e bytes do corpo decodificado
+    #Respostas informativas (100 Continue) sao puladas e contadas em `informativas`
+    #validador: fabrica de um objeto com atualizar(pedaco), alimentado com cada pedaco do corpo decodificado
+    #(ex.: ReferenciaEstatica.validador, que compara o corpo com o arquivo de origem); fica em `validacao`
+    def __init__(self, metodo='GET', guardar_corpo=True, algoritmo_hash=None, validador=None):
+        self.metodo = metodo.upper()
+        self.guardar_corpo = guardar_corpo
+        self.resumo = hashlib.new(algoritmo_hash) if algoritmo_hash else None
+        self.validacao = validador() if validador else None
+
+        self.estado = CABECALHO
+        self.pendente = bytearray()  #Cabecalho ou linha de chunk/trailer ainda incompletos
+        self.restante = 0            #Bytes que faltam no corpo ou no chunk atual
+        self.ate_fechar = False
+
+        self.versao = ''
+        self.codigo_status = 0
+        self.motivo = ''
+        self.cabecalhos = {}
+        self.trailers = {}
+        self.conexao = ''
+        self.informativas = 0
+
+        self.corpo = bytearray()
+        self.tamanho_corpo = 0
+        self.bytes_cabecalho = 0
+        self.bytes_fio = 0
+
+    @property
+    def completa(self):
+        return self.estado == COMPLETA
+
+    @property
+    def cabecalho_completo(self):
+        return self.estado != CABECALHO
+
+    @property
+    def reutilizavel(self):
+        #A conexao pode seguir para a proxima requisicao: corpo delimitado e keep-alive
+        opcoes = {opcao.strip() for opcao in self.conexao.split(',')}
+        return (self.completa and not self.ate_fechar and self.codigo_status != 101 and 'close' not in opcoes
+                and (self.versao == 'HTTP/1.1' or 'keep-alive' in opcoes))
+
+    @property
+    def hash_corpo(self):
+        return self.resumo.hexdigest() if self.resumo is not None else None
+
+    def alimentar(self, dados):
+        #Processa um bloco e retorna quantos bytes dele pertencem a esta resposta; o que vier
+        #depois do fim (a proxima resposta, em pipelining) nao e consumido
+        visao = dados if isinstance(dados, memoryview) else memoryview(dados)
+        tamanho = len(visao)
+        posicao = 0
+        while posicao < tamanho and self.estado != COMPLETA:
+            estado = self.estado
+            if estado == CORPO_TAMANHO or estado == CHUNK_DADOS:
+                fim = min(posicao + self.restante, tamanho)
+                self._entregar(visao[posicao:fim])
+                self.restante -= fim - posicao
+                posicao = fim
+                if not self.restante:
+                    self.estado = COMPLETA if estado == CORPO_TAMANHO else CHUNK_FIM
+            elif estado == CORPO_ATE_FECHAR:
+                self._entregar(visao[posicao:])
+                posicao = tamanho
+            elif estado == CABECALHO:
+                posicao = self._ler_cabecalho(visao, posicao)
+            else:
+                posicao, linha = self._ler_linha(visao, posicao)
+                if linha is not None:
+                    self._processar_linha(linha)
+        self.bytes_fio += posicao
+        return posicao
+
+    def espaco_corpo(self):
+        #Parte ainda vazia do corpo pre-alocado (Content-Length), para receber com recv_into
+        #sem copia intermediaria; depois, informe os bytes escritos com corpo_recebido()
+        #Cheio o trecho alocado, cresce mais ate PREALOCACAO_MAXIMA_CORPO (nunca alem do anunciado)
+        if self.estado == CORPO_TAMANHO and self.guardar_corpo:
+            if len(self.corpo) == self.tamanho_corpo:
+                self.corpo += bytes(min(self.restante, PREALOCACAO_MAXIMA_CORPO))
+            return memoryview(self.corpo)[self.tamanho_corpo:]
+        return None
+
+    def corpo_recebido(self, quantidade):
+        if self.resumo is not None or self.validacao is not None:
+            with memoryview(self.corpo) as visao:
+                pedaco = visao[self.tamanho_corpo:self.tamanho_corpo + quantidade]
+                if self.resumo is not None:
+                    self.resumo.update(pedaco)
+                if self.validacao is not None:
+                    self.validacao.atualizar(pedaco)
+        self.tamanho_corpo += quantidade
+        self.bytes_fio += quantidade
+        self.restante -= quantidade
+        if not self.restante:
+            self.estado = COMPLETA
+
+    def finalizar(self):
+        #Chamado quando o servidor fecha a conexao; so completa corpos delimitados pelo fechamento
+        if self.estado == CORPO_ATE_FECHAR:
+            self.estado = COMPLETA
+        elif self.estado == CABECALHO:
+            raise RespostaIncompleta("Conexao encerrada antes do fim dos cabecalhos")
+        elif self.estado == CORPO_TAMANHO:
+            if self.guardar_corpo:
+                del self.corpo[self.tamanho_corpo:]
+            raise RespostaIncompleta(f"Corpo truncado: {self.tamanho_corpo} de "
+                                     f"{self.tamanho_corpo + self.restante} bytes")
+        elif self.estado != COMPLETA:
+            raise RespostaIncompleta(f"Conexao encerrada no meio do corpo chunked "
+                                     f"({self.tamanho_corpo} bytes recebidos)")
+
+    def _entregar(self, pedaco):
+        if self.resumo is not None:
+            self.resumo.update(pedaco)
+        if self.validacao is not None:
+            self.validacao.atualizar(pedaco)
+        if self.guardar_corpo:
+            if self.estado == CORPO_TAMANHO:
+                #Sobrescreve a parte pre-alocada e, alem dela, acrescenta ao fim
+                self.corpo[self.tamanho_corpo:self.tamanho_corpo + len(pedaco)] = pedaco
+            else:
+                self.corpo += pedaco
+        self.tamanho_corpo += len(pedaco)
+
+    def _ler_cabecalho(self, visao, posicao):
+        #Acumula ate o fim do bloco de cabecalhos, procurando apenas nos bytes novos
+        tamanho = len(visao)
+        while posicao < tamanho:
+            inicio_busca = max(0, len(self.pendente) - 3)
+            janela = visao[posicao:posicao + JANELA_CABECALHO]
+            self.pendente += janela
+            fim = self.pendente.find(b"\r\n\r\n", inicio_busca)
+            if fim >= 0:
+                posicao += len(janela) - (len(self.pendente) - fim - 4)
+                bloco = bytes(self.pendente[:fim])
+                self.pendente.clear()
+                self._processar_cabecalho(bloco)
+                return posicao
+            posicao += len(janela)
+            if len(self.pendente) > TAMANHO_MAXIMO_CABECALHO:
+                raise ErroProtocoloHTTP("Cabecalhos da resposta excedem o limite")
+        return posicao
+
+    def _ler_linha(self, visao, posicao):
+        #Retorna (nova posicao, linha sem CRLF) ou (nova posicao, None) se a linha continua no proximo bloco
+        janela = bytes(visao[posicao:posicao + TAMANHO_MAXIMO_LINHA])
+        fim = janela.find(b"\n")
+        if fim < 0:
+            self.pendente += janela
+            if len(self.pendente) > TAMANHO_MAXIMO_LINHA:
+                raise ErroProtocoloHTTP("Linha de chunk ou trailer excede o limite")
+            return posicao + len(janela), None
+        linha = janela[:fim]
+        if self.pendente:
+            linha = bytes(self.pendente) + linha
+            self.pendente.clear()
+        return posicao + fim + 1, linha.rstrip(b"\r")
+
+    def _processar_linha(self, linha):
+        if self.estado == CHUNK_TAMANHO:
+            try:
+                tamanho_chunk = int(linha.split(b";", 1)[0].strip(), 16)
+            except ValueError:
+                raise ErroProtocoloHTTP(f"Tamanho de chunk invalido: {linha[:40]!r}")
+            if tamanho_chunk < 0:
+                raise ErroProtocoloHTTP(f"Tamanho de chunk invalido: {linha[:40]!r}")
+            if tamanho_chunk:
+                self.restante = tamanho_chunk
+                self.estado = CHUNK_DADOS
+            else:
+                self.estado = TRAILER
+        elif self.estado == CHUNK_FIM:
+            if linha:
+                raise ErroProtocoloHTTP("Chunk maior que o tamanho anunciado")
+            self.estado = CHUNK_TAMANHO
+        elif linha:
+            chave, separador, valor = linha.decode('iso-8859-1').partition(':')
+            if separador:
+                self.trailers[chave.strip()] = valor.strip()
+        else:
+            #Linha vazia encerra os trailers e a resposta
+            self.estado = COMPLETA
+
+    def _processar_cabecalho(self, bloco):
+        self.bytes_cabecalho += len(bloco) + 4
+        linhas = bloco.decode('iso-8859-1').split('\r\n')
+        partes = linhas[0].split(' ', 2)
+        if len(partes) < 2 or not partes[0].startswith('HTTP/'):
+            raise ErroProtocoloHTTP(f"Linha de status invalida: {linhas[0][:80]!r}")
+        try:
+            codigo_status = int(partes[1])
+        except ValueError:
+            raise ErroProtocoloHTTP(f"Codigo de status invalido: {partes[1][:10]!r}")
+        if 100 <= codigo_status < 200 and codigo_status != 101:
+            #Resposta informativa: a resposta final vem logo em seguida
+            self.informativas += 1
+            return
+
+        self.versao = partes[0]
+        self.codigo_status = codigo_status
+        self.motivo = partes[2] if len(partes) > 2 else ''
+        cabecalhos = {}
+        for linha in linhas[1:]:
+            chave, separador, valor = linha.partition(':')
+            if separador:
+                cabecalhos[chave.strip()] = valor.strip()
+        self.cabecalhos = cabecalhos
+
+        minusculos = {chave.lower(): valor for chave, valor in cabecalhos.items()}
+        self.conexao = minusculos.get('connection', '').lower()
+        codificacao = minusculos.get('transfer-encoding')
+        tamanho_conteudo = minusculos.get('content-length')
+
+        #Ordem de precedencia da RFC 9112, secao 6.3
+        if self.metodo == 'HEAD' or codigo_status in (101, 204, 304):
+            self.estado = COMPLETA
+        elif codificacao is not None:
+            if codificacao.lower().rsplit(',', 1)[-1].strip() == 'chunked':
+                self.estado = CHUNK_TAMANHO
+            else:
+                self.estado = CORPO_ATE_FECHAR
+        elif tamanho_conteudo is not None:
+            try:
+                self.restante = int(tamanho_conteudo)
+            except ValueError:
+                raise ErroProtocoloHTTP(f"Content-Length invalido: {tamanho_conteudo[:20]!r}")
+            if self.restante < 0:
+                raise ErroProtocoloHTTP(f"Content-Length invalido: {tamanho_conteudo[:20]!r}")
+            self.estado = CORPO_TAMANHO if self.restante else COMPLETA
+            if self.guardar_corpo:
+                #Pre-alocado com o tamanho anunciado, ate PREALOCACAO_MAXIMA_CORPO
+                self.corpo = bytearray(min(self.restante, PREALOCACAO_MAXIMA_CORPO))
+        else:
+            self.estado = CORPO_ATE_FECHAR
+        self.ate_fechar = self.estado == CORPO_ATE_FECHAR
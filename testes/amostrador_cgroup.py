@@ -0,0 +1,162 @@
+#Amostragem real de CPU e memoria dos conteineres dos servidores (cgroup v2 + /proc) durante cada teste
+#As raizes sao configuraveis para testar contra diretorios falsos com a mesma estrutura
+
+import os
+import threading
+import time
+
+RAIZ_CGROUP = '/sys/fs/cgroup'
+RAIZ_PROC = '/proc'
+
+#Nomes de processo (/proc/<pid>/comm) de cada servidor, usados para descobrir o cgroup do conteiner
+PROCESSOS_SERVIDORES = {
+    'nginx': ('nginx',),
+    'apache': ('apache2', 'httpd')
+}
+
+#Intervalo padrao entre amostras (segundos)
+INTERVALO_AMOSTRAGEM = 0.1
+
+
+def ler_arquivo(caminho):
+    with open(caminho, encoding='utf-8') as f:
+        return f.read()
+
+
+def localizar_cgroup(nomes_processos, raiz_cgroup=RAIZ_CGROUP, raiz_proc=RAIZ_PROC):
+    #Diretorio do cgroup do primeiro processo com um dos nomes dados, ou None
+    #Exige enxergar os processos do host (pid: host) e o cgroupfs do host montado em raiz_cgroup
+    try:
+        pids = [nome for nome in os.listdir(raiz_proc) if nome.isdigit()]
+    except OSError:
+        return None
+    for pid in sorted(pids, key=int):
+        try:
+            if ler_arquivo(os.path.join(raiz_proc, pid, 'comm')).strip() not in nomes_processos:
+                continue
+            for linha in ler_arquivo(os.path.join(raiz_proc, pid, 'cgroup')).splitlines():
+                #cgroup v2: "0::/system.slice/docker-<id>.scope"
+                if linha.startswith('0::'):
+                    diretorio = os.path.join(raiz_cgroup, linha[3:].lstrip('/'))
+                    if os.path.isfile(os.path.join(diretorio, 'cpu.stat')):
+                        return diretorio
+        except OSError:
+            #Processo terminou durante a busca
+            continue
+    return None
+
+
+class LeitorCgroup:
+    #Leitura pontual de um cgroup v2: CPU acumulada, memoria do cgroup e RSS somado dos seus processos
+    def __init__(self, diretorio, raiz_proc=RAIZ_PROC):
+        self.diretorio = diretorio
+        self.raiz_proc = raiz_proc
+
+    def ler(self):
+        return {
+            'instante': time.perf_counter(),
+            'cpu_usec': self.cpu_usec(),
+            'memoria_bytes': int(ler_arquivo(os.path.join(self.diretorio, 'memory.current'))),
+            'rss_bytes': self.rss_bytes()
+        }
+
+    def cpu_usec(self):
+        for linha in ler_arquivo(os.path.join(self.diretorio, 'cpu.stat')).splitlines():
+            chave, _, valor = linha.partition(' ')
+            if chave == 'usage_usec':
+                return int(valor)
+        raise ValueError(f"usage_usec ausente em {self.diretorio}/cpu.stat")
+
+    def rss_bytes(self):
+        total = 0
+        for pid in ler_arquivo(os.path.join(self.diretorio, 'cgroup.procs')).split():
+            try:
+                for linha in ler_arquivo(os.path.join(self.raiz_proc, pid, 'status')).splitlines():
+                    if linha.startswith('VmRSS:'):
+                        total += int(linha.split()[1]) * 1024
+                        break
+            except OSError:
+                continue
+        return total
+
+    def limite_memoria(self):
+        #memory.max do cgroup; sem limite ('max'), a memoria total do host
+        try:
+            valor = ler_arquivo(os.path.join(self.diretorio, 'memory.max')).strip()
+            if valor != 'max':
+                return int(valor)
+            for linha in ler_arquivo(os.path.join(self.raiz_proc, 'meminfo')).splitlines():
+                if linha.startswith('MemTotal:'):
+                    return int(linha.split()[1]) * 1024
+        except (OSError, ValueError):
+            pass
+        return None
+
+
+class AmostradorCgroup:
+    #Thread em segundo plano que le um cgroup a cada `intervalo` segundos entre iniciar() e parar()
+    #parar() retorna o resumo: CPU em segundos e em % (media e pico entre amostras), memoria e RSS
+    #(pico e media) e o numero de amostras
+    def __init__(self, leitor, intervalo=INTERVALO_AMOSTRAGEM):
+        self.leitor = leitor
+        self.intervalo = intervalo
+        self.amostras = []
+        self.erro = None
+        self.parada = threading.Event()
+        self.thread = None
+
+    def iniciar(self):
+        self.amostras = []
+        self.erro = None
+        self.parada.clear()
+        self._amostrar()
+        self.thread = threading.Thread(target=self._executar, daemon=True)
+        self.thread.start()
+
+    def parar(self):
+        self.parada.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        self._amostrar()
+        return self.resumir()
+
+    def _executar(self):
+        #Agenda fixa: o tempo gasto na leitura nao desloca as amostras seguintes
+        proxima = time.perf_counter() + self.intervalo
+        while not self.parada.wait(max(proxima - time.perf_counter(), 0)):
+            self._amostrar()
+            proxima += self.intervalo
+
+    def _amostrar(self):
+        try:
+            self.amostras.append(self.leitor.ler())
+        except (OSError, ValueError) as e:
+            self.erro = str(e) or type(e).__name__
+
+    def resumir(self):
+        amostras = self.amostras
+        if len(amostras) < 2:
+            return None
+        primeira, ultima = amostras[0], amostras[-1]
+        duracao = ultima['instante'] - primeira['instante']
+        cpu_segundos = (ultima['cpu_usec'] - primeira['cpu_usec']) / 1e6
+        picos_cpu = [
+            (depois['cpu_usec'] - antes['cpu_usec']) / 1e6 / (depois['instante'] - antes['instante']) * 100
+            for antes, depois in zip(amostras, amostras[1:]) if depois['instante'] > antes['instante']
+        ]
+        memoria = [amostra['memoria_bytes'] for amostra in amostras]
+        rss = [amostra['rss_bytes'] for amostra in amostras]
+        limite = self.leitor.limite_memoria()
+        return {
+            'amostras': len(amostras),
+            'duracao_s': duracao,
+            'cpu_segundos': cpu_segundos,
+            'cpu_percent_medio': cpu_segundos / duracao * 100 if duracao > 0 else 0.0,
+            'cpu_percent_pico': max(picos_cpu, default=0.0),
+            'memoria_pico_bytes': max(memoria),
+            'memoria_media_bytes': sum(memoria) / len(memoria),
+            'memoria_percent_pico': max(memoria) / limite * 100 if limite else None,
+            'rss_pico_bytes': max(rss),
+            'rss_media_bytes': sum(rss) / len(rss)
+        }
@@ -0,0 +1,205 @@
+#Amostragem do proprio gerador de carga durante cada teste: CPU do processo (e dos trabalhadores),
+#threads, atraso dos envios em relacao a agenda e pausas do coletor de lixo. Se o cliente chegou ao limite
+#antes do servidor, a linha do resultado e marcada: a latencia e a vazao medidas sao do gerador, nao do servidor
+
+import gc
+import os
+import resource
+import threading
+import time
+
+#Intervalo entre amostras (segundos); cada despertar da thread tambem mede o proprio atraso
+INTERVALO_GERADOR = 0.05
+
+#Limiares para marcar o gerador como limitante
+LIMIARES_GERADOR = {
+    'cpu': 0.9,             #CPU media >= 90% da capacidade (nucleos uteis para o motor)
+    'atraso_p99_ms': 10,    #P99 do atraso dos envios em relacao ao instante planejado (malha aberta)
+    'despertar_p99_ms': 10, #P99 do atraso de despertar do amostrador (malha fechada, sem agenda)
+    'gc': 0.05              #pausas do coletor de lixo somando >= 5% da janela
+}
+
+
+def nucleos_disponiveis(raiz_cgroup='/sys/fs/cgroup', raiz_proc='/proc'):
+    #Nucleos que este processo pode usar: afinidade e, dentro de um conteiner, a cota de cpu.max do cgroup
+    try:
+        nucleos = float(len(os.sched_getaffinity(0)))
+    except AttributeError:
+        nucleos = float(os.cpu_count() or 1)
+    try:
+        with open(os.path.join(raiz_proc, 'self', 'cgroup'), encoding='utf-8') as f:
+            caminho = next((linha[3:].strip() for linha in f if linha.startswith('0::')), None)
+        if caminho is not None:
+            with open(os.path.join(raiz_cgroup, caminho.lstrip('/'), 'cpu.max'), encoding='utf-8') as f:
+                cota, periodo = f.read().split()
+            if cota != 'max':
+                nucleos = min(nucleos, int(cota) / int(periodo))
+    except (OSError, ValueError):
+        pass
+    return nucleos
+
+
+def cpu_processo():
+    #CPU (s) deste processo e dos filhos ja encerrados, como os trabalhadores do motor de processos
+    proprio = resource.getrusage(resource.RUSAGE_SELF)
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return proprio.ru_utime + proprio.ru_stime, filhos.ru_utime + filhos.ru_stime
+
+
+def threads_processo(pid='self', raiz_proc='/proc'):
+    #Threads do processo (campo Threads: de /proc/<pid>/status); sem /proc, as threads Python deste processo
+    try:
+        with open(os.path.join(raiz_proc, str(pid), 'status'), encoding='utf-8') as f:
+            for linha in f:
+                if linha.startswith('Threads:'):
+                    return int(linha.split()[1])
+    except (OSError, ValueError):
+        pass
+    return threading.active_count() if pid == 'self' else 0
+
+
+def processos_filhos(raiz_proc='/proc'):
+    #PIDs dos filhos deste processo (os trabalhadores do motor de processos), pelo campo ppid de /proc/<pid>/stat
+    proprio = os.getpid()
+    filhos = []
+    try:
+        entradas = os.listdir(raiz_proc)
+    except OSError:
+        return filhos
+    for entrada in entradas:
+        if not entrada.isdigit():
+            continue
+        try:
+            with open(os.path.join(raiz_proc, entrada, 'stat'), encoding='utf-8') as f:
+                #O nome do comando (campo 2) pode ter espacos: os campos seguintes vem depois do ultimo ')'
+                campos = f.read().rpartition(')')[2].split()
+            if int(campos[1]) == proprio:
+                filhos.append(int(entrada))
+        except (OSError, ValueError, IndexError):
+            continue
+    return filhos
+
+
+def percentil(valores, p):
+    if not valores:
+        return 0.0
+    ordenados = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * p / 100))]
+
+
+class AmostradorGerador:
+    #Thread em segundo plano entre iniciar() e parar(), como o AmostradorCgroup; parar() retorna o resumo
+    #capacidade: nucleos que o motor consegue ocupar (1 para threads/asyncio por causa do GIL;
+    #min(processos, nucleos) com o motor de processos)
+    #filhos: soma tambem as threads dos processos filhos (motor de processos)
+    def __init__(self, capacidade=1.0, intervalo=INTERVALO_GERADOR, limiares=None, filhos=False):
+        self.capacidade = capacidade
+        self.intervalo = intervalo
+        self.filhos = filhos
+        self.limiares = {**LIMIARES_GERADOR, **(limiares or {})}
+        self.parada = threading.Event()
+        self.thread = None
+        self._zerar()
+
+    def _zerar(self):
+        self.amostras = []
+        self.despertares = []
+        self.threads_pico = 0
+        self.gc_coletas = 0
+        self.gc_pausas = []
+        self._gc_inicio = None
+
+    def iniciar(self):
+        self._zerar()
+        self.parada.clear()
+        gc.callbacks.append(self._gc)
+        self.inicio = time.perf_counter()
+        self.cpu_inicio = cpu_processo()
+        self._amostrar()
+        self.thread = threading.Thread(target=self._executar, daemon=True)
+        self.thread.start()
+
+    def parar(self, requisicoes=0, atrasos=None, threads_motor=0):
+        #atrasos: HistogramaLatencia do atraso de cada envio em relacao ao instante planejado (microssegundos),
+        #em malha aberta ou na reproducao de log; None em malha fechada
+        #threads_motor: threads informadas pelo proprio motor com todos os usuarios ja iniciados
+        self.parada.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+        if self._gc in gc.callbacks:
+            gc.callbacks.remove(self._gc)
+        #Ultima amostra so de CPU: as threads do motor ja terminaram e nao contam para o pico
+        self.amostras.append((time.perf_counter(), cpu_processo()[0]))
+        self.threads_pico = max(self.threads_pico, threads_motor)
+        duracao = time.perf_counter() - self.inicio
+        proprio, filhos = cpu_processo()
+        cpu = (proprio - self.cpu_inicio[0]) + (filhos - self.cpu_inicio[1])
+        return self.resumir(duracao, cpu, requisicoes, atrasos)
+
+    def _gc(self, fase, info):
+        #Chamado pelo interpretador no inicio e no fim de cada coleta, na thread que a disparou
+        if fase == 'start':
+            self._gc_inicio = time.perf_counter()
+        elif self._gc_inicio is not None:
+            self.gc_pausas.append(time.perf_counter() - self._gc_inicio)
+            self.gc_coletas += 1
+            self._gc_inicio = None
+
+    def _executar(self):
+        #Atraso de despertar: quanto a thread acordou depois do planejado; com a CPU ou o GIL disputados,
+        #cresce. So decide a marcacao sem agenda de envios (malha fechada)
+        proxima = time.perf_counter() + self.intervalo
+        while not self.parada.wait(max(proxima - time.perf_counter(), 0)):
+            agora = time.perf_counter()
+            self.despertares.append(max(agora - proxima, 0.0))
+            self._amostrar()
+            proxima += self.intervalo
+            if proxima < agora:
+                #Atrasou mais de um intervalo: nao acumula despertares perdidos
+                proxima = agora + self.intervalo
+
+    def _amostrar(self):
+        self.amostras.append((time.perf_counter(), cpu_processo()[0]))
+        threads = threads_processo()
+        if self.filhos:
+            threads += sum(threads_processo(pid) for pid in processos_filhos())
+        self.threads_pico = max(self.threads_pico, threads)
+
+    def resumir(self, duracao, cpu_segundos, requisicoes=0, atrasos=None):
+        picos_cpu = [
+            (cpu_depois - cpu_antes) / (depois - antes) * 100
+            for (antes, cpu_antes), (depois, cpu_depois) in zip(self.amostras, self.amostras[1:]) if depois > antes
+        ]
+        cpu_percent = cpu_segundos / duracao * 100 if duracao > 0 else 0.0
+        despertar_p99_ms = percentil(self.despertares, 99) * 1000
+        #Atraso dos envios (histograma em microssegundos); sem agenda, so o atraso de despertar
+        agendado = atrasos is not None and atrasos.total > 0
+        atraso_p99_ms = atrasos.percentil(99) / 1000 if agendado else None
+        pausa_total = sum(self.gc_pausas, 0.0)
+        motivos = []
+        if cpu_percent >= self.limiares['cpu'] * self.capacidade * 100:
+            motivos.append('cpu')
+        if agendado and atraso_p99_ms >= self.limiares['atraso_p99_ms']:
+            motivos.append('atraso')
+        elif not agendado and despertar_p99_ms >= self.limiares['despertar_p99_ms']:
+            motivos.append('despertar')
+        if duracao > 0 and pausa_total / duracao >= self.limiares['gc']:
+            motivos.append('gc')
+        return {
+            'limitado': bool(motivos),
+            'motivos': motivos,
+            'capacidade_nucleos': self.capacidade,
+            'cpu_segundos': cpu_segundos,
+            'cpu_percent': cpu_percent,
+            'cpu_percent_pico': max(picos_cpu, default=0.0),
+            'cpu_us_por_requisicao': cpu_segundos / requisicoes * 1e6 if requisicoes else None,
+            'threads_pico': self.threads_pico,
+            'atraso_p99_ms': atraso_p99_ms,
+            'atraso_max_ms': atrasos.maximo / 1000 if agendado else None,
+            'despertar_p99_ms': despertar_p99_ms,
+            'despertar_max_ms': max(self.despertares, default=0.0) * 1000,
+            'gc_coletas': self.gc_coletas,
+            'gc_pausa_total_ms': pausa_total * 1000,
+            'gc_pausa_max_ms': max(self.gc_pausas, default=0.0) * 1000
+        }
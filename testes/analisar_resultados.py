@@ -5,7 +5,9 @@ import matplotlib.pyplot as plt
 import numpy as np
 import pandas as pd
 from datetime import datetime
+import json
 import os
+from comparacao_estatistica import comparar_arquivo
 
 #Classe para cores no terminal
 class Cores:
@@ -396,10 +398,69 @@ class AnalisadorResultados:
         plt.savefig('resultados/graficos/comparacao_throughput.png', dpi=300, bbox_inches='tight')
         plt.close()
 
+def carregar_amostras_colunares(diretorio='resultados/amostras.colunar'):
+    #Mapeia cada coluna das amostras por requisição (formato 'colunar' de testes/gravadores.py)
+    #direto em arrays NumPy somente leitura, sem parse nem cópia
+    #Retorna (colunas, tabelas); as colunas são cortadas no número de linhas presentes em todas
+    with open(os.path.join(diretorio, 'esquema.json'), encoding='utf-8') as f:
+        esquema = json.load(f)
+    colunas = {}
+    for coluna in esquema['colunas']:
+        arquivo = os.path.join(diretorio, f"{coluna['nome']}.bin")
+        tipo = np.dtype(coluna['tipo'])
+        linhas = os.path.getsize(arquivo) // tipo.itemsize
+        if linhas:
+            colunas[coluna['nome']] = np.memmap(arquivo, dtype=tipo, mode='r', shape=(linhas,))
+        else:
+            colunas[coluna['nome']] = np.empty(0, dtype=tipo)
+    linhas = min(len(valores) for valores in colunas.values())
+    return {nome: valores[:linhas] for nome, valores in colunas.items()}, esquema['tabelas']
+
+def analisar_caudas_amostras(diretorio='resultados/amostras.colunar'):
+    #Percentis de cauda por servidor e caminho calculados sobre todas as requisições
+    try:
+        colunas, tabelas = carregar_amostras_colunares(diretorio)
+    except FileNotFoundError:
+        print(Cores.erro(f"Amostras colunares não encontradas em {diretorio}"))
+        return
+    
+    total = len(colunas['instante_ns'])
+    print(Cores.info(f"Amostras carregadas: {total} requisições"))
+    sucesso = colunas['sucesso'] == 1
+    latencia_ms = colunas['tempo_resposta_ns'] / 1e6
+    
+    print(f"\n{'Servidor':<10} {'Caminho':<28} {'Requisições':>12} {'Erros %':>8} "
+          f"{'P50 ms':>9} {'P99 ms':>9} {'P99.9 ms':>9} {'Máx ms':>9}")
+    for id_servidor, servidor in enumerate(tabelas['servidores']):
+        do_servidor = colunas['servidor'] == id_servidor
+        for id_caminho, caminho in enumerate(tabelas['caminhos']):
+            selecao = do_servidor & (colunas['caminho'] == id_caminho)
+            quantidade = int(selecao.sum())
+            if not quantidade:
+                continue
+            valores = latencia_ms[selecao & sucesso]
+            erros = (1 - len(valores) / quantidade) * 100
+            if len(valores):
+                p50, p99, p999 = np.percentile(valores, [50, 99, 99.9])
+                maximo = valores.max()
+            else:
+                p50 = p99 = p999 = maximo = float('nan')
+            print(f"{servidor:<10} {caminho:<28} {quantidade:>12} {erros:>8.2f} "
+                  f"{p50:>9.2f} {p99:>9.2f} {p999:>9.2f} {maximo:>9.2f}")
+
 def main():
     #Função principal para executar a análise
     analisador = AnalisadorResultados()
     analisador.gerar_todos_graficos()
+    
+    #Amostras por requisição, se o teste de carga rodou com --amostras colunar
+    if os.path.isdir('resultados/amostras.colunar'):
+        analisar_caudas_amostras()
+    
+    #Intervalos de confianca e testes de significancia nginx x Apache por cenario, sobre as execucoes
+    if os.path.exists('resultados/resultados_testes.csv'):
+        print(Cores.info("Comparação estatística entre os servidores..."))
+        comparar_arquivo('resultados/resultados_testes.csv', 'resultados/comparacao_estatistica')
 
 if __name__ == "__main__":
     main()
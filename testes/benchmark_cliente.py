@@ -0,0 +1,311 @@
+#Benchmark do custo do gerador de carga (servidor_local.py em loopback, em processo separado):
+#  - ClienteHTTP isolado, em sequencia: CPU e tempo de parede por requisicao
+#  - cada motor do TestadorCarga (threads, keep-alive, asyncio, processos) por tamanho de resposta:
+#    CPU do cliente por requisicao, vazao maxima, memoria de pico e memoria retida por requisicao
+#As medicoes podem ser salvas como linha de base em JSON e comparadas em execucoes futuras:
+#um cliente mais lento aparece na diferenca da linha de base e na saida de --comparar
+#Cada medicao guarda os nucleos disponiveis (e os processos do motor): so e comparada com a linha de base
+#medida nas mesmas condicoes, e --salvar substitui so as medicoes refeitas
+
+import sys
+import os
+import io
+import json
+import time
+import shutil
+import argparse
+import platform
+import resource
+import tempfile
+import statistics
+import contextlib
+import tracemalloc
+from datetime import datetime
+
+#Adicionar diretorio src ao caminho
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from cliente import ClienteHTTP, PoolConexoes
+from teste_carga import TestadorCarga
+from servidor_local import iniciar_em_processo
+from amostrador_gerador import nucleos_disponiveis
+
+#Respostas testadas: JSON pequeno e arquivos gerados pelo servidor local (~10 KB, ~1 MB e ~7 MB)
+CAMINHOS = ['/api/pequeno', '/estatico/benchmark-10kb.txt', '/estatico/benchmark-1mb.txt',
+            '/estatico/benchmark-7mb.txt']
+
+#Respostas usadas nos motores (7 MB so mediria o loopback)
+CAMINHOS_MOTORES = CAMINHOS[:3]
+
+#Motor do benchmark -> (motor do TestadorCarga, keep-alive, usa varios processos)
+MOTORES = {
+    'threads': ('threads', False, False),
+    'keep-alive': ('threads', True, False),
+    'asyncio': ('asyncio', True, False),
+    'processos': ('threads', True, True)
+}
+
+ARQUIVO_BASE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baselines', 'benchmark_cliente.json')
+
+#Variacao tolerada antes de --comparar apontar regressao (CPU por requisicao acima, vazao abaixo)
+TOLERANCIA = 0.2
+
+
+def tamanho_resposta(porta, caminho):
+    #Bytes do corpo servido em `caminho`
+    resultado = ClienteHTTP('127.0.0.1', porta).enviar_requisicao('GET', caminho)
+    if not resultado['sucesso'] or resultado['codigo_status'] != 200:
+        raise RuntimeError(f"{caminho}: {resultado.get('erro') or resultado['codigo_status']}")
+    return resultado['tamanho_corpo']
+
+
+def medir(porta, caminho, num_requisicoes, manter_conexao):
+    #Retorna (CPU por requisicao em us, tempo de parede por requisicao em us)
+    pool = PoolConexoes() if manter_conexao else None
+    cliente = ClienteHTTP('127.0.0.1', porta, pool)
+    cliente.enviar_requisicao('GET', caminho)  #Aquecimento
+
+    cpu_inicio = time.process_time()
+    parede_inicio = time.perf_counter()
+    for _ in range(num_requisicoes):
+        resultado = cliente.enviar_requisicao('GET', caminho)
+        if not resultado['sucesso']:
+            raise RuntimeError(resultado.get('erro'))
+    cpu = time.process_time() - cpu_inicio
+    parede = time.perf_counter() - parede_inicio
+    if pool is not None:
+        pool.fechar_todas()
+    return cpu / num_requisicoes * 1e6, parede / num_requisicoes * 1e6
+
+
+def criar_testador(porta, dir_temporario):
+    #TestadorCarga apontado para o servidor do benchmark; arquivos e mensagens de inicio descartados
+    with contextlib.redirect_stdout(io.StringIO()):
+        testador = TestadorCarga(url_prometheus=None, dir_resultados=dir_temporario)
+    testador.servidores = {'local': ('127.0.0.1', porta)}
+    return testador
+
+
+def cpu_total():
+    #CPU deste processo e dos filhos ja encerrados (trabalhadores do motor 'processos')
+    proprio = resource.getrusage(resource.RUSAGE_SELF)
+    filhos = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return proprio.ru_utime + proprio.ru_stime + filhos.ru_utime + filhos.ru_stime
+
+
+def executar_motor(testador, motor, caminho, num_requisicoes, usuarios, processos):
+    motor_testador, manter_conexao, multiprocesso = MOTORES[motor]
+    if multiprocesso:
+        estatisticas, _ = testador.executar_com_processos('local', caminho, num_requisicoes, usuarios,
+                                                          manter_conexao, motor_testador, processos)
+    elif motor_testador == 'asyncio':
+        estatisticas, _ = testador.executar_com_asyncio('local', caminho, num_requisicoes, usuarios, manter_conexao)
+    else:
+        estatisticas, _ = testador.executar_com_threads('local', caminho, num_requisicoes, usuarios, manter_conexao)
+    if estatisticas.falhas:
+        raise RuntimeError(f"{motor}: {estatisticas.falhas} falhas em {num_requisicoes} requisicoes")
+
+
+def medir_motor(testador, motor, caminho, num_requisicoes, usuarios, processos):
+    #Retorna (CPU por requisicao em us, requisicoes por segundo) em malha fechada, o mais rapido possivel
+    cpu_inicio = cpu_total()
+    parede_inicio = time.perf_counter()
+    executar_motor(testador, motor, caminho, num_requisicoes, usuarios, processos)
+    parede = time.perf_counter() - parede_inicio
+    cpu = cpu_total() - cpu_inicio
+    return cpu / num_requisicoes * 1e6, num_requisicoes / parede
+
+
+def medir_memoria(testador, motor, caminho, num_requisicoes, usuarios):
+    #Retorna (KiB de pico acima do inicio, bytes retidos por requisicao) com tracemalloc
+    #Rodada separada: o rastreamento deixa o cliente varias vezes mais lento
+    tracemalloc.start()
+    try:
+        antes, _ = tracemalloc.get_traced_memory()
+        tracemalloc.reset_peak()
+        executar_motor(testador, motor, caminho, num_requisicoes, usuarios, 1)
+        depois, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (pico - antes) / 1024, max(depois - antes, 0) / num_requisicoes
+
+
+def requisicoes_por_tamanho(requisicoes, tamanho):
+    #Respostas grandes usam menos repeticoes para manter o tempo total razoavel
+    return max(50, requisicoes * 64 * 1024 // max(tamanho, 64 * 1024))
+
+
+def nome_processador():
+    #platform.processor() costuma vir vazio no Linux; o modelo esta em /proc/cpuinfo
+    try:
+        with open('/proc/cpuinfo', encoding='utf-8') as f:
+            for linha in f:
+                if linha.startswith('model name'):
+                    return linha.split(':', 1)[1].strip()
+    except OSError:
+        pass
+    return platform.processor() or platform.machine()
+
+
+def descrever_maquina():
+    return {
+        'python': platform.python_version(),
+        'implementacao': platform.python_implementation(),
+        'sistema': platform.platform(),
+        'processador': nome_processador(),
+        'nucleos': os.cpu_count()
+    }
+
+
+def chave_medicao(medicao):
+    #Medicoes so sao comparaveis com a mesma resposta, os mesmos nucleos e os mesmos processos do motor
+    return (medicao['motor'], medicao['conexao'], medicao['caminho'], medicao['nucleos'],
+            medicao.get('processos', 1))
+
+
+def carregar_base(arquivo):
+    with open(arquivo, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def salvar_base(arquivo, medicoes, parametros):
+    #Substitui so as medicoes refeitas: as de outros motores, ou de outra contagem de nucleos, continuam
+    #na linha de base (se ela foi medida no mesmo processador)
+    maquina = descrever_maquina()
+    anteriores = []
+    if os.path.isfile(arquivo):
+        base = carregar_base(arquivo)
+        if base.get('maquina', {}).get('processador') == maquina['processador']:
+            refeitas = {chave_medicao(medicao) for medicao in medicoes}
+            anteriores = [medicao for medicao in base.get('medicoes', [])
+                          if 'nucleos' in medicao and 'caminho' in medicao and chave_medicao(medicao) not in refeitas]
+    os.makedirs(os.path.dirname(os.path.abspath(arquivo)), exist_ok=True)
+    with open(arquivo, 'w', encoding='utf-8') as f:
+        json.dump({'data': datetime.now().isoformat(timespec='seconds'), 'maquina': maquina,
+                   'parametros': parametros, 'medicoes': anteriores + medicoes}, f, indent=2, ensure_ascii=False)
+        f.write('\n')
+
+
+def comparar_base(arquivo, medicoes, tolerancia):
+    #Imprime a variacao de cada medicao em relacao a linha de base; retorna as regressoes
+    base = carregar_base(arquivo)
+    if base.get('maquina', {}).get('processador') != descrever_maquina()['processador']:
+        print(f"[AVISO] Linha de base medida em outra maquina ({base.get('maquina', {}).get('processador')})")
+    referencia = {chave_medicao(m): m for m in base.get('medicoes', []) if 'nucleos' in m and 'caminho' in m}
+    regressoes = []
+    sem_base = []
+    print(f"\n{'motor':>10} {'conexao':>10} {'tamanho':>10} {'cpu_us/req':>18} {'req/s':>18}")
+    for medicao in medicoes:
+        anterior = referencia.get(chave_medicao(medicao))
+        if anterior is None:
+            sem_base.append(medicao)
+            continue
+        variacao_cpu = medicao['cpu_us_por_req'] / anterior['cpu_us_por_req'] - 1
+        linha = f"{medicao['motor']:>10} {medicao['conexao']:>10} {medicao['tamanho']:>10} {variacao_cpu:>+17.1%} "
+        problemas = []
+        if variacao_cpu > tolerancia:
+            problemas.append(f"CPU/req {variacao_cpu:+.1%}")
+        if medicao.get('rps') and anterior.get('rps'):
+            variacao_rps = medicao['rps'] / anterior['rps'] - 1
+            linha += f"{variacao_rps:>+17.1%}"
+            if variacao_rps < -tolerancia:
+                problemas.append(f"req/s {variacao_rps:+.1%}")
+        else:
+            linha += f"{'-':>18}"
+        if problemas:
+            regressoes.append((medicao, problemas))
+            linha += '  <- REGRESSAO'
+        print(linha)
+    if sem_base:
+        condicoes = sorted({(m['nucleos'], m.get('processos', 1)) for m in base.get('medicoes', [])
+                            if 'nucleos' in m})
+        print(f"[AVISO] {len(sem_base)} medicoes sem linha de base com {sem_base[0]['nucleos']:g} nucleos e os "
+              f"mesmos processos; a linha de base tem (nucleos, processos): "
+              f"{', '.join(f'({n:g}, {p})' for n, p in condicoes) or 'nenhuma'}")
+    return regressoes
+
+
+def principal():
+    parser = argparse.ArgumentParser(description='Benchmark do custo do gerador de carga por requisicao')
+    parser.add_argument('--requisicoes', type=int, default=1000,
+                        help='Requisicoes por medicao (menos para respostas grandes)')
+    parser.add_argument('--usuarios', type=int, default=16, help='Usuarios virtuais nos motores')
+    parser.add_argument('--processos', type=int, default=min(4, os.cpu_count() or 1),
+                        help='Processos do motor processos')
+    parser.add_argument('--repeticoes', type=int, default=3, help='Repeticoes por medicao (usa a mediana)')
+    parser.add_argument('--motores', nargs='+', choices=tuple(MOTORES), default=list(MOTORES))
+    parser.add_argument('--salvar', nargs='?', const=ARQUIVO_BASE, metavar='ARQUIVO',
+                        help=f"Grava as medicoes na linha de base (padrao: {os.path.relpath(ARQUIVO_BASE)})")
+    parser.add_argument('--comparar', nargs='?', const=ARQUIVO_BASE, metavar='ARQUIVO',
+                        help='Compara com a linha de base e sai com codigo 1 se houver regressao')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA,
+                        help=f"Variacao aceita em --comparar (padrao: {TOLERANCIA * 100:.0f}%%)")
+    args = parser.parse_args()
+    if min(args.requisicoes, args.usuarios, args.processos, args.repeticoes) < 1:
+        parser.error("--requisicoes, --usuarios, --processos e --repeticoes devem ser positivos")
+    if args.comparar and not os.path.isfile(args.comparar):
+        parser.error(f"linha de base nao encontrada: {args.comparar}")
+
+    nucleos = nucleos_disponiveis()
+    medicoes = []
+    processo, porta = iniciar_em_processo()
+    dir_temporario = tempfile.mkdtemp(prefix='benchmark_cliente_')
+    try:
+        tamanhos = {caminho: tamanho_resposta(porta, caminho) for caminho in CAMINHOS}
+        print(f"ClienteHTTP em sequencia (uma requisicao por vez, {nucleos:g} nucleos)")
+        print(f"{'tamanho':>10} {'conexao':>10} {'cpu_us/req':>12} {'parede_us/req':>14}")
+        for caminho in CAMINHOS:
+            tamanho = tamanhos[caminho]
+            num = max(10, args.requisicoes * 1024 // max(tamanho // 1024, 1024))
+            for manter_conexao in (False, True):
+                cpu, parede = zip(*(medir(porta, caminho, num, manter_conexao) for _ in range(args.repeticoes)))
+                modo = 'keep-alive' if manter_conexao else 'close'
+                cpu, parede = statistics.median(cpu), statistics.median(parede)
+                print(f"{tamanho:>10} {modo:>10} {cpu:>12.1f} {parede:>14.1f}")
+                medicoes.append({'motor': 'cliente', 'conexao': modo, 'caminho': caminho, 'tamanho': tamanho,
+                                 'nucleos': nucleos, 'requisicoes': num,
+                                 'cpu_us_por_req': round(cpu, 2), 'parede_us_por_req': round(parede, 2)})
+
+        testador = criar_testador(porta, dir_temporario)
+        print(f"\nMotores do TestadorCarga ({args.usuarios} usuarios, malha fechada, vazao maxima)")
+        print(f"{'motor':>10} {'tamanho':>10} {'cpu_us/req':>12} {'req/s':>10} {'pico_KiB':>10} {'retido_B/req':>13}")
+        for motor in args.motores:
+            _, manter_conexao, multiprocesso = MOTORES[motor]
+            for caminho in CAMINHOS_MOTORES:
+                tamanho = tamanhos[caminho]
+                num = requisicoes_por_tamanho(args.requisicoes, tamanho)
+                executar_motor(testador, motor, caminho, min(num, 100), args.usuarios,
+                               args.processos)  #Aquecimento
+                cpu, rps = zip(*(medir_motor(testador, motor, caminho, num, args.usuarios, args.processos)
+                                 for _ in range(args.repeticoes)))
+                cpu, rps = statistics.median(cpu), statistics.median(rps)
+                #tracemalloc nao enxerga os processos filhos: memoria medida so nos motores de um processo
+                pico, retido = (None, None) if multiprocesso else \
+                    medir_memoria(testador, motor, caminho, max(num // 4, 20), args.usuarios)
+                print(f"{motor:>10} {tamanho:>10} {cpu:>12.1f} {rps:>10.0f} "
+                      f"{'-' if pico is None else f'{pico:.0f}':>10} "
+                      f"{'-' if retido is None else f'{retido:.1f}':>13}")
+                medicoes.append({'motor': motor, 'conexao': 'keep-alive' if manter_conexao else 'close',
+                                 'caminho': caminho, 'tamanho': tamanho, 'nucleos': nucleos,
+                                 'requisicoes': num, 'usuarios': args.usuarios,
+                                 'processos': args.processos if multiprocesso else 1,
+                                 'cpu_us_por_req': round(cpu, 2), 'rps': round(rps, 1),
+                                 'memoria_pico_kib': None if pico is None else round(pico, 1),
+                                 'bytes_retidos_por_req': None if retido is None else round(retido, 1)})
+    finally:
+        processo.terminate()
+        shutil.rmtree(dir_temporario, ignore_errors=True)
+
+    parametros = {'requisicoes': args.requisicoes, 'usuarios': args.usuarios, 'processos': args.processos,
+                  'repeticoes': args.repeticoes}
+    regressoes = comparar_base(args.comparar, medicoes, args.tolerancia) if args.comparar else []
+    if args.salvar:
+        salvar_base(args.salvar, medicoes, parametros)
+        print(f"\nLinha de base salva em {args.salvar}")
+    if regressoes:
+        print(f"\n[ERRO] {len(regressoes)} medicoes pioraram mais de {args.tolerancia:.0%} em relacao a linha de base")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    principal()
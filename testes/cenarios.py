@@ -0,0 +1,165 @@
+#Arquivos de cenarios (JSON ou TOML): cada cenario declara carga, endpoint e modo do gerador, e uma
+#`matriz` opcional expande o cenario no produto cartesiano dos seus eixos
+#
+#  {
+#    "execucoes": 3,
+#    "padrao": {"servidores": ["nginx", "apache"], "requisicoes": 100},
+#    "cenarios": [
+#      {"nome": "Api_{usuarios}u", "endpoint": "/api/dados", "matriz": {"usuarios": [10, 50, 100]}},
+#      {"nome": "Arquivo_{tamanho}_{motor}", "endpoint": "/estatico/{arquivo}",
+#       "matriz": {"motor": ["threads", "asyncio"],
+#                  "arquivo": [{"arquivo": "pequeno-1kb.txt", "tamanho": "1KB"}, ...]}}
+#    ]
+#  }
+#
+#Eixos com campos conhecidos (usuarios, motor, servidor...) alteram o cenario; os demais so viram
+#variaveis de nome, titulo e endpoint (str.format). Um eixo de objetos combina varios valores por ponto
+
+import itertools
+import json
+import os
+
+try:
+    import tomllib
+except ImportError:  #Python < 3.11
+    try:
+        import tomli as tomllib
+    except ImportError:
+        tomllib = None
+
+MOTORES = ('threads', 'asyncio')
+CHEGADAS = ('constante', 'poisson')
+
+#Campo do arquivo -> tipo; ausentes (ou null) usam o padrao do testador
+CAMPOS = {
+    'usuarios': int,
+    'requisicoes': int,
+    'duracao': float,           #segundos; em malha aberta, requisicoes = taxa x duracao
+    'endpoint': str,
+    'mistura': dict,            #carga mista: caminho -> peso (dispensa 'endpoint')
+    'titulo': str,
+    'servidores': list,
+    'motor': str,
+    'keep_alive': bool,
+    'taxa': float,
+    'chegadas': str,
+    'processos': int,
+    'pipeline': int
+}
+
+
+def ler_arquivo_cenarios(caminho):
+    if caminho.endswith('.toml'):
+        if tomllib is None:
+            raise ValueError(f"{caminho}: arquivos TOML exigem Python 3.11+ ou o pacote tomli")
+        with open(caminho, 'rb') as f:
+            return tomllib.load(f)
+    with open(caminho, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def pontos_matriz(matriz):
+    #Produto cartesiano dos eixos; cada ponto e um dicionario de variaveis
+    if not matriz:
+        return [{}]
+    eixos = []
+    for eixo, valores in matriz.items():
+        if not isinstance(valores, list) or not valores:
+            raise ValueError(f"eixo '{eixo}' da matriz deve ser uma lista nao vazia")
+        eixos.append([valor if isinstance(valor, dict) else {eixo: valor} for valor in valores])
+    pontos = []
+    for combinacao in itertools.product(*eixos):
+        ponto = {}
+        for valores in combinacao:
+            ponto.update(valores)
+        pontos.append(ponto)
+    return pontos
+
+
+def expandir_cenario(bruto, padrao, servidores_validos, taxa_padrao=None):
+    #Lista de cenarios prontos para TestadorCarga.executar_cenario
+    nome = bruto.get('nome')
+    if not nome:
+        raise ValueError("cenario sem 'nome'")
+    desconhecidos = set(bruto) - set(CAMPOS) - {'nome', 'matriz', 'servidor'}
+    if desconhecidos:
+        raise ValueError(f"{nome}: campos desconhecidos: {', '.join(sorted(desconhecidos))}")
+
+    cenarios = []
+    for ponto in pontos_matriz(bruto.get('matriz')):
+        campos = {**padrao, **{chave: valor for chave, valor in bruto.items() if chave != 'matriz'}}
+        campos.update({chave: valor for chave, valor in ponto.items() if chave in CAMPOS or chave == 'servidor'})
+        if 'servidor' in campos:
+            campos['servidores'] = [campos.pop('servidor')]
+        variaveis = {**campos, **ponto}
+        try:
+            nome_ponto = nome.format(**variaveis)
+            endpoint = str(campos.get('endpoint') or '').format(**variaveis)
+            titulo = campos['titulo'].format(**variaveis) if campos.get('titulo') else nome_ponto.upper()
+        except (KeyError, IndexError) as e:
+            raise ValueError(f"{nome}: variavel {e} nao definida no cenario nem na matriz") from None
+        mistura = campos.get('mistura')
+        if mistura is not None:
+            if not isinstance(mistura, dict) or not mistura:
+                raise ValueError(f"{nome_ponto}: 'mistura' deve mapear caminhos a pesos")
+            for caminho, peso in mistura.items():
+                if not caminho.startswith('/') or isinstance(peso, bool) or not isinstance(peso, (int, float)) \
+                        or peso <= 0:
+                    raise ValueError(f"{nome_ponto}: item invalido em 'mistura': {caminho!r}: {peso!r}")
+        elif not endpoint.startswith('/'):
+            raise ValueError(f"{nome_ponto}: 'endpoint' deve comecar com '/'")
+
+        cenario = {'nome': nome_ponto, 'titulo': titulo, 'endpoint': endpoint}
+        for campo, tipo in CAMPOS.items():
+            if campo in ('endpoint', 'titulo'):
+                continue
+            valor = campos.get(campo)
+            valido = isinstance(valor, tipo) or (tipo is float and isinstance(valor, int))
+            if valor is not None and (not valido or (isinstance(valor, bool) and tipo is not bool)):
+                raise ValueError(f"{nome_ponto}: '{campo}' deve ser {tipo.__name__}, recebido {valor!r}")
+            cenario[campo] = valor
+
+        cenario['servidores'] = cenario['servidores'] or list(servidores_validos)
+        invalidos = [servidor for servidor in cenario['servidores'] if servidor not in servidores_validos]
+        if invalidos:
+            raise ValueError(f"{nome_ponto}: servidores desconhecidos: {', '.join(invalidos)}")
+        if cenario['motor'] is not None and cenario['motor'] not in MOTORES:
+            raise ValueError(f"{nome_ponto}: motor invalido: {cenario['motor']}")
+        if cenario['chegadas'] is not None and cenario['chegadas'] not in CHEGADAS:
+            raise ValueError(f"{nome_ponto}: chegadas invalidas: {cenario['chegadas']}")
+        if not cenario['usuarios'] or cenario['usuarios'] < 1:
+            raise ValueError(f"{nome_ponto}: 'usuarios' deve ser positivo")
+
+        #Duracao so define o total de requisicoes com uma taxa: em malha fechada o ritmo depende do servidor
+        if cenario['duracao'] is not None:
+            taxa = cenario['taxa'] or taxa_padrao
+            if not taxa:
+                raise ValueError(f"{nome_ponto}: 'duracao' exige 'taxa' (malha aberta)")
+            cenario['requisicoes'] = max(1, round(taxa * cenario['duracao']))
+        if not cenario['requisicoes'] or cenario['requisicoes'] < 1:
+            raise ValueError(f"{nome_ponto}: informe 'requisicoes' ou 'duracao' com 'taxa'")
+        cenarios.append(cenario)
+    return cenarios
+
+
+def carregar_cenarios(caminho, servidores_validos, taxa_padrao=None):
+    #Retorna (execucoes, cenarios expandidos); erros de formato viram ValueError com o cenario culpado
+    dados = ler_arquivo_cenarios(caminho)
+    padrao = dados.get('padrao', {})
+    desconhecidos = set(padrao) - set(CAMPOS) - {'servidor'}
+    if desconhecidos:
+        raise ValueError(f"{caminho}: campos desconhecidos em 'padrao': {', '.join(sorted(desconhecidos))}")
+    cenarios = []
+    for bruto in dados.get('cenarios', []):
+        try:
+            cenarios += expandir_cenario(bruto, padrao, servidores_validos, taxa_padrao)
+        except ValueError as e:
+            raise ValueError(f"{os.path.basename(caminho)}: {e}") from None
+    if not cenarios:
+        raise ValueError(f"{caminho}: nenhum cenario definido")
+    nomes = [cenario['nome'] for cenario in cenarios]
+    repetidos = sorted({nome for nome in nomes if nomes.count(nome) > 1})
+    if repetidos:
+        raise ValueError(f"{caminho}: nomes de cenario repetidos (inclua as variaveis da matriz no nome): "
+                         f"{', '.join(repetidos[:5])}")
+    return dados.get('execucoes', 1), cenarios
@@ -0,0 +1,147 @@
+#Coleta das series do Prometheus sobre a janela exata de cada teste (query_range), feita depois
+#da campanha numa unica sessao HTTP com conexao reaproveitada
+
+import math
+import time
+import requests
+
+URL_PROMETHEUS = 'http://prometheus:9090'
+
+#Consultas por servidor: nome da coluna -> (PromQL, tipo)
+#'gauge' resume em minimo/media/maximo; 'contador' resume no aumento dentro da janela
+CONSULTAS = {
+    'apache': {
+        'apache_cpuload': ('sum(apache_cpuload)', 'gauge'),
+        'apache_workers_ocupados': ('sum(apache_workers{state="busy"})', 'gauge'),
+        'apache_workers_ociosos': ('sum(apache_workers{state="idle"})', 'gauge'),
+        'apache_acessos': ('sum(apache_accesses_total)', 'contador')
+    },
+    'nginx': {
+        'nginx_conexoes_ativas': ('sum(nginx_connections_active)', 'gauge'),
+        'nginx_conexoes_aceitas': ('sum(nginx_connections_accepted)', 'contador'),
+        'nginx_requisicoes': ('sum(nginx_http_requests_total)', 'contador')
+    }
+}
+
+
+class ColetorPrometheus:
+    #Guarda a janela [inicio, fim] (epoch, segundos) de cada teste e, em coletar(), agrupa janelas
+    #vizinhas em lotes de no maximo `max_pontos` passos: cada metrica e consultada uma vez por lote
+    #e a serie e recortada para cada teste do lote
+    def __init__(self, url=URL_PROMETHEUS, passo=1.0, margem=2.0, max_pontos=10000, timeout=10, sessao=None):
+        self.url = url.rstrip('/')
+        self.passo = passo
+        #Alem do fim da janela: a ultima raspagem da carga pode chegar ate um intervalo depois
+        self.margem = margem
+        self.max_pontos = max_pontos
+        self.timeout = timeout
+        self.sessao = sessao if sessao is not None else requests.Session()
+        self.janelas = []
+        self.consultas_feitas = 0
+
+    def registrar_janela(self, id_teste, servidor, inicio, fim, **identificacao):
+        self.janelas.append({'id_teste': id_teste, 'servidor': servidor, 'inicio': inicio, 'fim': fim,
+                             **identificacao})
+
+    def campos(self):
+        #Colunas fixas (todas as metricas de todos os servidores) para o gravador em CSV
+        campos = []
+        for consultas in CONSULTAS.values():
+            for nome, (_, tipo) in consultas.items():
+                if tipo == 'gauge':
+                    campos += [f'{nome}_min', f'{nome}_media', f'{nome}_max']
+                else:
+                    campos.append(f'{nome}_aumento')
+                campos.append(f'serie_{nome}')
+        return campos
+
+    def consultar_intervalo(self, consulta, inicio, fim):
+        #Pontos [(instante, valor)] da primeira serie retornada por /api/v1/query_range
+        resposta = self.sessao.get(f'{self.url}/api/v1/query_range',
+                                   params={'query': consulta, 'start': f'{inicio:.3f}', 'end': f'{fim:.3f}',
+                                           'step': self.passo},
+                                   timeout=self.timeout)
+        self.consultas_feitas += 1
+        resposta.raise_for_status()
+        dados = resposta.json()
+        if dados.get('status') != 'success':
+            raise ValueError(f"Prometheus: {dados.get('error', 'resposta sem sucesso')}")
+        resultado = dados['data']['result']
+        if not resultado:
+            return []
+        return [(float(instante), float(valor)) for instante, valor in resultado[0]['values']]
+
+    def lotes(self):
+        #Janelas em ordem de inicio, agrupadas enquanto o lote couber em max_pontos passos
+        lotes = []
+        for janela in sorted(self.janelas, key=lambda janela: janela['inicio']):
+            fim = janela['fim'] + self.margem
+            if lotes and (max(lotes[-1]['fim'], fim) - lotes[-1]['inicio']) / self.passo <= self.max_pontos:
+                lotes[-1]['janelas'].append(janela)
+                lotes[-1]['fim'] = max(lotes[-1]['fim'], fim)
+            else:
+                lotes.append({'inicio': janela['inicio'], 'fim': fim, 'janelas': [janela]})
+        return lotes
+
+    def coletar(self):
+        #Retorna uma linha por janela, com identificacao, resumos e series serializadas ("t:v;...")
+        campos = self.campos()
+        linhas = {}
+        for lote in self.lotes():
+            servidores = {janela['servidor'] for janela in lote['janelas']}
+            for servidor in servidores:
+                for nome, (consulta, tipo) in CONSULTAS.get(servidor, {}).items():
+                    try:
+                        pontos = self.consultar_intervalo(consulta, lote['inicio'], lote['fim'])
+                        erro = None
+                    except (requests.RequestException, ValueError, KeyError) as e:
+                        pontos, erro = [], str(e) or type(e).__name__
+                    for janela in lote['janelas']:
+                        if janela['servidor'] != servidor:
+                            continue
+                        linha = linhas.setdefault(janela['id_teste'], self._linha_base(janela, campos))
+                        if erro:
+                            linha['erro'] = erro
+                        recorte = [(instante, valor) for instante, valor in pontos
+                                   if janela['inicio'] <= instante <= janela['fim'] + self.margem]
+                        linha.update(self.resumir(nome, tipo, recorte))
+        #Janelas de servidores sem consultas configuradas ainda geram sua linha (vazia)
+        for janela in self.janelas:
+            linhas.setdefault(janela['id_teste'], self._linha_base(janela, campos))
+        return [linhas[janela['id_teste']] for janela in self.janelas]
+
+    def _linha_base(self, janela, campos):
+        linha = dict(janela)
+        linha['inicio'] = round(janela['inicio'], 3)
+        linha['fim'] = round(janela['fim'], 3)
+        linha.update(dict.fromkeys(campos, ''))
+        linha['erro'] = ''
+        return linha
+
+    @staticmethod
+    def resumir(nome, tipo, pontos):
+        valores = [valor for _, valor in pontos if not math.isnan(valor)]
+        resumo = {f'serie_{nome}': ';'.join(f"{instante:.3f}:{valor:g}" for instante, valor in pontos)}
+        if not valores:
+            return resumo
+        if tipo == 'gauge':
+            resumo[f'{nome}_min'] = round(min(valores), 4)
+            resumo[f'{nome}_media'] = round(sum(valores) / len(valores), 4)
+            resumo[f'{nome}_max'] = round(max(valores), 4)
+        else:
+            #Aumento do contador, tolerando reinicios (valor menor que o anterior recomeca do zero)
+            aumento = 0.0
+            for anterior, atual in zip(valores, valores[1:]):
+                aumento += atual - anterior if atual >= anterior else atual
+            resumo[f'{nome}_aumento'] = round(aumento, 4)
+        return resumo
+
+    def aguardar_ultima_raspagem(self):
+        #A ultima janela so esta completa no Prometheus depois da margem
+        if self.janelas:
+            espera = max(janela['fim'] for janela in self.janelas) + self.margem - time.time()
+            if espera > 0:
+                time.sleep(espera)
+
+    def fechar(self):
+        self.sessao.close()
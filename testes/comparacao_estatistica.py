@@ -0,0 +1,427 @@
+#Comparacao estatistica entre dois servidores a partir das linhas de resultados_testes (uma por execucao):
+#por cenario e metrica, intervalos de confianca por bootstrap (media de cada servidor, diferenca e razao de
+#desempenho), testes de Mann-Whitney e de permutacao, tamanhos de efeito (delta de Cliff e g de Hedges) e
+#p-valores ajustados por Holm dentro de cada cenario. As reamostras sao vetorizadas com NumPy: comparacoes com o mesmo numero de
+#execucoes compartilham as reamostras, expressas como pesos, e sao calculadas juntas por multiplicacao de
+#matrizes, em blocos de memoria limitada
+
+import os
+import sys
+import csv
+import json
+import math
+import argparse
+import time
+
+import numpy as np
+
+from gravadores import FORMATOS, abrir_gravador
+
+#Colunas que identificam um cenario (tudo o que foi configurado, exceto o servidor e a execucao)
+CHAVE_CENARIO = ('teste', 'caminho', 'mistura', 'modo_conexao', 'motor', 'num_processos', 'profundidade_pipeline',
+                 'modo_carga', 'taxa_alvo_rps', 'chegadas', 'num_requisicoes', 'num_threads')
+
+#Metricas comparadas e o sentido em que sao melhores
+METRICAS = {
+    'requisicoes_por_segundo': 'maior',
+    'latencia_media_ms': 'menor',
+    'latencia_p50_ms': 'menor',
+    'latencia_p95_ms': 'menor',
+    'latencia_p99_ms': 'menor',
+    'latencia_p999_ms': 'menor',
+    'taxa_erro_%': 'menor',
+    'cpu_ms_por_requisicao': 'menor',
+    'rss_pico_mib': 'menor'
+}
+
+REAMOSTRAS = 10000
+PERMUTACOES = 10000
+CONFIANCA = 0.95
+ALFA = 0.05
+
+#Elementos de cada matriz de reamostras (comparacoes x reamostras) por bloco: ~32 MiB de float64
+LIMITE_ELEMENTOS = 4 * 1024 * 1024
+
+#Maior total de execucoes (A + B) com a distribuicao exata do Mann-Whitney; acima, aproximacao normal
+LIMITE_MW_EXATO = 60
+
+#Limiares usuais de magnitude do delta de Cliff (Romano et al., 2006)
+MAGNITUDES_CLIFF = ((0.147, 'desprezivel'), (0.33, 'pequeno'), (0.474, 'medio'), (float('inf'), 'grande'))
+
+
+def ler_resultados(arquivo):
+    #Linhas de resultados_testes.csv ou .ndjson (gravadores.py)
+    with open(arquivo, encoding='utf-8', newline='') as f:
+        if arquivo.endswith('.ndjson'):
+            return [json.loads(linha) for linha in f if linha.strip()]
+        return list(csv.DictReader(f))
+
+
+def numero(valor):
+    #Valor numerico da coluna, ou None quando vazio (N/A) ou invalido
+    if valor is None or valor == '':
+        return None
+    try:
+        valor = float(valor)
+    except (TypeError, ValueError):
+        return None
+    return valor if math.isfinite(valor) else None
+
+
+def agrupar(linhas, servidores, metricas):
+    #{chave do cenario: {'valores': {(servidor, metrica): [..]}, 'execucoes': {servidor: n},
+    #'limitadas': {servidor: n}}}, na ordem em que os cenarios aparecem; so linhas do teste inteiro
+    cenarios = {}
+    for linha in linhas:
+        servidor = linha.get('servidor')
+        if servidor not in servidores or linha.get('recorte', 'total') != 'total':
+            continue
+        chave = tuple(str(linha.get(coluna, '') or '') for coluna in CHAVE_CENARIO)
+        cenario = cenarios.setdefault(chave, {'valores': {}, 'execucoes': dict.fromkeys(servidores, 0),
+                                              'limitadas': dict.fromkeys(servidores, 0)})
+        cenario['execucoes'][servidor] += 1
+        if linha.get('gerador_limitado') in ('sim', True):
+            cenario['limitadas'][servidor] += 1
+        for metrica in metricas:
+            valor = numero(linha.get(metrica))
+            if valor is not None:
+                cenario['valores'].setdefault((servidor, metrica), []).append(valor)
+    return cenarios
+
+
+def pesos_bootstrap(gerador, n, reamostras):
+    #Cada reamostra com reposicao como pesos (R x n): vezes que cada execucao foi sorteada, dividido por n;
+    #valores @ pesos.T e a media de cada linha em cada reamostra, numa unica multiplicacao de matrizes
+    return gerador.multinomial(n, np.full(n, 1 / n), size=reamostras) / n
+
+
+def pesos_permutacao(gerador, n_a, n_b, permutacoes):
+    #Cada permutacao dos rotulos como pesos (P x N): +1/n_a nas posicoes sorteadas para A e -1/n_b nas demais;
+    #combinada @ pesos.T e a diferenca das medias sob cada permutacao
+    ordem = np.argsort(gerador.random((permutacoes, n_a + n_b)), axis=1)
+    pesos = np.full((permutacoes, n_a + n_b), -1 / n_b)
+    np.put_along_axis(pesos, ordem[:, :n_a], 1 / n_a, axis=1)
+    return pesos
+
+
+def intervalos_bootstrap(a, b, maior, pesos_a, pesos_b, caudas):
+    #IC das medias de A e B, da diferenca A - B e da razao de desempenho para linhas de a (G x n_a) e b (G x n_b)
+    #Retorna quatro matrizes 2 x G (limite inferior e superior)
+    medias_a = a @ pesos_a.T
+    medias_b = b @ pesos_b.T
+    numerador = np.where(maior[:, None], medias_a, medias_b)
+    denominador = np.where(maior[:, None], medias_b, medias_a)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        razoes = np.where(denominador > 0, numerador / denominador, np.nan)
+    #Reamostras com denominador 0 sao ignoradas (nanpercentile, lento, so nas linhas que as tem); razao sem
+    #nenhuma reamostra valida (ex.: taxa de erro sempre 0) fica sem intervalo
+    ic_razao = np.full((2, len(a)), np.nan)
+    finitas = np.isfinite(razoes)
+    completas = finitas.all(axis=1)
+    parciais = finitas.any(axis=1) & ~completas
+    if completas.any():
+        ic_razao[:, completas] = np.percentile(razoes[completas], caudas, axis=1)
+    if parciais.any():
+        ic_razao[:, parciais] = np.nanpercentile(razoes[parciais], caudas, axis=1)
+    return (np.percentile(medias_a, caudas, axis=1), np.percentile(medias_b, caudas, axis=1),
+            np.percentile(medias_a - medias_b, caudas, axis=1), ic_razao)
+
+
+def p_permutacao(a, b, pesos):
+    #P-valor bilateral do teste de permutacao da diferenca das medias, por linha (+1: nunca retorna 0)
+    observada = a.mean(axis=1) - b.mean(axis=1)
+    permutadas = np.concatenate((a, b), axis=1) @ pesos.T
+    tolerancia = 1e-9 * np.maximum(np.abs(observada), 1.0)
+    extremas = (np.abs(permutadas) >= (np.abs(observada) - tolerancia)[:, None]).sum(axis=1)
+    return (extremas + 1) / (len(pesos) + 1)
+
+
+def postos(valores):
+    #Postos (1..N) com empates recebendo o posto medio; retorna (postos, tamanhos dos grupos empatados)
+    ordem = np.argsort(valores, kind='mergesort')
+    _, inicios, contagens = np.unique(valores[ordem], return_index=True, return_counts=True)
+    resultado = np.empty(len(valores))
+    resultado[ordem] = np.repeat(inicios + (contagens + 1) / 2, contagens)
+    return resultado, contagens
+
+
+#Distribuicoes exatas ja calculadas, por (postos dobrados em ordem, n_a); sem empates, uma por (n_a, n_b)
+_distribuicoes = {}
+
+
+def distribuicao_soma_postos(postos_dobrados, n_a):
+    #Quantos subconjuntos de n_a das N execucoes tem cada soma de postos (dobrados: inteiros mesmo com os postos
+    #medios dos empates), condicionada aos postos observados. Programacao dinamica como na mochila 0/1:
+    #contagens[k, s] = subconjuntos de k execucoes com soma s
+    chave = (postos_dobrados, n_a)
+    distribuicao = _distribuicoes.get(chave)
+    if distribuicao is None:
+        total = sum(postos_dobrados)
+        contagens = np.zeros((n_a + 1, total + 1))
+        contagens[0, 0] = 1
+        for posto in postos_dobrados:
+            contagens[1:, posto:] += contagens[:-1, :total + 1 - posto].copy()
+        distribuicao = _distribuicoes[chave] = contagens[n_a]
+    return distribuicao
+
+
+def mann_whitney(a, b):
+    #U de `a`, delta de Cliff e p-valor bilateral; retorna (u, delta, p, metodo)
+    #Ate LIMITE_MW_EXATO execucoes, p exato pela distribuicao da soma dos postos (com empates, condicionada a
+    #eles); acima, aproximacao normal com correcao de empates e de continuidade
+    n_a, n_b = len(a), len(b)
+    total = n_a + n_b
+    r, empates = postos(np.concatenate((a, b)))
+    u = r[:n_a].sum() - n_a * (n_a + 1) / 2
+    delta = 2 * u / (n_a * n_b) - 1
+    if total <= LIMITE_MW_EXATO:
+        dobrados = (2 * r).astype(int)
+        distribuicao = distribuicao_soma_postos(tuple(sorted(dobrados.tolist())), n_a)
+        esperada = n_a * (total + 1)
+        distancia = abs(int(dobrados[:n_a].sum()) - esperada)
+        somas = np.arange(len(distribuicao))
+        extremas = distribuicao[np.abs(somas - esperada) >= distancia].sum()
+        return u, delta, min(float(extremas / distribuicao.sum()), 1.0), 'exato'
+    variancia = n_a * n_b / 12 * ((total + 1) - (empates ** 3 - empates).sum() / (total * (total - 1)))
+    if variancia <= 0:
+        return u, delta, 1.0, 'normal'
+    z = max(abs(u - n_a * n_b / 2) - 0.5, 0.0) / math.sqrt(variancia)
+    return u, delta, math.erfc(z / math.sqrt(2)), 'normal'
+
+
+def hedges_g(a, b):
+    #Diferenca padronizada das medias com correcao para amostras pequenas; None sem variancia
+    n_a, n_b = len(a), len(b)
+    combinado = ((n_a - 1) * a.var(ddof=1) + (n_b - 1) * b.var(ddof=1)) / (n_a + n_b - 2)
+    if combinado <= 0:
+        return None
+    return (a.mean() - b.mean()) / math.sqrt(combinado) * (1 - 3 / (4 * (n_a + n_b) - 9))
+
+
+def ajustar_holm(p_valores):
+    #P-valores ajustados por Holm-Bonferroni (controle do erro familiar entre as comparacoes da familia)
+    p = np.asarray(p_valores, dtype=float)
+    if not len(p):
+        return p
+    ordem = np.argsort(p)
+    ajustados = np.maximum.accumulate(p[ordem] * (len(p) - np.arange(len(p))))
+    resultado = np.empty(len(p))
+    resultado[ordem] = np.minimum(ajustados, 1.0)
+    return resultado
+
+
+def magnitude_cliff(delta):
+    return next(nome for limite, nome in MAGNITUDES_CLIFF if abs(delta) < limite)
+
+
+def comparar(linhas, servidor_a='nginx', servidor_b='apache', metricas=None, reamostras=REAMOSTRAS,
+             permutacoes=PERMUTACOES, confianca=CONFIANCA, alfa=ALFA, semente=None):
+    #Uma comparacao por cenario e metrica com pelo menos 2 execucoes de cada servidor
+    #razao: desempenho de A sobre B no sentido da metrica (> 1: A melhor), ou seja, media_a / media_b para
+    #metricas em que maior e melhor e media_b / media_a para as demais
+    metricas = metricas or METRICAS
+    gerador = np.random.default_rng(semente)
+    cenarios = agrupar(linhas, (servidor_a, servidor_b), metricas)
+    comparacoes = []
+    for chave, cenario in cenarios.items():
+        for metrica in metricas:
+            a = np.array(cenario['valores'].get((servidor_a, metrica), []))
+            b = np.array(cenario['valores'].get((servidor_b, metrica), []))
+            if len(a) >= 2 and len(b) >= 2:
+                comparacoes.append({'chave': chave, 'cenario': cenario, 'metrica': metrica, 'a': a, 'b': b})
+
+    #Comparacoes com as mesmas quantidades de execucoes compartilham as matrizes de reamostras e permutacoes
+    caudas = [(1 - confianca) / 2 * 100, (1 + confianca) / 2 * 100]
+    por_tamanho = {}
+    for comparacao in comparacoes:
+        por_tamanho.setdefault((len(comparacao['a']), len(comparacao['b'])), []).append(comparacao)
+    #Linhas por bloco: as matrizes de reamostras (linhas x reamostras) ficam em LIMITE_ELEMENTOS
+    passo = max(1, LIMITE_ELEMENTOS // max(reamostras, permutacoes))
+    for (n_a, n_b), grupo in por_tamanho.items():
+        pesos_a = pesos_bootstrap(gerador, n_a, reamostras)
+        pesos_b = pesos_bootstrap(gerador, n_b, reamostras)
+        pesos_p = pesos_permutacao(gerador, n_a, n_b, permutacoes)
+        for inicio in range(0, len(grupo), passo):
+            bloco = grupo[inicio:inicio + passo]
+            a = np.stack([c['a'] for c in bloco])
+            b = np.stack([c['b'] for c in bloco])
+            maior = np.array([metricas[c['metrica']] == 'maior' for c in bloco])
+            ic_a, ic_b, ic_diferenca, ic_razao = intervalos_bootstrap(a, b, maior, pesos_a, pesos_b, caudas)
+            p_valores = p_permutacao(a, b, pesos_p)
+            for i, comparacao in enumerate(bloco):
+                comparacao.update({
+                    'ic_a': ic_a[:, i], 'ic_b': ic_b[:, i], 'ic_diferenca': ic_diferenca[:, i],
+                    'ic_razao': ic_razao[:, i], 'maior': bool(maior[i]), 'p_permutacao': float(p_valores[i])
+                })
+
+    for comparacao in comparacoes:
+        a, b = comparacao['a'], comparacao['b']
+        u, delta, p, metodo = mann_whitney(a, b)
+        comparacao.update({'u': u, 'delta': delta, 'p_mann_whitney': p, 'metodo_mann_whitney': metodo,
+                           'g': hedges_g(a, b)})
+    #Familias de Holm: as metricas de um mesmo cenario, com tamanho fixo qualquer que seja a campanha. Ajustar
+    #entre todas as comparacoes do arquivo exigiria, com centenas delas, p-valores menores do que 10 execucoes
+    #por servidor conseguem produzir
+    familias = {}
+    for comparacao in comparacoes:
+        familias.setdefault(comparacao['chave'], []).append(comparacao)
+    for familia in familias.values():
+        for comparacao, ajustado in zip(familia, ajustar_holm([c['p_mann_whitney'] for c in familia])):
+            comparacao['p_holm'] = float(ajustado)
+            comparacao['familia_holm'] = len(familia)
+
+    return [linha_comparacao(c, servidor_a, servidor_b, confianca, alfa, reamostras, permutacoes)
+            for c in comparacoes]
+
+
+def arredondar(valor, casas=4):
+    return round(float(valor), casas) if valor is not None and math.isfinite(valor) else ''
+
+
+def linha_comparacao(c, servidor_a, servidor_b, confianca, alfa, reamostras, permutacoes):
+    #Linha de saida com colunas fixas (vazio quando nao se aplica)
+    a, b = c['a'], c['b']
+    media_a, media_b = a.mean(), b.mean()
+    if c['maior']:
+        razao = media_a / media_b if media_b > 0 else None
+    else:
+        razao = media_b / media_a if media_a > 0 else None
+    significativo = c['p_holm'] < alfa
+    vencedor = ''
+    if significativo:
+        #delta > 0: valores de A tendem a ser maiores
+        vencedor = servidor_a if (c['delta'] > 0) == c['maior'] else servidor_b
+    return {
+        **dict(zip(CHAVE_CENARIO, c['chave'])),
+        'metrica': c['metrica'],
+        'melhor': 'maior' if c['maior'] else 'menor',
+        'servidor_a': servidor_a,
+        'servidor_b': servidor_b,
+        'execucoes_a': len(a),
+        'execucoes_b': len(b),
+        'execucoes_gerador_limitado': c['cenario']['limitadas'][servidor_a] + c['cenario']['limitadas'][servidor_b],
+        'media_a': arredondar(media_a),
+        'ic_media_a_inf': arredondar(c['ic_a'][0]),
+        'ic_media_a_sup': arredondar(c['ic_a'][1]),
+        'mediana_a': arredondar(np.median(a)),
+        'media_b': arredondar(media_b),
+        'ic_media_b_inf': arredondar(c['ic_b'][0]),
+        'ic_media_b_sup': arredondar(c['ic_b'][1]),
+        'mediana_b': arredondar(np.median(b)),
+        'diferenca': arredondar(media_a - media_b),
+        'ic_diferenca_inf': arredondar(c['ic_diferenca'][0]),
+        'ic_diferenca_sup': arredondar(c['ic_diferenca'][1]),
+        'razao': arredondar(razao),
+        'ic_razao_inf': arredondar(c['ic_razao'][0]) if razao is not None else '',
+        'ic_razao_sup': arredondar(c['ic_razao'][1]) if razao is not None else '',
+        'u_mann_whitney': arredondar(c['u'], 1),
+        'p_mann_whitney': arredondar(c['p_mann_whitney'], 6),
+        'metodo_mann_whitney': c['metodo_mann_whitney'],
+        'p_permutacao': arredondar(c['p_permutacao'], 6),
+        'p_holm': arredondar(c['p_holm'], 6),
+        'familia_holm': c['familia_holm'],
+        'delta_cliff': arredondar(c['delta']),
+        'magnitude': magnitude_cliff(c['delta']),
+        'g_hedges': arredondar(c['g']),
+        'significativo': 'sim' if significativo else 'nao',
+        'vencedor': vencedor,
+        'confianca': confianca,
+        'reamostras': reamostras,
+        'permutacoes': permutacoes
+    }
+
+
+def intervalo(media, inferior, superior):
+    return f"{media:.2f} [{inferior:.2f}, {superior:.2f}]"
+
+
+def descrever_cenario(linha):
+    partes = [linha['teste'] or linha['caminho']]
+    if linha['teste'] and linha['caminho']:
+        partes.append(linha['caminho'])
+    partes.append(f"{linha['num_threads']}u {linha['motor']} {linha['modo_conexao']}")
+    return ' | '.join(parte for parte in partes if parte)
+
+
+def imprimir_resumo(linhas):
+    #Tabela por cenario: medias com IC, razao com IC, p de Holm, delta de Cliff e vencedor
+    anterior = None
+    for linha in linhas:
+        cenario = descrever_cenario(linha)
+        if cenario != anterior:
+            print(f"\n{cenario}" + (f"  [AVISO] {linha['execucoes_gerador_limitado']} execucoes com o gerador no limite"
+                                    if linha['execucoes_gerador_limitado'] else ''))
+            print(f"  {'Metrica':<24} {linha['servidor_a']:>24} {linha['servidor_b']:>24} {'Razao A/B':>22} "
+                  f"{'p (Holm)':>9} {'Cliff':>6}  Vencedor")
+            anterior = cenario
+        razao = (intervalo(linha['razao'], linha['ic_razao_inf'], linha['ic_razao_sup'])
+                 if linha['ic_razao_inf'] != '' else '-')
+        print(f"  {linha['metrica']:<24} "
+              f"{intervalo(linha['media_a'], linha['ic_media_a_inf'], linha['ic_media_a_sup']):>24} "
+              f"{intervalo(linha['media_b'], linha['ic_media_b_inf'], linha['ic_media_b_sup']):>24} "
+              f"{razao:>22} {linha['p_holm']:>9.4f} {linha['delta_cliff']:>6.2f}  {linha['vencedor'] or '-'}")
+
+
+def comparar_arquivo(arquivo, saida, formato='csv', servidores=('nginx', 'apache'), metricas=None,
+                     reamostras=REAMOSTRAS, permutacoes=PERMUTACOES, confianca=CONFIANCA, alfa=ALFA, semente=None):
+    #Le os resultados, imprime o resumo por cenario e grava uma linha por comparacao em `saida`.<formato>
+    linhas = ler_resultados(arquivo)
+    inicio = time.perf_counter()
+    metricas = {metrica: METRICAS[metrica] for metrica in metricas} if metricas else None
+    resultado = comparar(linhas, *servidores, metricas, reamostras, permutacoes, confianca, alfa, semente)
+    duracao = time.perf_counter() - inicio
+    if not resultado:
+        print(f"[AVISO] Nenhum cenario com pelo menos 2 execucoes de {' e '.join(servidores)} em {arquivo}")
+        return resultado
+
+    imprimir_resumo(resultado)
+    os.makedirs(os.path.dirname(saida) or '.', exist_ok=True)
+    gravador = abrir_gravador(saida, formato)
+    for linha in resultado:
+        gravador.escrever(linha)
+    gravador.fechar()
+    significativas = sum(linha['significativo'] == 'sim' for linha in resultado)
+    print(f"\n[INFO] {len(resultado)} comparacoes ({significativas} significativas a {alfa:g} apos Holm por cenario) "
+          f"em {duracao:.2f}s, {reamostras} reamostras e {permutacoes} permutacoes cada")
+    print(f"[INFO] Salvo em {gravador.arquivo}")
+    return resultado
+
+
+def principal():
+    parser = argparse.ArgumentParser(description='Compara dois servidores por cenario com intervalos de confianca '
+                                                 'por bootstrap, testes de significancia e tamanhos de efeito')
+    parser.add_argument('--arquivo', default=os.path.join('resultados', 'resultados_testes.csv'),
+                        help='Resultados do teste de carga (.csv ou .ndjson; padrao: resultados/resultados_testes.csv)')
+    parser.add_argument('--servidores', nargs=2, default=('nginx', 'apache'), metavar=('A', 'B'),
+                        help='Servidores comparados (padrao: nginx apache); a razao e o desempenho de A sobre B')
+    parser.add_argument('--metricas', nargs='+', choices=list(METRICAS), help='Metricas comparadas (padrao: todas)')
+    parser.add_argument('--reamostras', type=int, default=REAMOSTRAS, help=f'Reamostras de bootstrap (padrao: {REAMOSTRAS})')
+    parser.add_argument('--permutacoes', type=int, default=PERMUTACOES,
+                        help=f'Permutacoes do teste de permutacao (padrao: {PERMUTACOES})')
+    parser.add_argument('--confianca', type=float, default=CONFIANCA, help=f'Nivel dos intervalos (padrao: {CONFIANCA})')
+    parser.add_argument('--alfa', type=float, default=ALFA,
+                        help=f'Nivel de significancia sobre o p-valor ajustado por Holm em cada cenario (padrao: {ALFA})')
+    parser.add_argument('--semente', type=int, help='Semente das reamostras (resultados reprodutiveis)')
+    parser.add_argument('--saida', default=os.path.join('resultados', 'comparacao_estatistica'),
+                        help='Arquivo de saida, sem extensao (padrao: resultados/comparacao_estatistica)')
+    parser.add_argument('--formato', choices=FORMATOS, default='csv', help='Formato da saida (padrao: csv)')
+    args = parser.parse_args()
+    if args.reamostras < 1 or args.permutacoes < 1:
+        parser.error("--reamostras e --permutacoes devem ser positivos")
+    if not 0 < args.confianca < 1 or not 0 < args.alfa < 1:
+        parser.error("--confianca e --alfa devem estar entre 0 e 1")
+
+    try:
+        resultado = comparar_arquivo(args.arquivo, args.saida, args.formato, servidores=args.servidores,
+                                     metricas=args.metricas, reamostras=args.reamostras,
+                                     permutacoes=args.permutacoes, confianca=args.confianca, alfa=args.alfa,
+                                     semente=args.semente)
+    except (OSError, ValueError) as e:
+        print(f"[ERRO] Nao foi possivel ler {args.arquivo}: {e}")
+        sys.exit(1)
+    if not resultado:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    principal()
@@ -0,0 +1,218 @@
+#Endpoint /metrics do proprio gerador de carga, no formato texto do Prometheus, para o Grafana
+#sobrepor a latencia vista pelo cliente a carga dos servidores durante os testes
+
+import math
+import multiprocessing
+import os
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+#Porta padrao do exportador (job 'cliente_carga' em docker/prometheus.yml)
+PORTA_METRICAS = 9400
+
+#Limites superiores (segundos) dos buckets do histograma de latencia
+LIMITES_LATENCIA = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+#Posicoes no vetor compartilhado da serie em andamento
+REQUISICOES = 0
+ERROS = 1
+EM_VOO = 2
+SOMA_LATENCIA = 3
+SEGUNDO = 4             #Segundo monotonico da ultima requisicao concluida
+CONTAGEM_SEGUNDO = 5    #Requisicoes concluidas nesse segundo
+RPS = 6                 #Requisicoes concluidas no segundo completo anterior
+BUCKETS = 7             #Contagem por bucket (nao cumulativa), mais o bucket +Inf
+TAMANHO = BUCKETS + len(LIMITES_LATENCIA) + 1
+
+#Slots da serie em andamento: cada thread de cada processo escreve so no seu, sem trava, e o /metrics
+#soma todos. O slot 0 e o de reserva, protegido pela trava, para as threads alem de SLOTS num mesmo teste
+SLOTS = 1024
+
+
+class ExportadorMetricas:
+    #Cada teste tem um unico par de rotulos (servidor, cenario), definido pelo processo pai antes
+    #do disparo; a serie em andamento fica num vetor em memoria compartilhada, entao threads e
+    #processos trabalhadores (fork) atualizam os mesmos contadores, cada um no seu slot. Ao trocar de
+    #teste, os slots sao somados aos acumulados da serie anterior, que continua exposta com seus totais
+    def __init__(self, porta=PORTA_METRICAS, endereco='0.0.0.0'):
+        contexto = multiprocessing.get_context('fork')
+        #A trava so e tomada ao reservar um slot (uma vez por thread e teste), no slot de reserva,
+        #na troca de teste e na leitura; o caminho de cada requisicao nao a usa
+        self.trava = contexto.Lock()
+        self.valores = contexto.RawArray('d', (SLOTS + 1) * TAMANHO)
+        self.proximo_slot = contexto.RawValue('i', 1)
+        self.geracao = contexto.RawValue('i', 0)
+        self.local = threading.local()
+        self.rotulos = None
+        self.acumulados = {}
+        self.porta = porta
+        self.endereco = endereco
+        self.servidor_http = None
+
+    def iniciar(self):
+        exportador = self
+
+        class Tratador(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split('?', 1)[0] != '/metrics':
+                    self.send_error(404)
+                    return
+                corpo = exportador.renderizar().encode('utf-8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(corpo)))
+                self.end_headers()
+                self.wfile.write(corpo)
+
+            def log_message(self, *args):
+                pass
+
+        self.servidor_http = ThreadingHTTPServer((self.endereco, self.porta), Tratador)
+        self.servidor_http.daemon_threads = True
+        self.porta = self.servidor_http.server_address[1]
+        threading.Thread(target=self.servidor_http.serve_forever, daemon=True).start()
+
+    def parar(self):
+        if self.servidor_http is not None:
+            self.servidor_http.shutdown()
+            self.servidor_http.server_close()
+            self.servidor_http = None
+
+    def definir_contexto(self, servidor, cenario):
+        with self.trava:
+            self._acumular()
+            self.rotulos = (servidor, cenario)
+
+    def _slot(self):
+        #Inicio do slot desta thread no vetor; reservado na primeira requisicao da thread em cada
+        #processo e teste (o fork herda o threading.local, por isso o pid faz parte da chave)
+        local = self.local
+        chave = (os.getpid(), self.geracao.value)
+        if getattr(local, 'chave', None) != chave:
+            with self.trava:
+                chave = (os.getpid(), self.geracao.value)
+                slot = self.proximo_slot.value
+                if slot <= SLOTS:
+                    self.proximo_slot.value = slot + 1
+                else:
+                    slot = 0
+            local.chave = chave
+            local.inicio = slot * TAMANHO
+        return local.inicio
+
+    def requisicao_iniciada(self, quantidade=1):
+        inicio = self._slot()
+        if inicio == 0:
+            with self.trava:
+                self.valores[EM_VOO] += quantidade
+        else:
+            self.valores[inicio + EM_VOO] += quantidade
+
+    def requisicao_concluida(self, sucesso, latencia):
+        #latencia em segundos
+        indice = BUCKETS
+        while indice < TAMANHO - 1 and latencia > LIMITES_LATENCIA[indice - BUCKETS]:
+            indice += 1
+        inicio = self._slot()
+        if inicio == 0:
+            with self.trava:
+                self._registrar(0, sucesso, latencia, indice)
+        else:
+            self._registrar(inicio, sucesso, latencia, indice)
+
+    def _registrar(self, inicio, sucesso, latencia, indice):
+        #So a thread dona do slot escreve nele (ou quem tem a trava, no slot de reserva)
+        segundo = int(time.monotonic())
+        valores = self.valores
+        valores[inicio + EM_VOO] -= 1
+        valores[inicio + REQUISICOES] += 1
+        if not sucesso:
+            valores[inicio + ERROS] += 1
+        valores[inicio + SOMA_LATENCIA] += latencia
+        valores[inicio + indice] += 1
+        if segundo != valores[inicio + SEGUNDO]:
+            anterior = valores[inicio + SEGUNDO]
+            valores[inicio + RPS] = valores[inicio + CONTAGEM_SEGUNDO] if segundo == anterior + 1 else 0
+            valores[inicio + SEGUNDO] = segundo
+            valores[inicio + CONTAGEM_SEGUNDO] = 0
+        valores[inicio + CONTAGEM_SEGUNDO] += 1
+
+    def _somar_slots(self, agora):
+        #Soma dos slots da serie em andamento; o RPS de cada slot so conta se for do segundo anterior
+        valores = list(self.valores)
+        soma = [0.0] * TAMANHO
+        for inicio in range(0, len(valores), TAMANHO):
+            slot = valores[inicio:inicio + TAMANHO]
+            for indice in (REQUISICOES, ERROS, EM_VOO, SOMA_LATENCIA, *range(BUCKETS, TAMANHO)):
+                soma[indice] += slot[indice]
+            if agora == slot[SEGUNDO]:
+                soma[RPS] += slot[RPS]
+            elif agora == slot[SEGUNDO] + 1:
+                soma[RPS] += slot[CONTAGEM_SEGUNDO]
+        return soma
+
+    def _acumular(self):
+        #Chamado com a trava: soma a serie em andamento aos acumulados dos seus rotulos, zera os slots e
+        #abre uma nova geracao, para as threads do proximo teste reservarem slots de novo
+        if self.rotulos is not None:
+            atual = self._somar_slots(int(time.monotonic()))
+            acumulado = self.acumulados.setdefault(self.rotulos, [0.0] * TAMANHO)
+            for indice in (REQUISICOES, ERROS, SOMA_LATENCIA, *range(BUCKETS, TAMANHO)):
+                acumulado[indice] += atual[indice]
+        for indice in range(len(self.valores)):
+            self.valores[indice] = 0.0
+        self.proximo_slot.value = 1
+        self.geracao.value += 1
+
+    def renderizar(self):
+        agora = int(time.monotonic())
+        with self.trava:
+            series = {rotulos: list(valores) for rotulos, valores in self.acumulados.items()}
+            atual = self._somar_slots(agora)
+            rotulos_atuais = self.rotulos
+        if rotulos_atuais is not None:
+            #Em andamento: contadores somados aos acumulados; gauges so da serie atual
+            serie = series.setdefault(rotulos_atuais, [0.0] * TAMANHO)
+            for indice in (REQUISICOES, ERROS, SOMA_LATENCIA, *range(BUCKETS, TAMANHO)):
+                serie[indice] += atual[indice]
+            serie[EM_VOO] = atual[EM_VOO]
+            serie[RPS] = atual[RPS]
+
+        linhas = [
+            '# HELP cliente_requisicoes_total Requisicoes concluidas pelo gerador de carga',
+            '# TYPE cliente_requisicoes_total counter'
+        ]
+        for rotulos, serie in series.items():
+            linhas.append(f'cliente_requisicoes_total{{{self._rotulos(rotulos)}}} {serie[REQUISICOES]:.0f}')
+        linhas += ['# HELP cliente_erros_total Requisicoes com falha (conexao, timeout, resposta truncada)',
+                   '# TYPE cliente_erros_total counter']
+        for rotulos, serie in series.items():
+            linhas.append(f'cliente_erros_total{{{self._rotulos(rotulos)}}} {serie[ERROS]:.0f}')
+        linhas += ['# HELP cliente_requisicoes_em_voo Requisicoes enviadas aguardando resposta',
+                   '# TYPE cliente_requisicoes_em_voo gauge']
+        for rotulos, serie in series.items():
+            linhas.append(f'cliente_requisicoes_em_voo{{{self._rotulos(rotulos)}}} {serie[EM_VOO]:.0f}')
+        linhas += ['# HELP cliente_rps Requisicoes concluidas no ultimo segundo completo',
+                   '# TYPE cliente_rps gauge']
+        for rotulos, serie in series.items():
+            linhas.append(f'cliente_rps{{{self._rotulos(rotulos)}}} {serie[RPS]:.0f}')
+        linhas += ['# HELP cliente_latencia_segundos Tempo de resposta medido pelo cliente',
+                   '# TYPE cliente_latencia_segundos histogram']
+        for rotulos, serie in series.items():
+            texto = self._rotulos(rotulos)
+            acumulado = 0.0
+            for limite, contagem in zip(LIMITES_LATENCIA + (math.inf,), serie[BUCKETS:]):
+                acumulado += contagem
+                le = '+Inf' if limite == math.inf else repr(limite)
+                linhas.append(f'cliente_latencia_segundos_bucket{{{texto},le="{le}"}} {acumulado:.0f}')
+            linhas.append(f'cliente_latencia_segundos_sum{{{texto}}} {serie[SOMA_LATENCIA]!r}')
+            linhas.append(f'cliente_latencia_segundos_count{{{texto}}} {acumulado:.0f}')
+        return '\n'.join(linhas) + '\n'
+
+    @staticmethod
+    def _rotulos(rotulos):
+        servidor, cenario = rotulos
+        servidor = servidor.replace('\\', '\\\\').replace('"', '\\"')
+        cenario = cenario.replace('\\', '\\\\').replace('"', '\\"')
+        return f'servidor="{servidor}",cenario="{cenario}"'
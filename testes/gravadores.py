@@ -0,0 +1,267 @@
+#Gravadores de resultados em fluxo: cada linha vai para o disco assim que e produzida,
+#sem acumular a campanha inteira em memoria
+
+import csv
+import io
+import json
+import os
+import sys
+import threading
+from array import array
+
+try:
+    import fcntl
+except ImportError:  #Windows
+    fcntl = None
+
+#Formatos disponiveis (extensao do arquivo gerado)
+FORMATOS = ('csv', 'ndjson')
+
+#Amostras por requisicao tambem podem ir para o formato colunar binario
+FORMATOS_AMOSTRAS = FORMATOS + ('colunar',)
+
+
+class GravadorCSV:
+    #CSV com o cabecalho tirado da primeira linha; todas as linhas devem ter as mesmas colunas
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.f = open(arquivo, 'w', newline='', encoding='utf-8')
+        self.escritor = None
+        self.linhas = 0
+
+    def escrever(self, linha):
+        if self.escritor is None:
+            self.escritor = csv.DictWriter(self.f, fieldnames=list(linha))
+            self.escritor.writeheader()
+        self.escritor.writerow(linha)
+        #Flush por linha: uma queda no meio da campanha perde no maximo a linha em andamento
+        self.f.flush()
+        self.linhas += 1
+
+    def fechar(self):
+        if not self.f.closed:
+            self.f.close()
+
+
+class GravadorNDJSON:
+    #Um objeto JSON por linha; colunas podem variar entre linhas
+    def __init__(self, arquivo):
+        self.arquivo = arquivo
+        self.f = open(arquivo, 'w', encoding='utf-8')
+        self.linhas = 0
+
+    def escrever(self, linha):
+        self.f.write(json.dumps(linha, ensure_ascii=False) + '\n')
+        self.f.flush()
+        self.linhas += 1
+
+    def fechar(self):
+        if not self.f.closed:
+            self.f.close()
+
+
+def abrir_gravador(caminho_base, formato='csv'):
+    #Abre (truncando) `caminho_base.<formato>` e retorna o gravador correspondente
+    if formato not in FORMATOS:
+        raise ValueError(f"Formato de resultados invalido: {formato}")
+    arquivo = f"{caminho_base}.{formato}"
+    return GravadorCSV(arquivo) if formato == 'csv' else GravadorNDJSON(arquivo)
+
+
+class GravadorAmostras:
+    #Uma linha por requisicao, gravada em blocos a partir de todas as threads do gerador
+    #  - cada thread acumula ate `capacidade` amostras no seu proprio buffer, sem trava no caminho quente
+    #  - buffer cheio vira um unico os.write num descritor O_APPEND: blocos de threads e de processos
+    #    (fork) diferentes nunca se intercalam no meio de uma linha
+    #  - descarregar() grava o que sobrou nos buffers ao fim de cada teste
+    #Memoria maxima: threads ativas x capacidade amostras
+    CAMPOS = ('instante', 'execucao', 'teste', 'servidor', 'caminho', 'sucesso', 'codigo_status',
+              'tempo_resposta_ms', 'tempo_corrigido_ms', 'fase_conexao_ms', 'fase_envio_ms',
+              'fase_primeiro_byte_ms', 'fase_cabecalho_ms', 'fase_corpo_ms', 'bytes_corpo', 'bytes_fio',
+              'conexao_reutilizada')
+    FASES = ('conexao', 'envio', 'primeiro_byte', 'cabecalho', 'corpo')
+
+    def __init__(self, caminho_base, formato='csv', capacidade=256):
+        if formato not in FORMATOS:
+            raise ValueError(f"Formato de amostras invalido: {formato}")
+        self.arquivo = f"{caminho_base}.{formato}"
+        self.formato = formato
+        self.fd = os.open(self.arquivo, os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644)
+        self._iniciar_buffers(capacidade)
+        if formato == 'csv':
+            self._gravar_bytes((','.join(self.CAMPOS) + '\r\n').encode('utf-8'))
+
+    def _iniciar_buffers(self, capacidade):
+        self.capacidade = capacidade
+        self.trava = threading.Lock()
+        self.local = threading.local()
+        self.buffers = []
+        #Identificacao do teste em andamento, repetida em cada amostra
+        self.contexto = (1, '', '', '')
+
+    def definir_contexto(self, execucao, teste, servidor, caminho, caminhos=()):
+        #`caminhos`: os caminhos sorteados na carga mista, cujas amostras levam o proprio caminho
+        self.contexto = (execucao or 1, teste, servidor, caminho)
+
+    def registrar(self, instante_ns, resumo):
+        #`instante_ns`: fim da requisicao em time.time_ns(); `resumo`: dicionario de TestadorCarga.resumir_resultado
+        buffer = getattr(self.local, 'buffer', None)
+        if buffer is None:
+            buffer = self.local.buffer = []
+            with self.trava:
+                self.buffers.append(buffer)
+        buffer.append((instante_ns, self.contexto, resumo))
+        if len(buffer) >= self.capacidade:
+            self._gravar(buffer)
+
+    def descarregar(self):
+        #Chamado com os geradores parados; as threads seguintes comecam com buffers novos
+        with self.trava:
+            buffers, self.buffers = self.buffers, []
+            self.local = threading.local()
+        for buffer in buffers:
+            if buffer:
+                self._gravar(buffer)
+
+    def fechar(self):
+        self.descarregar()
+        if self.fd is not None:
+            os.close(self.fd)
+            self.fd = None
+
+    def _gravar(self, buffer):
+        linhas = [self._linha(*amostra) for amostra in buffer]
+        buffer.clear()
+        if self.formato == 'csv':
+            saida = io.StringIO()
+            csv.writer(saida).writerows(linhas)
+            bloco = saida.getvalue()
+        else:
+            #Campos vazios do CSV viram null
+            bloco = ''.join(json.dumps({campo: None if valor == '' else valor
+                                        for campo, valor in zip(self.CAMPOS, linha)}, ensure_ascii=False) + '\n'
+                            for linha in linhas)
+        self._gravar_bytes(bloco.encode('utf-8'))
+
+    def _gravar_bytes(self, dados):
+        visao = memoryview(dados)
+        while visao:
+            visao = visao[os.write(self.fd, visao):]
+
+    def _linha(self, instante_ns, contexto, resumo):
+        if 'caminho' in resumo:
+            contexto = (*contexto[:3], resumo['caminho'])
+        fases_ns = resumo.get('fases_ns', {})
+        corrigido = resumo.get('tempo_corrigido')
+        return (round(instante_ns / 1e9, 6), *contexto, int(resumo['sucesso']), resumo.get('codigo_status', 0),
+                round(resumo['tempo_resposta'] * 1000, 3),
+                round(corrigido * 1000, 3) if corrigido is not None else '',
+                *(round(fases_ns[fase] / 1e6, 3) if fase in fases_ns else '' for fase in self.FASES),
+                resumo.get('tamanho_resposta', 0), resumo.get('bytes_fio', 0),
+                int(resumo.get('conexao_reutilizada', False)))
+
+
+class GravadorAmostrasColunar(GravadorAmostras):
+    #Mesmas amostras em colunas binarias de largura fixa, para ler com mmap sem parse:
+    #  - diretorio <base>.colunar/ com um arquivo <coluna>.bin por coluna (ordem nativa de bytes)
+    #  - esquema.json com o tipo NumPy de cada coluna e as tabelas de ids (servidor, teste, caminho)
+    #  - cada bloco acrescenta o mesmo numero de linhas a todas as colunas, sob trava entre threads
+    #    (Lock) e entre processos (lockf); uma queda no meio de um bloco deixa colunas de tamanhos
+    #    diferentes, e o leitor considera so as linhas presentes em todas
+    #Tempos em nanossegundos; -1 quando nao se aplica (latencia corrigida em malha fechada, fases de falhas)
+    COLUNAS = (('instante_ns', 'q'), ('execucao', 'H'), ('teste', 'H'), ('servidor', 'B'), ('caminho', 'H'),
+               ('sucesso', 'B'), ('codigo_status', 'H'), ('tempo_resposta_ns', 'q'), ('tempo_corrigido_ns', 'q'),
+               ('fase_conexao_ns', 'q'), ('fase_envio_ns', 'q'), ('fase_primeiro_byte_ns', 'q'),
+               ('fase_cabecalho_ns', 'q'), ('fase_corpo_ns', 'q'), ('bytes_corpo', 'Q'), ('bytes_fio', 'Q'),
+               ('conexao_reutilizada', 'B'))
+    #Codigo do modulo array -> tipo NumPy equivalente (sem a ordem de bytes)
+    TIPOS_NUMPY = {'B': 'u1', 'H': 'u2', 'q': 'i8', 'Q': 'u8'}
+    #Colunas com ids e a tabela de nomes correspondente no esquema
+    TABELAS = (('teste', 'testes'), ('servidor', 'servidores'), ('caminho', 'caminhos'))
+
+    def __init__(self, caminho_base, formato='colunar', capacidade=256):
+        self.arquivo = f"{caminho_base}.colunar"
+        self.formato = 'colunar'
+        os.makedirs(self.arquivo, exist_ok=True)
+        self.fds = {}
+        for coluna, _ in self.COLUNAS:
+            self.fds[coluna] = os.open(os.path.join(self.arquivo, f"{coluna}.bin"),
+                                       os.O_WRONLY | os.O_CREAT | os.O_TRUNC | os.O_APPEND, 0o644)
+        self.fd = self.fds['instante_ns']
+        self.trava_bloco = threading.Lock()
+        self.tabelas = {tabela: [] for _, tabela in self.TABELAS}
+        self._iniciar_buffers(capacidade)
+        self.contexto = (1, 0, 0, 0)
+        self._salvar_esquema()
+
+    def definir_contexto(self, execucao, teste, servidor, caminho, caminhos=()):
+        #Ids sao atribuidos no processo pai, antes do disparo; os trabalhadores (fork) os herdam
+        #(inclusive os dos caminhos da carga mista)
+        ids = []
+        for nome, (_, tabela) in zip((teste, servidor, caminho), self.TABELAS):
+            ids.append(self._id(tabela, nome))
+        for nome in caminhos:
+            self._id('caminhos', nome)
+        self.contexto = (execucao or 1, *ids)
+    
+    def _id(self, tabela, nome):
+        nomes = self.tabelas[tabela]
+        if nome not in nomes:
+            nomes.append(nome)
+            self._salvar_esquema()
+        return nomes.index(nome)
+
+    def fechar(self):
+        self.descarregar()
+        if self.fd is not None:
+            for fd in self.fds.values():
+                os.close(fd)
+            self.fd = None
+
+    def _salvar_esquema(self):
+        ordem = '<' if sys.byteorder == 'little' else '>'
+        esquema = {
+            'versao': 1,
+            'colunas': [{'nome': coluna, 'tipo': ordem + self.TIPOS_NUMPY[codigo]} for coluna, codigo in self.COLUNAS],
+            'tabelas': self.tabelas
+        }
+        arquivo = os.path.join(self.arquivo, 'esquema.json')
+        with open(arquivo + '.tmp', 'w', encoding='utf-8') as f:
+            json.dump(esquema, f, ensure_ascii=False, indent=2)
+        os.replace(arquivo + '.tmp', arquivo)
+
+    def _gravar(self, buffer):
+        colunas = [array(codigo) for _, codigo in self.COLUNAS]
+        caminhos = self.tabelas['caminhos']
+        for instante_ns, contexto, resumo in buffer:
+            if 'caminho' in resumo:
+                contexto = (*contexto[:3], caminhos.index(resumo['caminho']))
+            fases_ns = resumo.get('fases_ns', {})
+            corrigido = resumo.get('tempo_corrigido')
+            valores = (instante_ns, *contexto, int(resumo['sucesso']), resumo.get('codigo_status', 0),
+                       resumo.get('tempo_resposta_ns', int(resumo['tempo_resposta'] * 1e9)),
+                       int(corrigido * 1e9) if corrigido is not None else -1,
+                       *(fases_ns.get(fase, -1) for fase in self.FASES),
+                       resumo.get('tamanho_resposta', 0), resumo.get('bytes_fio', 0),
+                       int(resumo.get('conexao_reutilizada', False)))
+            for coluna, valor in zip(colunas, valores):
+                coluna.append(valor)
+        buffer.clear()
+        with self.trava_bloco:
+            if fcntl is not None:
+                fcntl.lockf(self.fd, fcntl.LOCK_EX)
+            try:
+                for (nome, _), coluna in zip(self.COLUNAS, colunas):
+                    visao = memoryview(coluna.tobytes())
+                    while visao:
+                        visao = visao[os.write(self.fds[nome], visao):]
+            finally:
+                if fcntl is not None:
+                    fcntl.lockf(self.fd, fcntl.LOCK_UN)
+
+
+def abrir_amostras(caminho_base, formato='csv'):
+    #Gravador de amostras por requisicao no formato pedido
+    if formato == 'colunar':
+        return GravadorAmostrasColunar(caminho_base)
+    return GravadorAmostras(caminho_base, formato)
@@ -0,0 +1,123 @@
+#Reproducao de logs de acesso (formato combined do Apache e log_format main do Nginx, com o
+#X-Custom-ID ao final): o log e lido em fluxo e cada requisicao e reenviada no mesmo intervalo
+#relativo ao inicio do log, dividido pelo fator de velocidade
+
+import gzip
+import os
+import re
+from datetime import datetime
+
+#host ident usuario [data] "METODO caminho PROTOCOLO" status bytes ... (o resto da linha e ignorado)
+REGEX_LINHA = re.compile(r'^\S+ \S+ \S+ \[([^\]]+)\] "(\S+) (\S+)(?: [^"]*)?" (\d{3}) ')
+
+#Metodos reenviados: os demais (POST, PUT...) precisariam do corpo, que nao esta no log
+METODOS_REPRODUZIVEIS = ('GET', 'HEAD')
+
+#Os logs tem resolucao de 1s: as requisicoes do mesmo segundo sao espalhadas uniformemente dentro
+#dele. Acima deste numero de linhas, o grupo e liberado antes (memoria limitada mesmo em rajadas) e
+#ocupa so metade do que resta do segundo, para os grupos seguintes continuarem depois dele
+LIMITE_GRUPO = 50000
+
+
+def abrir_log(arquivo):
+    if arquivo.endswith('.gz'):
+        return gzip.open(arquivo, 'rt', encoding='utf-8', errors='replace')
+    return open(arquivo, encoding='utf-8', errors='replace')
+
+
+class ReproducaoLog:
+    #Iteravel de (deslocamento_s, metodo, caminho) em ordem, com deslocamento ja escalado pela velocidade
+    #Cada iteracao rele o arquivo do inicio; memoria limitada ao grupo de um segundo do log
+    def __init__(self, arquivo, velocidade=1.0, limite=None, metodos=METODOS_REPRODUZIVEIS):
+        if not velocidade > 0:
+            raise ValueError("O fator de velocidade deve ser positivo")
+        if not os.path.isfile(arquivo):
+            raise FileNotFoundError(f"Log de acesso nao encontrado: {arquivo}")
+        self.arquivo = arquivo
+        self.velocidade = velocidade
+        self.limite = limite
+        self.metodos = metodos
+        #Contadores da ultima iteracao
+        self.linhas = 0
+        self.reproduzidas = 0
+        self.ignoradas = 0
+        self.duracao_original = 0.0
+        self._instantes = {}
+
+    def __str__(self):
+        return f"log:{os.path.basename(self.arquivo)}"
+
+    def instante(self, data):
+        #Epoch de "10/Oct/2000:13:55:36 -0700"; linhas vizinhas repetem o mesmo segundo
+        instante = self._instantes.get(data)
+        if instante is None:
+            if len(self._instantes) > 4096:
+                self._instantes.clear()
+            instante = self._instantes[data] = datetime.strptime(data, '%d/%b/%Y:%H:%M:%S %z').timestamp()
+        return instante
+
+    def requisicoes(self):
+        #(instante no log, metodo, caminho) das linhas reproduziveis, em fluxo
+        with abrir_log(self.arquivo) as f:
+            for linha in f:
+                self.linhas += 1
+                correspondencia = REGEX_LINHA.match(linha)
+                if correspondencia is None:
+                    self.ignoradas += 1
+                    continue
+                data, metodo, caminho, _ = correspondencia.groups()
+                if metodo not in self.metodos:
+                    self.ignoradas += 1
+                    continue
+                if not caminho.startswith('/'):
+                    #URI absoluta (proxy): so o caminho interessa
+                    inicio = caminho.find('/', caminho.find('//') + 2) if '//' in caminho else -1
+                    if inicio < 0:
+                        self.ignoradas += 1
+                        continue
+                    caminho = caminho[inicio:]
+                try:
+                    yield self.instante(data), metodo, caminho
+                except ValueError:
+                    self.ignoradas += 1
+
+    def __iter__(self):
+        self.linhas = self.reproduzidas = self.ignoradas = 0
+        self.duracao_original = 0.0
+        origem = None
+        ultimo = None
+        grupo = []
+        #Parte do segundo atual ja ocupada por grupos liberados antes do fim dele
+        ocupado = 0.0
+        for instante, metodo, caminho in self.requisicoes():
+            if origem is None:
+                origem = instante
+            #O Nginx registra ao fim da resposta: pequenas inversoes de ordem sao achatadas
+            if ultimo is not None and instante < ultimo:
+                instante = ultimo
+            if grupo and (instante != ultimo or len(grupo) >= LIMITE_GRUPO):
+                if instante != ultimo:
+                    yield from self._espalhar(grupo, ultimo - origem, ocupado, 1.0)
+                    ocupado = 0.0
+                else:
+                    #O segundo continua: o grupo cheio fica com metade do que resta dele
+                    metade = (ocupado + 1.0) / 2
+                    yield from self._espalhar(grupo, ultimo - origem, ocupado, metade)
+                    ocupado = metade
+                if self.limite is not None and self.reproduzidas >= self.limite:
+                    return
+                grupo = []
+            ultimo = instante
+            grupo.append((metodo, caminho))
+        if grupo:
+            yield from self._espalhar(grupo, ultimo - origem, ocupado, 1.0)
+
+    def _espalhar(self, grupo, segundo, inicio=0.0, fim=1.0):
+        #Espalha o grupo uniformemente em [segundo + inicio, segundo + fim)
+        quantidade = len(grupo)
+        for indice, (metodo, caminho) in enumerate(grupo):
+            if self.limite is not None and self.reproduzidas >= self.limite:
+                return
+            self.reproduzidas += 1
+            self.duracao_original = segundo + inicio + (fim - inicio) * indice / quantidade
+            yield self.duracao_original / self.velocidade, metodo, caminho
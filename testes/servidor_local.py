@@ -0,0 +1,395 @@
+#Servidor HTTP/1.1 local e deterministico que imita as rotas do Nginx e do Apache do docker-compose,
+#para rodar os motores de carga e o parser sem Docker (regressao e benchmarks em qualquer Linux)
+#
+#  /                      pagina inicial
+#  /saude                 JSON de saude
+#  /api/{pequeno,medio,grande}  os mesmos JSON dos Dockerfiles; outros /api/* dao 404, como nos servidores
+#  /estatico/<arquivo>    arquivos de arquivos_estaticos/ ou, se ausentes, o mesmo padrao de
+#                         gerar_arquivos_estaticos.py gerado em fluxo a partir do nome (ex.: grande-7mb.txt)
+#  /status_nginx          stub_status (estilo nginx)
+#  /status-servidor?auto  mod_status (estilo apache)
+#
+#Falhas injetadas sao deterministicas: com taxa_erro=0.1, exatamente 1 de cada 10 requisicoes
+#(na ordem de chegada) recebe 500; o mesmo para taxa_reset, que derruba a conexao com RST no meio do corpo
+
+import argparse
+import gzip
+import json
+import multiprocessing
+import os
+import re
+import socket
+import socketserver
+import struct
+import sys
+import threading
+import time
+
+#Adicionar diretorio src ao caminho
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from gerar_arquivos_estaticos import blocos_padrao, tamanho_arquivo
+
+ESTILOS = ('nginx', 'apache')
+COMPRESSOES = ('nao', 'aceita', 'sempre')
+
+#Opcoes do servidor e seus tipos (tambem aceitas em texto por analisar_opcoes)
+OPCOES = {
+    'latencia_ms': float,     #atraso fixo antes de cada resposta
+    'variacao_ms': float,     #atraso extra deterministico entre 0 e variacao_ms
+    'banda_kbps': float,      #limite de envio por resposta (KiB/s); 0 = sem limite
+    'chunked': bool,          #corpos com Transfer-Encoding: chunked em vez de Content-Length
+    'compressao': str,        #'nao', 'aceita' (se o cliente aceitar gzip) ou 'sempre'
+    'taxa_erro': float,       #fracao das requisicoes respondidas com 500
+    'taxa_reset': float,      #fracao das requisicoes derrubadas com RST no meio da resposta
+}
+
+#Tamanho dos blocos enviados por vez (e granularidade do limite de banda)
+TAMANHO_BLOCO = 64 * 1024
+
+REGEX_TAMANHO = re.compile(r'-(\d+)(kb|mb|gb)\.txt$')
+UNIDADES = {'kb': 1024, 'mb': 1024 ** 2, 'gb': 1024 ** 3}
+
+JSON_API = {
+    'pequeno': {"tipo": "pequeno"},
+    'medio': {"tipo": "medio", "dados": "x" * 200},
+    'grande': {"tipo": "grande", "dados": "x" * 500}
+}
+
+
+def analisar_opcoes(texto):
+    #"latencia_ms=5,chunked=1,compressao=sempre" -> dicionario tipado
+    opcoes = {}
+    for item in filter(None, (parte.strip() for parte in (texto or '').split(','))):
+        chave, separador, valor = item.partition('=')
+        if not separador or chave not in OPCOES:
+            raise ValueError(f"opcao invalida do servidor local: {item} (use {', '.join(OPCOES)})")
+        tipo = OPCOES[chave]
+        opcoes[chave] = valor.lower() in ('1', 'true', 'sim') if tipo is bool else tipo(valor)
+    if opcoes.get('compressao', 'nao') not in COMPRESSOES:
+        raise ValueError(f"compressao invalida: {opcoes['compressao']} (use {', '.join(COMPRESSOES)})")
+    return opcoes
+
+
+def tamanho_padrao(nome):
+    #Tamanho nominal de um arquivo de teste pelo nome (pequeno-1kb.txt -> 1024) ou None
+    correspondencia = REGEX_TAMANHO.search(nome)
+    if correspondencia is None:
+        return None
+    return int(correspondencia.group(1)) * UNIDADES[correspondencia.group(2)]
+
+
+def blocos_arquivo(caminho):
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(TAMANHO_BLOCO), b''):
+            yield bloco
+
+
+class EstadoServidor:
+    #Contadores compartilhados pelas threads do servidor (paginas de status e falhas deterministicas)
+    def __init__(self):
+        self.trava = threading.Lock()
+        self.inicio = time.time()
+        self.conexoes_aceitas = 0
+        self.conexoes_ativas = 0
+        self.requisicoes = 0
+        self.bytes_enviados = 0
+        self.em_atendimento = 0
+
+    def nova_requisicao(self):
+        with self.trava:
+            self.requisicoes += 1
+            self.em_atendimento += 1
+            return self.requisicoes
+
+
+class ManipuladorLocal(socketserver.BaseRequestHandler):
+    #Uma conexao: le requisicoes em sequencia (keep-alive e pipelining) e responde na ordem
+    def setup(self):
+        self.request.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        estado = self.server.estado
+        with estado.trava:
+            estado.conexoes_aceitas += 1
+            estado.conexoes_ativas += 1
+
+    def finish(self):
+        estado = self.server.estado
+        with estado.trava:
+            estado.conexoes_ativas -= 1
+
+    def handle(self):
+        buffer = b''
+        while True:
+            while b'\r\n\r\n' not in buffer:
+                try:
+                    pedaco = self.request.recv(65536)
+                except OSError:
+                    return
+                if not pedaco:
+                    return
+                buffer += pedaco
+                if len(buffer) > 64 * 1024:
+                    return
+            cabecalho, buffer = buffer.split(b'\r\n\r\n', 1)
+            linhas = cabecalho.decode('latin-1').split('\r\n')
+            partes = linhas[0].split(' ')
+            if len(partes) != 3:
+                return
+            metodo, caminho, versao = partes
+            cabecalhos = {}
+            for linha in linhas[1:]:
+                chave, _, valor = linha.partition(':')
+                cabecalhos[chave.strip().lower()] = valor.strip()
+            #Corpo da requisicao (nao usado) e descartado
+            tamanho_corpo = int(cabecalhos.get('content-length', 0) or 0)
+            while len(buffer) < tamanho_corpo:
+                pedaco = self.request.recv(65536)
+                if not pedaco:
+                    return
+                buffer += pedaco
+            buffer = buffer[tamanho_corpo:]
+
+            conexao = cabecalhos.get('connection', '').lower()
+            manter = conexao == 'keep-alive' if versao == 'HTTP/1.0' else conexao != 'close'
+            estado = self.server.estado
+            numero = estado.nova_requisicao()
+            try:
+                if not self.responder(numero, metodo, caminho, cabecalhos, manter):
+                    return
+            except OSError:
+                return
+            finally:
+                with estado.trava:
+                    estado.em_atendimento -= 1
+            if not manter:
+                return
+
+    def responder(self, numero, metodo, caminho, cabecalhos, manter):
+        #Retorna False se a conexao foi derrubada
+        servidor = self.server
+        self.inicio_envio = None
+        self.enviados_resposta = 0
+        espera = servidor.latencia_ms
+        if servidor.variacao_ms:
+            #Deterministico: depende so do numero da requisicao
+            espera += servidor.variacao_ms * ((numero * 2654435761) % 1000) / 1000
+        if espera > 0:
+            time.sleep(espera / 1000)
+
+        if metodo not in ('GET', 'HEAD'):
+            status, tipo, blocos, tamanho = 405, 'text/html', [b'<h1>405 Not Allowed</h1>'], 24
+        elif servidor.sorteado(numero, servidor.taxa_erro, 1):
+            corpo = b'<h1>500 Internal Server Error</h1>'
+            status, tipo, blocos, tamanho = 500, 'text/html', [corpo], len(corpo)
+        else:
+            status, tipo, blocos, tamanho = servidor.rota(caminho)
+        derrubar = servidor.sorteado(numero, servidor.taxa_reset, 2)
+
+        comprimir = (tamanho and status == 200 and
+                     (servidor.compressao == 'sempre' or
+                      (servidor.compressao == 'aceita' and 'gzip' in cabecalhos.get('accept-encoding', ''))))
+        if comprimir:
+            corpo = gzip.compress(b''.join(blocos), compresslevel=1, mtime=0)
+            blocos, tamanho = [corpo], len(corpo)
+
+        linhas = [f"HTTP/1.1 {status} {servidor.MOTIVOS.get(status, 'OK')}",
+                  f"Server: {servidor.nome_servidor}",
+                  f"Content-Type: {tipo}",
+                  f"Connection: {'keep-alive' if manter else 'close'}"]
+        if comprimir:
+            linhas.append("Content-Encoding: gzip")
+        if servidor.chunked:
+            linhas.append("Transfer-Encoding: chunked")
+        else:
+            linhas.append(f"Content-Length: {tamanho}")
+        self.enviar(('\r\n'.join(linhas) + '\r\n\r\n').encode('latin-1'))
+        if metodo == 'HEAD':
+            return True
+
+        enviados = 0
+        for bloco in blocos:
+            if derrubar and enviados + len(bloco) >= tamanho // 2:
+                #RST no meio do corpo: o cliente deve contar a resposta truncada como falha
+                self.enviar(self.enquadrar(bloco[:max(tamanho // 2 - enviados, 0)]))
+                self.request.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+                self.request.close()
+                return False
+            self.enviar(self.enquadrar(bloco))
+            enviados += len(bloco)
+        if derrubar:
+            self.request.setsockopt(socket.SOL_SOCKET, socket.SO_LINGER, struct.pack('ii', 1, 0))
+            self.request.close()
+            return False
+        if servidor.chunked:
+            self.enviar(b'0\r\n\r\n')
+        return True
+
+    def enquadrar(self, bloco):
+        if not self.server.chunked or not bloco:
+            return bloco
+        return b'%x\r\n' % len(bloco) + bloco + b'\r\n'
+
+    def enviar(self, dados):
+        servidor = self.server
+        if not servidor.banda_kbps or not dados:
+            self.request.sendall(dados)
+            servidor.contar_bytes(len(dados))
+            return
+        #Limite de banda: cada fatia so sai quando o total enviado na resposta cabe na taxa
+        taxa = servidor.banda_kbps * 1024
+        fatia = max(1024, int(taxa / 50))
+        if self.inicio_envio is None:
+            self.inicio_envio = time.perf_counter()
+        for posicao in range(0, len(dados), fatia):
+            pedaco = dados[posicao:posicao + fatia]
+            self.request.sendall(pedaco)
+            self.enviados_resposta += len(pedaco)
+            adiantado = self.enviados_resposta / taxa - (time.perf_counter() - self.inicio_envio)
+            if adiantado > 0:
+                time.sleep(adiantado)
+        servidor.contar_bytes(len(dados))
+
+
+class ServidorLocal(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+    request_queue_size = 1024
+    MOTIVOS = {200: 'OK', 404: 'Not Found', 405: 'Not Allowed', 500: 'Internal Server Error'}
+
+    def __init__(self, endereco=('127.0.0.1', 0), estilo='nginx', dir_estaticos=None, latencia_ms=0.0,
+                 variacao_ms=0.0, banda_kbps=0.0, chunked=False, compressao='nao', taxa_erro=0.0, taxa_reset=0.0):
+        if estilo not in ESTILOS:
+            raise ValueError(f"Estilo invalido: {estilo}")
+        if compressao not in COMPRESSOES:
+            raise ValueError(f"Compressao invalida: {compressao}")
+        self.estilo = estilo
+        self.nome_servidor = 'nginx' if estilo == 'nginx' else 'Apache'
+        self.dir_estaticos = dir_estaticos
+        self.latencia_ms = latencia_ms
+        self.variacao_ms = variacao_ms
+        self.banda_kbps = banda_kbps
+        self.chunked = chunked
+        self.compressao = compressao
+        self.taxa_erro = taxa_erro
+        self.taxa_reset = taxa_reset
+        self.estado = EstadoServidor()
+        self.respostas_api = {
+            nome: json.dumps({"status": "ok", "servidor": self.nome_servidor.capitalize(), **dados}).encode()
+            for nome, dados in JSON_API.items()
+        }
+        super().__init__(endereco, ManipuladorLocal)
+
+    @staticmethod
+    def sorteado(numero, taxa, eixo):
+        #A requisicao `numero` (1, 2, ...) cai na fracao `taxa`? Exatamente floor(n * taxa) das n primeiras;
+        #`eixo` desloca a sequencia para erros e resets nao coincidirem
+        if taxa <= 0:
+            return False
+        deslocado = numero + eixo
+        return int(deslocado * taxa) > int((deslocado - 1) * taxa)
+
+    def contar_bytes(self, quantidade):
+        with self.estado.trava:
+            self.estado.bytes_enviados += quantidade
+
+    def rota(self, caminho):
+        #(status, content-type, blocos do corpo, tamanho do corpo)
+        caminho, _, consulta = caminho.partition('?')
+        if caminho == '/':
+            corpo = (f"<html><head><title>{self.nome_servidor}</title></head><body>"
+                     f"<h1>Servidor local ({self.estilo})</h1></body></html>").encode()
+            return 200, 'text/html', [corpo], len(corpo)
+        if caminho == '/saude':
+            corpo = json.dumps({"status": "ok", "servidor": self.nome_servidor}).encode()
+            return 200, 'application/json', [corpo], len(corpo)
+        if caminho.startswith('/api/') and caminho[5:] in self.respostas_api:
+            corpo = self.respostas_api[caminho[5:]]
+            return 200, 'application/json', [corpo], len(corpo)
+        if caminho.startswith('/estatico/'):
+            return self.rota_estatico(caminho[len('/estatico/'):])
+        if caminho == '/status_nginx' and self.estilo == 'nginx':
+            corpo = self.stub_status().encode()
+            return 200, 'text/plain', [corpo], len(corpo)
+        if caminho == '/status-servidor' and self.estilo == 'apache':
+            corpo = self.mod_status().encode()
+            return 200, 'text/plain; charset=ISO-8859-1', [corpo], len(corpo)
+        corpo = (f"<html><head><title>404 Not Found</title></head><body><h1>404 Not Found</h1>"
+                 f"<hr><center>{self.nome_servidor}</center></body></html>").encode()
+        return 404, 'text/html', [corpo], len(corpo)
+
+    def rota_estatico(self, nome):
+        if '/' in nome or nome.startswith('.'):
+            return self.rota('/404')
+        if self.dir_estaticos:
+            arquivo = os.path.join(self.dir_estaticos, nome)
+            if os.path.isfile(arquivo):
+                return 200, 'text/plain', blocos_arquivo(arquivo), os.path.getsize(arquivo)
+        tamanho = tamanho_padrao(nome)
+        if tamanho is None:
+            return self.rota('/404')
+        return 200, 'text/plain', blocos_padrao(tamanho, tamanho_escrita=TAMANHO_BLOCO), tamanho_arquivo(tamanho)
+
+    def stub_status(self):
+        estado = self.estado
+        with estado.trava:
+            ativas, aceitas, requisicoes = estado.conexoes_ativas, estado.conexoes_aceitas, estado.requisicoes
+            escrevendo = estado.em_atendimento
+        return (f"Active connections: {ativas} \nserver accepts handled requests\n"
+                f" {aceitas} {aceitas} {requisicoes} \n"
+                f"Reading: 0 Writing: {escrevendo} Waiting: {max(ativas - escrevendo, 0)} \n")
+
+    def mod_status(self):
+        estado = self.estado
+        with estado.trava:
+            requisicoes, enviados, ocupados = estado.requisicoes, estado.bytes_enviados, estado.em_atendimento
+        ativo = max(time.time() - estado.inicio, 1e-9)
+        ociosos = max(0, 25 - ocupados)
+        return (f"Total Accesses: {requisicoes}\nTotal kBytes: {enviados // 1024}\nCPULoad: 0\n"
+                f"Uptime: {int(ativo)}\nReqPerSec: {requisicoes / ativo:.6f}\n"
+                f"BytesPerSec: {enviados / ativo:.6f}\nBytesPerReq: {enviados / max(requisicoes, 1):.6f}\n"
+                f"BusyWorkers: {ocupados}\nIdleWorkers: {ociosos}\n"
+                f"Scoreboard: {'W' * ocupados}{'_' * ociosos}\n")
+
+
+def _servir(fila, endereco, opcoes):
+    servidor = ServidorLocal(endereco, **opcoes)
+    fila.put(servidor.server_address[1])
+    servidor.serve_forever()
+
+
+def iniciar_em_processo(estilo='nginx', host='127.0.0.1', porta=0, **opcoes):
+    #Servidor em outro processo, para a CPU dele nao disputar o GIL com o gerador de carga
+    #Retorna (processo, porta)
+    contexto = multiprocessing.get_context('fork')
+    fila = contexto.Queue()
+    processo = contexto.Process(target=_servir, args=(fila, (host, porta), {'estilo': estilo, **opcoes}),
+                                daemon=True)
+    processo.start()
+    return processo, fila.get(timeout=10)
+
+
+def principal():
+    parser = argparse.ArgumentParser(description='Servidor local que imita as rotas do Nginx/Apache do trabalho')
+    parser.add_argument('--estilo', choices=ESTILOS, default='nginx')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--porta', type=int, default=8080)
+    parser.add_argument('--estaticos', metavar='DIR',
+                        help='Diretorio dos arquivos estaticos (sem ele, o conteudo e gerado pelo nome)')
+    parser.add_argument('--opcoes', default='', metavar='CHAVE=VALOR,...',
+                        help=f"Falhas e limites injetados: {', '.join(OPCOES)}")
+    args = parser.parse_args()
+    try:
+        opcoes = analisar_opcoes(args.opcoes)
+    except ValueError as e:
+        parser.error(str(e))
+    servidor = ServidorLocal((args.host, args.porta), args.estilo, args.estaticos, **opcoes)
+    print(f"Servidor local ({args.estilo}) em http://{args.host}:{servidor.server_address[1]} {opcoes or ''}")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        servidor.server_close()
+        sys.exit(0)
+
+
+if __name__ == '__main__':
+    principal()
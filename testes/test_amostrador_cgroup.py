@@ -0,0 +1,185 @@
+#Testes do amostrador de cgroup contra um cgroupfs e um procfs falsos: descoberta do cgroup pelo nome do
+#processo, pico e media de memoria/RSS, CPU por requisicao no CSV e arquivos ausentes ou ilegiveis
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import threading
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(__file__))
+
+import amostrador_cgroup
+from amostrador_cgroup import AmostradorCgroup, LeitorCgroup, localizar_cgroup
+
+MIB = 1024 * 1024
+
+
+def escrever(caminho, texto):
+    #Troca atomica: o amostrador nunca le um arquivo pela metade
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    with open(caminho + '.tmp', 'w', encoding='utf-8') as f:
+        f.write(texto)
+    os.replace(caminho + '.tmp', caminho)
+
+
+class TesteAmostradorCgroup(unittest.TestCase):
+    def setUp(self):
+        self.raiz = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.raiz)
+        self.raiz_cgroup = os.path.join(self.raiz, 'cgroup')
+        self.raiz_proc = os.path.join(self.raiz, 'proc')
+        self.diretorio = os.path.join(self.raiz_cgroup, 'system.slice', 'docker-abc.scope')
+        escrever(os.path.join(self.raiz_proc, 'meminfo'), 'MemTotal:       1048576 kB\nMemFree: 1 kB\n')
+        #Processo de outro conteiner, o mestre e dois trabalhadores do nginx
+        self.processo('1', 'systemd', '/init.scope', 1000)
+        self.processo('40', 'nginx', '/system.slice/docker-abc.scope', 2048)
+        self.processo('41', 'nginx', '/system.slice/docker-abc.scope', 4096)
+        self.processo('42', 'nginx', '/system.slice/docker-abc.scope', 4096)
+        self.cgroup(usage_usec=0, memoria=10 * MIB, procs=('40', '41', '42'))
+
+    def processo(self, pid, nome, cgroup, rss_kb):
+        escrever(os.path.join(self.raiz_proc, pid, 'comm'), nome + '\n')
+        escrever(os.path.join(self.raiz_proc, pid, 'cgroup'), f'0::{cgroup}\n')
+        escrever(os.path.join(self.raiz_proc, pid, 'status'),
+                 f'Name:\t{nome}\nVmPeak:\t  99999 kB\nVmRSS:\t  {rss_kb} kB\nThreads:\t1\n')
+
+    def cgroup(self, usage_usec=None, memoria=None, procs=None, maximo='max'):
+        if usage_usec is not None:
+            escrever(os.path.join(self.diretorio, 'cpu.stat'),
+                     f'usage_usec {usage_usec}\nuser_usec {usage_usec // 2}\nsystem_usec {usage_usec // 2}\n')
+        if memoria is not None:
+            escrever(os.path.join(self.diretorio, 'memory.current'), f'{memoria}\n')
+        if procs is not None:
+            escrever(os.path.join(self.diretorio, 'cgroup.procs'), '\n'.join(procs) + '\n')
+        escrever(os.path.join(self.diretorio, 'memory.max'), f'{maximo}\n')
+
+    def test_localizar_cgroup(self):
+        self.assertEqual(localizar_cgroup(('nginx',), self.raiz_cgroup, self.raiz_proc), self.diretorio)
+        self.assertIsNone(localizar_cgroup(('httpd',), self.raiz_cgroup, self.raiz_proc))
+        self.assertIsNone(localizar_cgroup(('nginx',), self.raiz_cgroup, os.path.join(self.raiz, 'ausente')))
+
+    def test_localizar_ignora_processos_e_cgroups_invalidos(self):
+        #pid 30: terminou durante a busca (sem cgroup); pid 35: cgroup sem cpu.stat (nao e o do conteiner)
+        escrever(os.path.join(self.raiz_proc, '30', 'comm'), 'nginx\n')
+        self.processo('35', 'nginx', '/outro.scope', 1)
+        os.makedirs(os.path.join(self.raiz_cgroup, 'outro.scope'))
+        os.makedirs(os.path.join(self.raiz_proc, 'self'))
+        self.assertEqual(localizar_cgroup(('nginx',), self.raiz_cgroup, self.raiz_proc), self.diretorio)
+
+    def test_leitura_pontual(self):
+        leitor = LeitorCgroup(self.diretorio, self.raiz_proc)
+        self.cgroup(usage_usec=1500000)
+        leitura = leitor.ler()
+        self.assertEqual((leitura['cpu_usec'], leitura['memoria_bytes'], leitura['rss_bytes']),
+                         (1500000, 10 * MIB, (2048 + 4096 + 4096) * 1024))
+        #Sem limite: memoria total do host; com limite: memory.max
+        self.assertEqual(leitor.limite_memoria(), 1024 * MIB)
+        self.cgroup(maximo=str(64 * MIB))
+        self.assertEqual(leitor.limite_memoria(), 64 * MIB)
+
+    def test_pico_e_media(self):
+        leitor = LeitorCgroup(self.diretorio, self.raiz_proc)
+        amostrador = AmostradorCgroup(leitor)
+        #(instante, cpu_usec, memoria, rss do pid 41 em kB)
+        sequencia = [(0.0, 0, 10 * MIB, 4096), (0.5, 100000, 30 * MIB, 8192),
+                     (1.0, 400000, 20 * MIB, 4096), (2.0, 500000, 20 * MIB, 4096)]
+        for instante, usec, memoria, rss_kb in sequencia:
+            self.cgroup(usage_usec=usec, memoria=memoria, maximo=str(100 * MIB))
+            self.processo('41', 'nginx', '/system.slice/docker-abc.scope', rss_kb)
+            with mock.patch.object(amostrador_cgroup.time, 'perf_counter', return_value=instante):
+                amostrador._amostrar()
+        resumo = amostrador.resumir()
+        self.assertIsNone(amostrador.erro)
+        self.assertEqual(resumo['amostras'], 4)
+        self.assertAlmostEqual(resumo['duracao_s'], 2.0)
+        self.assertAlmostEqual(resumo['cpu_segundos'], 0.5)
+        self.assertAlmostEqual(resumo['cpu_percent_medio'], 25.0)
+        #Pico entre amostras: 0.3 s de CPU em 0.5 s
+        self.assertAlmostEqual(resumo['cpu_percent_pico'], 60.0)
+        self.assertEqual(resumo['memoria_pico_bytes'], 30 * MIB)
+        self.assertAlmostEqual(resumo['memoria_media_bytes'], 20 * MIB)
+        self.assertAlmostEqual(resumo['memoria_percent_pico'], 30.0)
+        base = (2048 + 4096) * 1024
+        self.assertEqual(resumo['rss_pico_bytes'], base + 8192 * 1024)
+        self.assertAlmostEqual(resumo['rss_media_bytes'], base + 5120 * 1024)
+
+    def test_arquivos_ausentes_ou_ilegiveis(self):
+        leitor = LeitorCgroup(self.diretorio, self.raiz_proc)
+        #Processo listado no cgroup que ja terminou, e um com status ilegivel: ficam fora do RSS
+        self.cgroup(procs=('40', '41', '42', '99', '50'))
+        os.makedirs(os.path.join(self.raiz_proc, '50', 'status'))
+        self.assertEqual(leitor.rss_bytes(), (2048 + 4096 + 4096) * 1024)
+        #memory.max ilegivel e meminfo ausente: sem limite conhecido
+        os.remove(os.path.join(self.diretorio, 'memory.max'))
+        os.makedirs(os.path.join(self.diretorio, 'memory.max'))
+        self.assertIsNone(leitor.limite_memoria())
+        os.rmdir(os.path.join(self.diretorio, 'memory.max'))
+        escrever(os.path.join(self.diretorio, 'memory.max'), 'max\n')
+        os.remove(os.path.join(self.raiz_proc, 'meminfo'))
+        self.assertIsNone(leitor.limite_memoria())
+
+        #cpu.stat sem usage_usec e memory.current ausente: a amostra falha e o erro fica registrado
+        amostrador = AmostradorCgroup(leitor)
+        escrever(os.path.join(self.diretorio, 'cpu.stat'), 'nr_periods 0\n')
+        amostrador._amostrar()
+        self.assertIn('usage_usec', amostrador.erro)
+        self.cgroup(usage_usec=10)
+        os.remove(os.path.join(self.diretorio, 'memory.current'))
+        amostrador._amostrar()
+        self.assertEqual(amostrador.amostras, [])
+        self.assertIsNone(amostrador.resumir())
+
+        #Uma amostra valida so nao basta para o resumo; com duas, o percentual de memoria fica vazio
+        self.cgroup(memoria=MIB)
+        amostrador._amostrar()
+        self.assertIsNone(amostrador.resumir())
+        amostrador._amostrar()
+        self.assertIsNone(amostrador.resumir()['memoria_percent_pico'])
+
+    def test_cpu_por_requisicao_no_csv(self):
+        #Teste de carga real contra o servidor local, com o cgroup falso do nginx avancando 1 ms de CPU
+        #a cada 2 ms; a coluna de CPU por requisicao e a CPU do teste dividida pelo total de requisicoes
+        import teste_carga
+
+        parada = threading.Event()
+
+        def consumir_cpu():
+            usec = 0
+            while not parada.wait(0.002):
+                usec += 1000
+                self.cgroup(usage_usec=usec)
+
+        dir_resultados = os.path.join(self.raiz, 'resultados')
+        testador = teste_carga.TestadorCarga(servidor_local={}, cgroups={'nginx': self.diretorio},
+                                             raiz_proc=self.raiz_proc, intervalo_amostragem=0.01,
+                                             url_prometheus=None, dir_resultados=dir_resultados)
+        consumidor = threading.Thread(target=consumir_cpu, daemon=True)
+        consumidor.start()
+        try:
+            testador.teste_concorrente('nginx', '/api/info', 200, 4, 'cgroup_falso')
+        finally:
+            parada.set()
+            consumidor.join()
+            testador.fechar_arquivos()
+            for processo in testador.processos_locais:
+                processo.join()
+        with open(os.path.join(dir_resultados, 'resultados_testes.csv'), newline='', encoding='utf-8') as f:
+            linha, = csv.DictReader(f)
+        total = int(linha['total_requisicoes'])
+        cpu_segundos = float(linha['cpu_segundos'])
+        self.assertEqual(total, 200)
+        self.assertGreater(cpu_segundos, 0)
+        self.assertAlmostEqual(float(linha['cpu_ms_por_requisicao']), cpu_segundos / total * 1000, delta=0.001)
+        self.assertEqual(linha['mem_usage'], '10.0MiB')
+        self.assertEqual(float(linha['mem_media_mib']), 10.0)
+        self.assertEqual(float(linha['rss_pico_mib']), 10.0)
+        self.assertEqual(linha['mem_percent'], str(round(10 / 1024 * 100, 2)))
+        self.assertGreaterEqual(int(linha['amostras_recursos']), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
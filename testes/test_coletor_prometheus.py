@@ -0,0 +1,143 @@
+#Testes do ColetorPrometheus contra um /api/v1/query_range falso: lotes de janelas, uma unica sessao HTTP
+#reaproveitada, resumos de gauges e contadores por id_teste e respostas com erro ou sem series
+
+import json
+import os
+import sys
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+sys.path.append(os.path.dirname(__file__))
+
+from coletor_prometheus import ColetorPrometheus, CONSULTAS
+
+
+def valor_serie(consulta, instante):
+    #Valor de cada serie falsa no instante dado
+    if consulta == 'sum(nginx_connections_active)':
+        return instante % 10
+    if consulta == 'sum(nginx_connections_accepted)':
+        return instante % 7             #Contador que reinicia
+    if consulta == 'sum(nginx_http_requests_total)':
+        return 5 * instante
+    if consulta == 'sum(apache_workers{state="busy"})':
+        return 3
+    return 2 * instante
+
+
+class PrometheusFalso(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        url = urlsplit(self.path)
+        parametros = {chave: valores[0] for chave, valores in parse_qs(url.query).items()}
+        consulta = parametros['query']
+        inicio, fim, passo = float(parametros['start']), float(parametros['end']), float(parametros['step'])
+        self.server.consultas.append((url.path, consulta, inicio, fim))
+        self.server.clientes.add(self.client_address)
+        codigo = 200
+        if consulta == 'sum(apache_cpuload)':
+            dados = {'status': 'error', 'errorType': 'bad_data', 'error': 'consulta invalida'}
+        elif consulta == 'sum(apache_workers{state="idle"})':
+            dados = {'status': 'success', 'data': {'resultType': 'matrix', 'result': []}}
+        elif consulta == 'sum(nginx_http_requests_total)' and inicio >= 50000:
+            codigo, dados = 500, {'status': 'error', 'error': 'falha interna'}
+        else:
+            instantes = [inicio + passo * indice for indice in range(int((fim - inicio) / passo) + 1)]
+            valores = [[instante, str(valor_serie(consulta, int(instante)))] for instante in instantes]
+            dados = {'status': 'success', 'data': {'resultType': 'matrix', 'result': [{'metric': {}, 'values': valores}]}}
+        corpo = json.dumps(dados).encode('utf-8')
+        self.send_response(codigo)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(corpo)))
+        self.end_headers()
+        self.wfile.write(corpo)
+
+    def log_message(self, *args):
+        pass
+
+
+class TesteColetorPrometheus(unittest.TestCase):
+    def setUp(self):
+        self.servidor = ThreadingHTTPServer(('127.0.0.1', 0), PrometheusFalso)
+        self.servidor.daemon_threads = True
+        self.servidor.consultas = []
+        self.servidor.clientes = set()
+        threading.Thread(target=self.servidor.serve_forever, daemon=True).start()
+        self.addCleanup(self.servidor.server_close)
+        self.addCleanup(self.servidor.shutdown)
+        self.coletor = ColetorPrometheus(f'http://127.0.0.1:{self.servidor.server_address[1]}/', passo=1.0,
+                                         margem=2.0, max_pontos=100)
+        self.addCleanup(self.coletor.fechar)
+        #Duas janelas vizinhas (um lote), uma distante (outro lote) e uma de servidor sem consultas
+        self.coletor.registrar_janela(1, 'nginx', 1000.0, 1010.0, teste='pequeno')
+        self.coletor.registrar_janela(2, 'apache', 1012.0, 1020.0, teste='pequeno')
+        self.coletor.registrar_janela(3, 'nginx', 50000.0, 50010.0, teste='grande')
+        self.coletor.registrar_janela(4, 'local', 1005.0, 1006.0, teste='sem_consultas')
+
+    def test_lotes(self):
+        lotes = self.coletor.lotes()
+        self.assertEqual([(lote['inicio'], lote['fim'], [janela['id_teste'] for janela in lote['janelas']])
+                          for lote in lotes],
+                         [(1000.0, 1022.0, [1, 4, 2]), (50000.0, 50012.0, [3])])
+        #Um lote nao passa de max_pontos passos
+        self.coletor.max_pontos = 15
+        self.assertEqual([[janela['id_teste'] for janela in lote['janelas']] for lote in self.coletor.lotes()],
+                         [[1, 4], [2], [3]])
+
+    def test_uma_consulta_por_metrica_e_lote_na_mesma_conexao(self):
+        self.coletor.coletar()
+        consultas = self.servidor.consultas
+        #Lote 1: metricas do nginx e do apache; lote 2: so as do nginx
+        self.assertEqual(len(consultas), len(CONSULTAS['nginx']) * 2 + len(CONSULTAS['apache']))
+        self.assertEqual(self.coletor.consultas_feitas, len(consultas))
+        self.assertEqual({caminho for caminho, _, _, _ in consultas}, {'/api/v1/query_range'})
+        self.assertEqual({(inicio, fim) for _, _, inicio, fim in consultas}, {(1000.0, 1022.0), (50000.0, 50012.0)})
+        #Uma unica sessao: todas as consultas pela mesma conexao TCP (mesma porta de origem)
+        self.assertEqual(len(self.servidor.clientes), 1)
+
+    def test_resumos_por_teste(self):
+        linhas = self.coletor.coletar()
+        self.assertEqual([linha['id_teste'] for linha in linhas], [1, 2, 3, 4])
+        nginx, apache, grande, local = linhas
+        #Janela 1 recortada em [1000, 1012]: gauge t % 10, contador t % 7 (com reinicios) e 5t
+        self.assertEqual((nginx['teste'], nginx['servidor'], nginx['inicio'], nginx['fim']),
+                         ('pequeno', 'nginx', 1000.0, 1010.0))
+        self.assertEqual((nginx['nginx_conexoes_ativas_min'], nginx['nginx_conexoes_ativas_max']), (0, 9))
+        self.assertEqual(nginx['nginx_conexoes_ativas_media'], round((45 + 0 + 1 + 2) / 13, 4))
+        self.assertEqual(nginx['nginx_conexoes_aceitas_aumento'], 10)
+        self.assertEqual(nginx['nginx_requisicoes_aumento'], 60)
+        self.assertEqual(len(nginx['serie_nginx_requisicoes'].split(';')), 13)
+        self.assertTrue(nginx['serie_nginx_requisicoes'].startswith('1000.000:5000;1001.000:5005'))
+        self.assertEqual(nginx['erro'], '')
+        self.assertEqual(nginx['apache_acessos_aumento'], '')
+        #Janela 2 em [1012, 1022]: gauge constante, contador 2t, consulta com erro e consulta sem series
+        self.assertEqual((apache['apache_workers_ocupados_min'], apache['apache_workers_ocupados_media'],
+                          apache['apache_workers_ocupados_max']), (3, 3, 3))
+        self.assertEqual(apache['apache_acessos_aumento'], 20)
+        self.assertEqual((apache['apache_cpuload_media'], apache['serie_apache_cpuload']), ('', ''))
+        self.assertEqual((apache['apache_workers_ociosos_media'], apache['serie_apache_workers_ociosos']), ('', ''))
+        self.assertIn('consulta invalida', apache['erro'])
+        #Janela 3: HTTP 500 numa metrica nao apaga as outras
+        self.assertIn('500', grande['erro'])
+        self.assertEqual(grande['nginx_requisicoes_aumento'], '')
+        self.assertEqual(grande['nginx_conexoes_ativas_max'], 9)
+        #Servidor sem consultas: linha so com a identificacao
+        self.assertEqual((local['teste'], local['erro'], local['nginx_conexoes_ativas_media']), ('sem_consultas', '', ''))
+        self.assertEqual(set(nginx) - {'id_teste', 'servidor', 'inicio', 'fim', 'teste', 'erro'},
+                         set(self.coletor.campos()))
+
+    def test_prometheus_fora_do_ar(self):
+        coletor = ColetorPrometheus('http://127.0.0.1:1', timeout=1)
+        coletor.registrar_janela(1, 'nginx', 1000.0, 1001.0)
+        linha, = coletor.coletar()
+        coletor.fechar()
+        self.assertNotEqual(linha['erro'], '')
+        self.assertEqual(linha['nginx_conexoes_ativas_media'], '')
+        self.assertEqual(linha['serie_nginx_requisicoes'], '')
+
+
+if __name__ == '__main__':
+    unittest.main()
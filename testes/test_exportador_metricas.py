@@ -0,0 +1,95 @@
+#Testes do ExportadorMetricas: slots por thread e por processo somados no /metrics, slot de reserva e
+#acumulados entre testes
+
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import unittest
+from unittest import mock
+
+import requests
+
+sys.path.append(os.path.dirname(__file__))
+
+import exportador_metricas
+from exportador_metricas import ExportadorMetricas
+
+
+def valor(texto, metrica, cenario):
+    encontrado = re.search(r'^%s\{servidor="nginx",cenario="%s"\} (\S+)$' % (re.escape(metrica), cenario),
+                           texto, re.MULTILINE)
+    return float(encontrado.group(1))
+
+
+def concluir(exportador, quantidade, falhas=0):
+    for indice in range(quantidade):
+        exportador.requisicao_iniciada()
+        exportador.requisicao_concluida(indice >= falhas, 0.003)
+
+
+def processo_com_threads(exportador, threads, quantidade):
+    trabalhadores = [threading.Thread(target=concluir, args=(exportador, quantidade, 1)) for _ in range(threads)]
+    for trabalhador in trabalhadores:
+        trabalhador.start()
+    for trabalhador in trabalhadores:
+        trabalhador.join()
+
+
+class TesteExportadorMetricas(unittest.TestCase):
+    def rodar(self, exportador, processos=3, threads=8, quantidade=500):
+        contexto = multiprocessing.get_context('fork')
+        filhos = [contexto.Process(target=processo_com_threads, args=(exportador, threads, quantidade))
+                  for _ in range(processos)]
+        for filho in filhos:
+            filho.start()
+        processo_com_threads(exportador, threads, quantidade)
+        for filho in filhos:
+            filho.join()
+            self.assertEqual(filho.exitcode, 0)
+        return (processos + 1) * threads * quantidade, (processos + 1) * threads
+
+    def conferir(self, texto, cenario, total, erros):
+        self.assertEqual(valor(texto, 'cliente_requisicoes_total', cenario), total)
+        self.assertEqual(valor(texto, 'cliente_erros_total', cenario), erros)
+        self.assertEqual(valor(texto, 'cliente_latencia_segundos_count', cenario), total)
+        self.assertAlmostEqual(valor(texto, 'cliente_latencia_segundos_sum', cenario), total * 0.003, places=6)
+        self.assertIn('cliente_latencia_segundos_bucket{servidor="nginx",cenario="%s",le="0.0025"} 0' % cenario,
+                      texto)
+        self.assertIn('cliente_latencia_segundos_bucket{servidor="nginx",cenario="%s",le="0.005"} %d'
+                      % (cenario, total), texto)
+
+    def test_threads_e_processos_somados(self):
+        exportador = ExportadorMetricas(porta=0, endereco='127.0.0.1')
+        exportador.definir_contexto('nginx', 'A')
+        total, erros = self.rodar(exportador)
+        texto = exportador.renderizar()
+        self.conferir(texto, 'A', total, erros)
+        self.assertEqual(valor(texto, 'cliente_requisicoes_em_voo', 'A'), 0)
+        #Uma thread por slot: o slot de reserva nao foi usado
+        self.assertEqual(exportador.valores[exportador_metricas.REQUISICOES], 0)
+
+        #Troca de teste: A continua exposta com os totais e B comeca do zero, com slots novos
+        exportador.definir_contexto('nginx', 'B')
+        total_b, erros_b = self.rodar(exportador, processos=1, threads=2, quantidade=10)
+        exportador.iniciar()
+        try:
+            texto = requests.get(f'http://127.0.0.1:{exportador.porta}/metrics', timeout=5).text
+        finally:
+            exportador.parar()
+        self.conferir(texto, 'A', total, erros)
+        self.conferir(texto, 'B', total_b, erros_b)
+
+    def test_slot_de_reserva(self):
+        #Mais threads que slots: as excedentes dividem o slot 0, com a trava, sem perder contagens
+        with mock.patch.object(exportador_metricas, 'SLOTS', 4):
+            exportador = ExportadorMetricas(porta=0, endereco='127.0.0.1')
+            exportador.definir_contexto('nginx', 'C')
+            total, erros = self.rodar(exportador, processos=1, threads=6, quantidade=300)
+        self.assertGreater(exportador.valores[exportador_metricas.REQUISICOES], 0)
+        self.conferir(exportador.renderizar(), 'C', total, erros)
+
+
+if __name__ == '__main__':
+    unittest.main()
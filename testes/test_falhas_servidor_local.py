@@ -0,0 +1,60 @@
+#Regressao: contagem de sucessos e falhas contra o servidor local com atraso, chunked, gzip, erros 500 e
+#resets injetados, nos dois motores e nos dois modos de conexao
+
+import csv
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(__file__))
+
+import teste_carga
+
+#1 de cada 5 requisicoes recebe 500 e 1 de cada 10 leva RST no meio do corpo (conjuntos disjuntos)
+OPCOES_SERVIDOR = {'latencia_ms': 1.0, 'chunked': True, 'compressao': 'sempre', 'taxa_erro': 0.2,
+                   'taxa_reset': 0.1}
+REQUISICOES = 100
+
+
+class TesteFalhasServidorLocal(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir_resultados = tempfile.mkdtemp()
+        cls.testador = teste_carga.TestadorCarga(servidor_local=OPCOES_SERVIDOR, url_prometheus=None,
+                                                 dir_resultados=cls.dir_resultados)
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.testador.fechar_arquivos()
+        for processo in cls.testador.processos_locais:
+            processo.join()
+        shutil.rmtree(cls.dir_resultados)
+
+    def test_erros_500_e_resets_contam_como_falhas(self):
+        casos = [('threads', False), ('threads', True), ('asyncio', False), ('asyncio', True)]
+        for motor, manter_conexao in casos:
+            with self.subTest(motor=motor, manter_conexao=manter_conexao):
+                resultado = self.testador.teste_concorrente('nginx', '/api/pequeno', REQUISICOES, 4,
+                                                            f'falhas_{motor}', motor=motor,
+                                                            manter_conexao=manter_conexao)
+                self.assertEqual(resultado['total'], REQUISICOES)
+                self.assertEqual(resultado['sucessos'], REQUISICOES * 7 // 10)
+                self.assertAlmostEqual(resultado['taxa_erro'], 30.0)
+                #So as respostas 200 completas entram no histograma de latencia
+                self.assertEqual(resultado['histograma'].total, REQUISICOES * 7 // 10)
+
+        with open(os.path.join(self.dir_resultados, 'resultados_testes.csv'), newline='', encoding='utf-8') as f:
+            linhas = list(csv.DictReader(f))
+        self.assertEqual(len(linhas), len(casos))
+        for linha in linhas:
+            self.assertEqual((linha['sucessos'], linha['falhas'], linha['respostas_5xx']), ('70', '30', '20'))
+            self.assertEqual((linha['taxa_sucesso_%'], linha['taxa_erro_%']), ('70.0', '30.0'))
+            #Sem verificacao de integridade, a divisao transporte/conteudo fica vazia
+            self.assertEqual(linha['falhas_transporte'], '')
+            self.assertNotEqual(linha['latencia_p99_ms'], '')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,110 @@
+#Testes do HistogramaLatencia: percentis contra os valores exatos, uniao entre processos e serializacao
+#Execute com: python3 -m pytest testes (ou python3 -m unittest discover -s testes)
+
+import math
+import multiprocessing
+import os
+import pickle
+import random
+import sys
+import unittest
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+from histograma import HistogramaLatencia
+
+PERCENTIS = (1, 10, 50, 90, 95, 99, 99.9, 99.99, 100)
+
+
+def amostras_latencia(semente, quantidade=20000):
+    #Latencias em microssegundos com cauda longa (lognormal), de dezenas de us a segundos
+    gerador = random.Random(semente)
+    return [int(gerador.lognormvariate(8, 1.5)) for _ in range(quantidade)]
+
+
+def registrar_parte(valores):
+    #Executado num processo trabalhador: o histograma volta ao pai por pickle (__reduce__)
+    histograma = HistogramaLatencia()
+    for valor in valores:
+        histograma.registrar(valor)
+    return histograma
+
+
+class TesteHistograma(unittest.TestCase):
+    def conferir_percentis(self, valores, digitos):
+        histograma = HistogramaLatencia(digitos)
+        for valor in valores:
+            histograma.registrar(valor)
+        ordenados = sorted(valores)
+        resultado = histograma.percentis(PERCENTIS)
+        for percentil in PERCENTIS:
+            exato = ordenados[max(1, math.ceil(percentil / 100 * len(ordenados))) - 1]
+            #O histograma reporta o maior valor equivalente do bucket: nunca abaixo do exato e, no maximo,
+            #uma unidade de precisao (10^-digitos relativo) acima dele
+            self.assertGreaterEqual(resultado[percentil], exato, percentil)
+            self.assertLessEqual(resultado[percentil], exato + max(1, exato * 10 ** -digitos), percentil)
+        self.assertEqual(histograma.total, len(valores))
+        self.assertEqual(histograma.minimo, ordenados[0])
+        self.assertEqual(histograma.maximo, ordenados[-1])
+        self.assertAlmostEqual(histograma.media(), sum(valores) / len(valores), places=6)
+
+    def test_percentis_dentro_da_precisao(self):
+        for digitos in (2, 3, 4):
+            with self.subTest(digitos=digitos):
+                self.conferir_percentis(amostras_latencia(digitos), digitos)
+
+    def test_valores_pequenos_sao_exatos(self):
+        #Abaixo de 2 * 10^digitos cada valor tem o seu proprio sub-bucket
+        histograma = HistogramaLatencia(3)
+        for valor in range(1, 1001):
+            histograma.registrar(valor)
+        self.assertEqual(histograma.percentis((50, 99, 100)), {50: 500, 99: 990, 100: 1000})
+
+    def test_vazio_e_saturacao(self):
+        histograma = HistogramaLatencia(2, maior_valor=1000)
+        self.assertEqual(histograma.percentil(99), 0)
+        self.assertEqual(histograma.media(), 0.0)
+        histograma.registrar(-5)
+        histograma.registrar(10 ** 9)
+        self.assertEqual((histograma.minimo, histograma.maximo), (0, 1000))
+        self.assertEqual(histograma.percentil(100), 1000)
+
+    def test_mesclar_entre_processos_igual_a_um_unico_histograma(self):
+        valores = amostras_latencia(7)
+        partes = [valores[inicio::4] for inicio in range(4)]
+        contexto = multiprocessing.get_context('fork' if hasattr(os, 'fork') else 'spawn')
+        with contexto.Pool(4) as pool:
+            parciais = pool.map(registrar_parte, partes)
+        unido = HistogramaLatencia()
+        for parcial in parciais:
+            unido.mesclar(parcial)
+        unico = registrar_parte(valores)
+        self.assertEqual(list(unido.contagens), list(unico.contagens))
+        self.assertEqual((unido.total, unido.minimo, unido.maximo), (unico.total, unico.minimo, unico.maximo))
+        self.assertAlmostEqual(unido.soma, unico.soma)
+        self.assertEqual(unido.percentis(PERCENTIS), unico.percentis(PERCENTIS))
+
+    def test_mesclar_configuracoes_diferentes(self):
+        with self.assertRaises(ValueError):
+            HistogramaLatencia(3).mesclar(HistogramaLatencia(2))
+
+    def test_serializacao_ida_e_volta(self):
+        histograma = registrar_parte(amostras_latencia(11, 5000))
+        for copia in (HistogramaLatencia.decodificar(histograma.codificar()),
+                      HistogramaLatencia.de_bytes(histograma.para_bytes()),
+                      pickle.loads(pickle.dumps(histograma))):
+            self.assertEqual(list(copia.contagens), list(histograma.contagens))
+            self.assertEqual((copia.total, copia.minimo, copia.maximo, copia.soma, copia.soma_quadrados),
+                             (histograma.total, histograma.minimo, histograma.maximo, histograma.soma,
+                              histograma.soma_quadrados))
+            self.assertEqual(copia.percentis(), histograma.percentis())
+        #__reduce__ usa a forma compactada, muito menor que as contagens brutas
+        self.assertLess(len(pickle.dumps(histograma)), len(histograma.contagens) * 8 // 4)
+
+    def test_dados_invalidos(self):
+        with self.assertRaises(ValueError):
+            HistogramaLatencia.de_bytes(b'XXXX' + HistogramaLatencia().para_bytes()[4:])
+
+
+if __name__ == '__main__':
+    unittest.main()
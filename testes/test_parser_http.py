@@ -0,0 +1,188 @@
+#Testes do ParserRespostaHTTP: framing (Content-Length, chunked com trailers, ate o fechamento), respostas sem
+#corpo, blocos cortados em qualquer posicao, respostas truncadas e limite da pre-alocacao do corpo
+
+import os
+import sys
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
+
+import parser_http
+from parser_http import ParserRespostaHTTP, RespostaIncompleta, ErroProtocoloHTTP
+
+CHUNKED = (b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\nTrailer: X-Soma\r\n\r\n"
+           b"5;ext=1\r\nabcde\r\n"
+           b"10\r\n0123456789ABCDEF\r\n"
+           b"0\r\nX-Soma: 21\r\nX-Outro: sim\r\n\r\n")
+CORPO_CHUNKED = b"abcde0123456789ABCDEF"
+
+
+def alimentar_em_partes(parser, dados, cortes):
+    #Alimenta o parser com `dados` cortados nas posicoes `cortes`; retorna o total consumido
+    consumidos = 0
+    inicio = 0
+    for fim in list(cortes) + [len(dados)]:
+        consumidos += parser.alimentar(dados[inicio:fim])
+        inicio = fim
+    return consumidos
+
+
+class TesteParserHTTP(unittest.TestCase):
+    def test_content_length(self):
+        parser = ParserRespostaHTTP()
+        dados = b"HTTP/1.1 200 OK\r\nContent-Length: 5\r\nX-A: 1\r\n\r\nhello"
+        self.assertEqual(parser.alimentar(dados), len(dados))
+        self.assertTrue(parser.completa)
+        self.assertTrue(parser.reutilizavel)
+        self.assertEqual((parser.codigo_status, bytes(parser.corpo), parser.cabecalhos['X-A']), (200, b"hello", '1'))
+        self.assertEqual(parser.bytes_fio, len(dados))
+
+    def test_chunked_com_trailers(self):
+        parser = ParserRespostaHTTP(algoritmo_hash='sha256')
+        self.assertEqual(parser.alimentar(CHUNKED), len(CHUNKED))
+        self.assertTrue(parser.completa)
+        self.assertTrue(parser.reutilizavel)
+        self.assertEqual(bytes(parser.corpo), CORPO_CHUNKED)
+        self.assertEqual(parser.tamanho_corpo, len(CORPO_CHUNKED))
+        self.assertEqual(parser.trailers, {'X-Soma': '21', 'X-Outro': 'sim'})
+        self.assertEqual(parser.bytes_fio, len(CHUNKED))
+        self.assertIsNotNone(parser.hash_corpo)
+
+    def test_cortes_em_qualquer_posicao(self):
+        #Cabecalho, tamanho de chunk, CRLF e trailers cortados em cada posicao possivel (e byte a byte)
+        for corte in range(1, len(CHUNKED)):
+            with self.subTest(corte=corte):
+                parser = ParserRespostaHTTP()
+                self.assertEqual(alimentar_em_partes(parser, CHUNKED, [corte]), len(CHUNKED))
+                self.assertTrue(parser.completa)
+                self.assertEqual(bytes(parser.corpo), CORPO_CHUNKED)
+                self.assertEqual(parser.trailers['X-Soma'], '21')
+        parser = ParserRespostaHTTP()
+        self.assertEqual(alimentar_em_partes(parser, CHUNKED, range(1, len(CHUNKED))), len(CHUNKED))
+        self.assertEqual(bytes(parser.corpo), CORPO_CHUNKED)
+
+    def test_pipelining_nao_consome_a_proxima_resposta(self):
+        primeira = b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok"
+        parser = ParserRespostaHTTP()
+        self.assertEqual(parser.alimentar(primeira + CHUNKED), len(primeira))
+        segunda = ParserRespostaHTTP()
+        self.assertEqual(segunda.alimentar(CHUNKED), len(CHUNKED))
+
+    def test_corpo_ate_fechar(self):
+        parser = ParserRespostaHTTP()
+        parser.alimentar(b"HTTP/1.1 200 OK\r\nConnection: close\r\n\r\nparte 1, ")
+        parser.alimentar(b"parte 2")
+        self.assertFalse(parser.completa)
+        parser.finalizar()
+        self.assertTrue(parser.completa)
+        self.assertFalse(parser.reutilizavel)
+        self.assertEqual(bytes(parser.corpo), b"parte 1, parte 2")
+
+    def test_transfer_encoding_sem_chunked_termina_no_fechamento(self):
+        parser = ParserRespostaHTTP()
+        parser.alimentar(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: gzip\r\n\r\nxyz")
+        parser.finalizar()
+        self.assertEqual(bytes(parser.corpo), b"xyz")
+        self.assertFalse(parser.reutilizavel)
+
+    def test_respostas_sem_corpo(self):
+        casos = [
+            ('HEAD', b"HTTP/1.1 200 OK\r\nContent-Length: 100\r\n\r\n"),
+            ('GET', b"HTTP/1.1 204 No Content\r\n\r\n"),
+            ('GET', b"HTTP/1.1 304 Not Modified\r\nContent-Length: 100\r\n\r\n"),
+            ('GET', b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\n\r\n"),
+        ]
+        for metodo, dados in casos:
+            with self.subTest(metodo=metodo, dados=dados[:12]):
+                parser = ParserRespostaHTTP(metodo)
+                self.assertEqual(parser.alimentar(dados + b"HTTP/1.1"), len(dados))
+                self.assertTrue(parser.completa)
+                self.assertTrue(parser.reutilizavel)
+                self.assertEqual(parser.tamanho_corpo, 0)
+
+    def test_informativas_sao_puladas(self):
+        dados = (b"HTTP/1.1 100 Continue\r\n\r\nHTTP/1.1 103 Early Hints\r\nLink: </a>\r\n\r\n"
+                 b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+        parser = ParserRespostaHTTP()
+        self.assertEqual(alimentar_em_partes(parser, dados, [10, 30, 70]), len(dados))
+        self.assertEqual((parser.informativas, parser.codigo_status, bytes(parser.corpo)), (2, 200, b"ok"))
+
+    def test_http10_e_connection_close_nao_sao_reutilizaveis(self):
+        for dados in (b"HTTP/1.0 200 OK\r\nContent-Length: 0\r\n\r\n",
+                      b"HTTP/1.1 200 OK\r\nContent-Length: 0\r\nConnection: close\r\n\r\n"):
+            parser = ParserRespostaHTTP()
+            parser.alimentar(dados)
+            self.assertTrue(parser.completa)
+            self.assertFalse(parser.reutilizavel)
+        parser = ParserRespostaHTTP()
+        parser.alimentar(b"HTTP/1.0 200 OK\r\nContent-Length: 0\r\nConnection: keep-alive\r\n\r\n")
+        self.assertTrue(parser.reutilizavel)
+
+    def test_respostas_incompletas(self):
+        casos = [
+            b"HTTP/1.1 200 OK\r\nContent-Le",
+            b"HTTP/1.1 200 OK\r\nContent-Length: 10\r\n\r\nabc",
+            b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nab",
+            b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nabcde\r\n0\r\n",
+        ]
+        for dados in casos:
+            with self.subTest(dados=dados[-12:]):
+                parser = ParserRespostaHTTP()
+                parser.alimentar(dados)
+                with self.assertRaises(RespostaIncompleta):
+                    parser.finalizar()
+        #O corpo truncado fica so com os bytes recebidos
+        parser = ParserRespostaHTTP()
+        parser.alimentar(casos[1])
+        with self.assertRaises(RespostaIncompleta):
+            parser.finalizar()
+        self.assertEqual(bytes(parser.corpo), b"abc")
+
+    def test_erros_de_protocolo(self):
+        for dados in (b"HTPP/1.1 200 OK\r\n\r\n", b"HTTP/1.1 abc OK\r\n\r\n",
+                      b"HTTP/1.1 200 OK\r\nContent-Length: -1\r\n\r\n",
+                      b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\nzz\r\n",
+                      b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n2\r\nabc\r\n"):
+            with self.subTest(dados=dados[:40]):
+                with self.assertRaises(ErroProtocoloHTTP):
+                    ParserRespostaHTTP().alimentar(dados)
+
+    def test_pre_alocacao_limitada(self):
+        #Content-Length enorme nao e alocado de uma vez
+        parser = ParserRespostaHTTP()
+        parser.alimentar(b"HTTP/1.1 200 OK\r\nContent-Length: 1073741824\r\n\r\nabc")
+        self.assertLessEqual(len(parser.corpo), parser_http.PREALOCACAO_MAXIMA_CORPO)
+        self.assertEqual(parser.tamanho_corpo, 3)
+        #Sem guardar o corpo, nada e alocado
+        parser = ParserRespostaHTTP(guardar_corpo=False)
+        parser.alimentar(b"HTTP/1.1 200 OK\r\nContent-Length: 1073741824\r\n\r\nabc")
+        self.assertEqual(len(parser.corpo), 0)
+        self.assertIsNone(parser.espaco_corpo())
+
+    def test_corpo_cresce_alem_da_pre_alocacao(self):
+        corpo = bytes(range(256)) * 4
+        cabecalho = b"HTTP/1.1 200 OK\r\nContent-Length: %d\r\n\r\n" % len(corpo)
+        with mock.patch.object(parser_http, 'PREALOCACAO_MAXIMA_CORPO', 100):
+            #Pelo alimentar(), em blocos de tamanhos variados
+            parser = ParserRespostaHTTP()
+            alimentar_em_partes(parser, cabecalho + corpo, [len(cabecalho) + 7, len(cabecalho) + 300, 1000])
+            self.assertTrue(parser.completa)
+            self.assertEqual(bytes(parser.corpo), corpo)
+            #Pelo espaco_corpo()/corpo_recebido(), como o recv_into do ClienteHTTP
+            parser = ParserRespostaHTTP(algoritmo_hash='sha256')
+            parser.alimentar(cabecalho + corpo[:10])
+            posicao = 10
+            while not parser.completa:
+                with parser.espaco_corpo() as destino:
+                    self.assertLessEqual(len(destino), 100)
+                    quantidade = min(len(destino), 37)
+                    destino[:quantidade] = corpo[posicao:posicao + quantidade]
+                parser.corpo_recebido(quantidade)
+                posicao += quantidade
+            self.assertEqual(bytes(parser.corpo), corpo)
+            self.assertEqual(len(parser.corpo), len(corpo))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,76 @@
+#Testes da ReproducaoLog: instantes planejados nunca recuam (inclusive em segundos divididos em varios
+#grupos), espalhamento dentro do segundo, velocidade, limite e linhas ignoradas
+
+import gzip
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+from unittest import mock
+
+sys.path.append(os.path.dirname(__file__))
+
+import reproducao_log
+from reproducao_log import ReproducaoLog
+
+
+def linha(segundo, caminho='/', metodo='GET'):
+    return (f'172.17.0.1 - - [10/Oct/2024:13:55:{segundo:02d} -0300] "{metodo} {caminho} HTTP/1.1" 200 512 '
+            f'"-" "curl/8.0" "57ce9496"\n')
+
+
+class TesteReproducaoLog(unittest.TestCase):
+    def setUp(self):
+        self.diretorio = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.diretorio)
+
+    def escrever(self, linhas, nome='access.log'):
+        arquivo = os.path.join(self.diretorio, nome)
+        abrir = gzip.open if nome.endswith('.gz') else open
+        with abrir(arquivo, 'wt', encoding='utf-8') as f:
+            f.writelines(linhas)
+        return arquivo
+
+    def test_espalha_dentro_do_segundo(self):
+        arquivo = self.escrever([linha(0, f'/a{i}') for i in range(4)] + [linha(2, '/b')])
+        planejadas = list(ReproducaoLog(arquivo))
+        self.assertEqual([deslocamento for deslocamento, _, _ in planejadas], [0.0, 0.25, 0.5, 0.75, 2.0])
+        self.assertEqual([caminho for _, _, caminho in planejadas], ['/a0', '/a1', '/a2', '/a3', '/b'])
+
+    def test_segundo_dividido_em_grupos_nao_recua(self):
+        #Rajada de 23 linhas no mesmo segundo com grupos de no maximo 5, inversoes de ordem do Nginx
+        #(linha do segundo 1 depois das do 2) e mais segundos depois dela
+        linhas = [linha(0)] + [linha(1, f'/r{i}') for i in range(23)] + [linha(2), linha(1), linha(2), linha(3)]
+        arquivo = self.escrever(linhas)
+        with mock.patch.object(reproducao_log, 'LIMITE_GRUPO', 5):
+            reproducao = ReproducaoLog(arquivo)
+            planejadas = [deslocamento for deslocamento, _, _ in reproducao]
+        self.assertEqual(len(planejadas), len(linhas))
+        self.assertEqual(reproducao.reproduzidas, len(linhas))
+        self.assertTrue(all(anterior < atual for anterior, atual in zip(planejadas, planejadas[1:])), planejadas)
+        #A rajada fica toda dentro do seu segundo, na ordem do log
+        rajada = planejadas[1:24]
+        self.assertEqual(rajada[0], 1.0)
+        self.assertTrue(all(1.0 <= deslocamento < 2.0 for deslocamento in rajada))
+        self.assertEqual(planejadas[-1], 3.0)
+        self.assertEqual(reproducao.duracao_original, 3.0)
+
+    def test_velocidade_limite_e_ignoradas(self):
+        linhas = [linha(0, '/a'), 'lixo\n', linha(0, '/post', 'POST'), linha(0, 'http://exemplo.com/b'),
+                  linha(4, '/c', 'HEAD'), linha(8, '/d')]
+        arquivo = self.escrever(linhas, 'access.log.gz')
+        reproducao = ReproducaoLog(arquivo, velocidade=2.0)
+        self.assertEqual(list(reproducao), [(0.0, 'GET', '/a'), (0.25, 'GET', '/b'), (2.0, 'HEAD', '/c'),
+                                            (4.0, 'GET', '/d')])
+        self.assertEqual((reproducao.linhas, reproducao.ignoradas, reproducao.reproduzidas), (6, 2, 4))
+        reproducao = ReproducaoLog(arquivo, limite=2)
+        self.assertEqual([caminho for _, _, caminho in reproducao], ['/a', '/b'])
+        #Cada iteracao rele o log do inicio
+        self.assertEqual(len(list(reproducao)), 2)
+        with self.assertRaises(ValueError):
+            ReproducaoLog(arquivo, velocidade=0)
+
+
+if __name__ == '__main__':
+    unittest.main()
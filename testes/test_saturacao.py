@@ -0,0 +1,59 @@
+#Testes da busca de saturacao contra o servidor local com erros 500 injetados: o SLO de taxa de erro
+#reprova os niveis com erros acima do limite, em malha fechada e em malha aberta
+
+import os
+import shutil
+import sys
+import tempfile
+import unittest
+
+sys.path.append(os.path.dirname(__file__))
+
+import teste_carga
+
+#1 de cada 20 requisicoes recebe 500: cada nivel (multiplo de 20 requisicoes) tem exatamente 5% de erros
+TAXA_ERRO_SERVIDOR = 0.05
+
+
+class TesteSaturacao(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.dir_resultados = tempfile.mkdtemp()
+        cls.testador = teste_carga.TestadorCarga(servidor_local={'taxa_erro': TAXA_ERRO_SERVIDOR},
+                                                 url_prometheus=None, dir_resultados=cls.dir_resultados)
+        #Niveis curtos: 2, 4 e 8 usuarios com 20 requisicoes cada; 50, 100 e 200 req/s por 0,4 s
+        cls.testador.SATURACAO = {**teste_carga.TestadorCarga.SATURACAO, 'usuarios_iniciais': 2,
+                                  'requisicoes_por_usuario': 20, 'taxa_inicial': 50, 'duracao': 0.4,
+                                  'usuarios_malha_aberta': 20, 'max_degraus': 3}
+
+    @classmethod
+    def tearDownClass(cls):
+        cls.testador.fechar_arquivos()
+        for processo in cls.testador.processos_locais:
+            processo.join()
+        shutil.rmtree(cls.dir_resultados)
+
+    def erros_por_nivel(self, linha):
+        return [float(nivel.split(':')[3]) for nivel in linha['niveis'].split(';')]
+
+    def test_erros_acima_do_slo_reprovam_o_primeiro_nivel(self):
+        for variavel, primeira_carga in (('usuarios', 2), ('taxa', 50)):
+            with self.subTest(variavel=variavel):
+                linha = self.testador.buscar_saturacao('nginx', '/api/pequeno', 'saturacao_erros', variavel,
+                                                       slo_p99_ms=1000, slo_taxa_erro=1.0)
+                self.assertEqual(linha['saturou'], 'sim')
+                self.assertEqual(linha['primeira_carga_reprovada'], primeira_carga)
+                self.assertEqual((linha['carga_maxima_aprovada'], linha['vazao_sustentavel_rps']), ('', ''))
+                self.assertEqual(self.erros_por_nivel(linha), [5.0])
+
+    def test_erros_dentro_do_slo_nao_saturam(self):
+        linha = self.testador.buscar_saturacao('apache', '/api/pequeno', 'saturacao_erros', 'usuarios',
+                                               slo_p99_ms=1000, slo_taxa_erro=10.0)
+        self.assertEqual(linha['saturou'], 'nao')
+        self.assertEqual((linha['niveis_medidos'], linha['carga_maxima_aprovada']), (3, 8))
+        self.assertEqual(self.erros_por_nivel(linha), [5.0, 5.0, 5.0])
+        self.assertNotEqual(linha['vazao_sustentavel_rps'], '')
+
+
+if __name__ == '__main__':
+    unittest.main()
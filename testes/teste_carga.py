@@ -1,9 +1,15 @@
 import sys
 import os
 import time
-import statistics
-import csv
-import requests
+import itertools
+import argparse
+import asyncio
+import multiprocessing
+import queue
+import threading
+import random
+import bisect
+from array import array
 from datetime import datetime
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
@@ -11,8 +17,20 @@ from concurrent.futures import ThreadPoolExecutor, as_completed
 sys.path.append(os.path.join(os.path.dirname(__file__), '..', 'src'))
 
 try:
-    from cliente import ClienteHTTP
+    from cliente import ClienteHTTP, PoolConexoes, FASES
+    from cliente_assincrono import ClienteHTTPAssincrono, ajustar_limite_descritores
+    from histograma import HistogramaLatencia
+    from manifesto_estaticos import ReferenciaEstatica, ErroManifesto, ler_manifesto, CORPO_CURTO, CORPO_CORROMPIDO
     from configuracao import ID_CUSTOMIZADO
+    from gravadores import FORMATOS, FORMATOS_AMOSTRAS, abrir_amostras, abrir_gravador
+    from exportador_metricas import ExportadorMetricas, PORTA_METRICAS
+    from amostrador_cgroup import (AmostradorCgroup, LeitorCgroup, localizar_cgroup, PROCESSOS_SERVIDORES,
+                                   RAIZ_CGROUP, RAIZ_PROC, INTERVALO_AMOSTRAGEM)
+    from amostrador_gerador import AmostradorGerador, nucleos_disponiveis, threads_processo
+    from coletor_prometheus import ColetorPrometheus, URL_PROMETHEUS
+    from cenarios import carregar_cenarios, MOTORES
+    from reproducao_log import ReproducaoLog
+    from servidor_local import iniciar_em_processo, analisar_opcoes
 except ImportError as e:
     print(f"[ERRO] Erro ao importar modulos: {e}")
     print("Certifique-se de estar no diretorio correto do projeto")
@@ -55,480 +73,1343 @@ class Cores:
         return f"{Cores.CIANO}{Cores.NEGRITO}{texto}{Cores.RESET}"
 
 
-class TestadorCarga:
-    #Classe para executar testes de carga nos servidores
+class EstatisticasTeste:
+    #Contadores e histogramas de latencia de um teste, com memoria constante
+    #Cada thread/processo usa a sua instancia; no final elas sao unidas com mesclar()
     
-    #=================================================================
-    #CONFIGURACOES DOS CENARIOS DE TESTE
-    #=================================================================
-    NUM_EXECUCOES = 10 
-    NUM_USUARIOS = 10
-    NUM_REQUISTICOES = 50
-    
-    CENARIO_1_BAIXA_CARGA = {
-        'usuarios': 10,     
-        'requisicoes': 100, 
-        'endpoint': '/api/info'
-    }
+    #Precisao dos histogramas por fase (2 digitos: ~1%, um decimo da memoria do histograma total)
+    DIGITOS_FASES = 2
     
-    CENARIO_2_MEDIA_CARGA = {
-        'usuarios': 50,
-        'requisicoes': 500,
-        'endpoint': '/api/status'
-    }
+    def __init__(self, digitos=3, detalhada=True):
+        #detalhada=False: parte de um caminho no modo misto, so com a latencia total (sem fases nem
+        #divisao por caminho), para a memoria por thread x caminho ficar pequena
+        self.digitos = digitos
+        self.histograma = HistogramaLatencia(digitos)
+        #Um histograma por fase (conexao, envio, primeiro_byte, cabecalho, corpo), em microssegundos
+        self.fases = {fase: HistogramaLatencia(self.DIGITOS_FASES) for fase in FASES} if detalhada else {}
+        #Modo misto: estatisticas de cada caminho sorteado, criadas no primeiro uso
+        self.por_caminho = {} if detalhada else None
+        #Malha aberta: latencia medida desde o instante planejado e atraso de cada envio em relacao
+        #a ele, inclusive das falhas (criados so quando usados)
+        self.histograma_corrigido = None
+        self.histograma_atraso = None
+        self.total = 0
+        self.sucessos = 0
+        self.reutilizadas = 0
+        #Bytes do corpo decodificado e bytes no fio (status, cabecalhos, framing chunked)
+        self.bytes_corpo = 0
+        self.bytes_fio = 0
+        #Falhas de conteudo (com verificacao de integridade): corpo completo pelo framing, mas so um
+        #prefixo do arquivo de origem ou diferente dele; as demais falhas sao de transporte
+        self.curtas = 0
+        self.corrompidas = 0
+        #Respostas completas, mas com erro do servidor (status 5xx)
+        self.erros_http = 0
     
-    CENARIO_3_ALTA_CARGA = {
-        'usuarios': 100,
-        'requisicoes': 1000,
-        'endpoint': '/api/dados'
-    }
+    @property
+    def falhas(self):
+        return self.total - self.sucessos
     
-    #Cenarios de Arquivos Pequenos
-    CENARIO_4_ARQUIVO_1KB = {
-        'usuarios': NUM_USUARIOS,
-        'requisicoes': NUM_REQUISTICOES,
-        'arquivo': 'pequeno-1kb.txt',
-        'tamanho': '1KB'
-    }
+    @property
+    def falhas_transporte(self):
+        return self.falhas - self.erros_http - self.curtas - self.corrompidas
     
-    CENARIO_5_ARQUIVO_10KB = {
-        'usuarios': NUM_USUARIOS,
-        'requisicoes': NUM_REQUISTICOES,
-        'arquivo': 'pequeno-10kb.txt',
-        'tamanho': '10KB'
-    }
+    def registrar(self, resultado):
+        self._registrar(resultado)
+        caminho = resultado.get('caminho')
+        if caminho is not None and self.por_caminho is not None:
+            parte = self.por_caminho.get(caminho)
+            if parte is None:
+                parte = self.por_caminho[caminho] = EstatisticasTeste(self.DIGITOS_FASES, detalhada=False)
+            parte._registrar(resultado)
     
-    CENARIO_6_ARQUIVO_50KB = {
-        'usuarios': NUM_USUARIOS,
-        'requisicoes': NUM_REQUISTICOES,
-        'arquivo': 'pequeno-50kb.txt',
-        'tamanho': '50KB'
-    }
+    def _registrar(self, resultado):
+        self.total += 1
+        if resultado['sucesso']:
+            self.sucessos += 1
+            #Latencia em microssegundos; so requisicoes com sucesso entram nos histogramas
+            self.histograma.registrar(resultado['tempo_resposta'] * 1000000)
+            if self.fases:
+                for fase, duracao_ns in resultado.get('fases_ns', {}).items():
+                    self.fases[fase].registrar(duracao_ns // 1000)
+            if 'tempo_corrigido' in resultado:
+                if self.histograma_corrigido is None:
+                    self.histograma_corrigido = HistogramaLatencia(self.digitos)
+                self.histograma_corrigido.registrar(resultado['tempo_corrigido'] * 1000000)
+        elif resultado.get('erro_http'):
+            self.erros_http += 1
+        else:
+            integridade = resultado.get('integridade')
+            if integridade == CORPO_CURTO:
+                self.curtas += 1
+            elif integridade == CORPO_CORROMPIDO:
+                self.corrompidas += 1
+        if 'atraso' in resultado and self.fases:
+            if self.histograma_atraso is None:
+                self.histograma_atraso = HistogramaLatencia(self.DIGITOS_FASES)
+            self.histograma_atraso.registrar(resultado['atraso'] * 1000000)
+        if resultado.get('conexao_reutilizada'):
+            self.reutilizadas += 1
+        self.bytes_corpo += resultado.get('tamanho_resposta', 0)
+        self.bytes_fio += resultado.get('bytes_fio', 0)
     
-    #Cenarios de Arquivos Medios
-    CENARIO_7_ARQUIVO_100KB = {
-        'usuarios': NUM_USUARIOS,
-        'requisicoes': NUM_REQUISTICOES,
-        'arquivo': 'medio-100kb.txt',
-        'tamanho': '100KB'
-    }
+    def mesclar(self, outra):
+        self.histograma.mesclar(outra.histograma)
+        for fase, histograma in outra.fases.items():
+            self.fases[fase].mesclar(histograma)
+        if outra.histograma_corrigido is not None:
+            if self.histograma_corrigido is None:
+                self.histograma_corrigido = HistogramaLatencia(self.digitos)
+            self.histograma_corrigido.mesclar(outra.histograma_corrigido)
+        if outra.histograma_atraso is not None:
+            if self.histograma_atraso is None:
+                self.histograma_atraso = HistogramaLatencia(self.DIGITOS_FASES)
+            self.histograma_atraso.mesclar(outra.histograma_atraso)
+        for caminho, parte in (outra.por_caminho or {}).items():
+            if caminho in self.por_caminho:
+                self.por_caminho[caminho].mesclar(parte)
+            else:
+                self.por_caminho[caminho] = parte
+        self.total += outra.total
+        self.sucessos += outra.sucessos
+        self.reutilizadas += outra.reutilizadas
+        self.curtas += outra.curtas
+        self.corrompidas += outra.corrompidas
+        self.erros_http += outra.erros_http
+        self.bytes_corpo += outra.bytes_corpo
+        self.bytes_fio += outra.bytes_fio
+        return self
+
+
+class AgendaChegadas:
+    #Instantes planejados de envio para a carga em malha aberta, em segundos desde o inicio
+    #'constante': intervalo fixo de 1/taxa | 'poisson': intervalos exponenciais com media 1/taxa
+    DISTRIBUICOES = ('constante', 'poisson')
     
-    CENARIO_8_ARQUIVO_500KB = {
-        'usuarios': NUM_USUARIOS,
-        'requisicoes': NUM_REQUISTICOES,
-        'arquivo': 'medio-500kb.txt',
-        'tamanho': '500KB'
-    }
+    def __init__(self, taxa, quantidade, distribuicao='constante', semente=None):
+        if taxa <= 0:
+            raise ValueError("A taxa alvo deve ser positiva")
+        if distribuicao not in self.DISTRIBUICOES:
+            raise ValueError(f"Distribuicao de chegadas invalida: {distribuicao}")
+        self.taxa = taxa
+        self.quantidade = quantidade
+        self.distribuicao = distribuicao
+        self.deslocamentos = None
+        if distribuicao == 'poisson':
+            gerador = random.Random(semente)
+            intervalos = (gerador.expovariate(taxa) for _ in range(max(quantidade - 1, 0)))
+            self.deslocamentos = array('d', itertools.accumulate(intervalos, initial=0.0))
     
-    CENARIO_9_ARQUIVO_700KB = {
-        'usuarios': NUM_USUARIOS,
-        'requisicoes': NUM_REQUISTICOES,
-        'arquivo': 'medio-700kb.txt',
-        'tamanho': '700KB'
-    }
+    def instante(self, indice):
+        if self.deslocamentos is None:
+            return indice / self.taxa
+        return self.deslocamentos[indice]
     
-    #Cenarios de Arquivos Grandes
-    CENARIO_10_ARQUIVO_1MB = {
-        'usuarios': NUM_USUARIOS,
-        'requisicoes': NUM_REQUISTICOES,
-        'arquivo': 'grande-1mb.txt',
-        'tamanho': '1MB'
-    }
+    def fatia(self, quantidade, semente=None):
+        #Agenda de um processo trabalhador: mesma distribuicao, taxa proporcional a sua parte
+        return AgendaChegadas(self.taxa * quantidade / self.quantidade, quantidade, self.distribuicao, semente)
+
+
+class MisturaCaminhos:
+    #Carga mista: cada requisicao de cada usuario virtual sorteia o caminho por peso
+    #(ex.: {'/api/dados': 70, '/saude': 20, '/estatico/grande-7mb.txt': 10})
+    #Cada usuario tem o seu gerador (sorteador()), sem trava entre threads nem sequencia repetida
+    #entre processos trabalhadores
+    def __init__(self, pesos):
+        if not pesos:
+            raise ValueError("A mistura precisa de pelo menos um caminho")
+        for caminho, peso in pesos.items():
+            if not caminho.startswith('/') or not peso > 0:
+                raise ValueError(f"Caminho ou peso invalido na mistura: {caminho}={peso}")
+        self.pesos = dict(pesos)
+        self.caminhos = list(self.pesos)
+        self.acumulados = list(itertools.accumulate(self.pesos.values()))
     
-    CENARIO_11_ARQUIVO_5MB = {
-        'usuarios': NUM_USUARIOS,
-        'requisicoes': NUM_REQUISTICOES,
-        'arquivo': 'grande-5mb.txt',
-        'tamanho': '5MB'
-    }
+    def sorteador(self):
+        gerador = random.Random()
+        caminhos, acumulados, total = self.caminhos, self.acumulados, self.acumulados[-1]
+        
+        def sortear():
+            return caminhos[bisect.bisect_right(acumulados, gerador.random() * total)]
+        return sortear
+    
+    def descrever(self):
+        #Forma compacta para o CSV: "caminho:peso;..."
+        return ';'.join(f"{caminho}:{peso:g}" for caminho, peso in self.pesos.items())
+    
+    def __str__(self):
+        return 'misto'
+
+
+class TestadorCarga:
+    #Classe para executar testes de carga nos servidores
+    
+    #Cenarios executados sem --cenarios (os 12 cenarios do trabalho, 10 execucoes)
+    ARQUIVO_CENARIOS = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'cenarios', 'padrao.json')
     
-    CENARIO_12_ARQUIVO_7MB = {
-        'usuarios': NUM_USUARIOS,
-        'requisicoes': NUM_REQUISTICOES,
-        'arquivo': 'grande-7mb.txt',
-        'tamanho': '7MB'
+    #Motores de geracao de carga disponiveis
+    MOTORES = MOTORES
+    
+    #Tempo maximo de espera pelos processos trabalhadores na barreira de inicio
+    TIMEOUT_BARREIRA = 60
+
+    #Busca de saturacao: a carga sobe em degraus geometricos ate violar o SLO e depois e
+    #refinada por busca binaria entre o ultimo nivel aprovado e o primeiro reprovado
+    VARIAVEIS_SATURACAO = ('taxa', 'usuarios')
+    SATURACAO = {
+        'taxa_inicial': 50,              #req/s no primeiro degrau (malha aberta)
+        'usuarios_iniciais': 10,         #usuarios no primeiro degrau (malha fechada)
+        'fator': 2,                      #multiplicador da carga entre degraus
+        'max_degraus': 10,
+        'refinamentos': 4,               #iteracoes da busca binaria
+        'duracao': 10,                   #segundos de carga por nivel em malha aberta
+        'requisicoes_por_usuario': 20,   #requisicoes por usuario por nivel em malha fechada
+        'usuarios_malha_aberta': 200,    #limite de requisicoes em voo em malha aberta
+        'slo_p99_ms': 500,
+        'slo_taxa_erro': 1.0,            #percentual
+        'queda_vazao': 0.9,              #joelho: vazao abaixo de 90% da carga oferecida...
+        'fator_latencia': 3,             #...ou P99 acima de 3x o P99 do primeiro degrau
+        'p99_minimo_joelho_ms': 10       #abaixo disso, variacoes do P99 sao ruido e nao marcam o joelho
     }
     
-    def __init__(self):
+    def __init__(self, manter_conexao=False, motor='threads', num_processos=1, verificar_integridade=False,
+                 profundidade_pipeline=1, taxa_alvo=None, chegadas='constante', formato='csv', amostras=None,
+                 porta_metricas=None, cgroups=None, raiz_cgroup=RAIZ_CGROUP, raiz_proc=RAIZ_PROC,
+                 intervalo_amostragem=INTERVALO_AMOSTRAGEM, url_prometheus=URL_PROMETHEUS, arquivo_cenarios=None,
+                 execucoes=None, servidor_local=None, dir_resultados=None):
         self.servidores = {
             'nginx': ('76.1.0.10', 80),
             'apache': ('76.1.0.11', 80)
         }
         self.id_customizado = ID_CUSTOMIZADO
         
+        #Cenarios declarados em arquivo (JSON/TOML), ja expandidos pela matriz de cada um;
+        #`execucoes` sobrepoe o numero de rodadas do arquivo
+        self.arquivo_cenarios = arquivo_cenarios or self.ARQUIVO_CENARIOS
+        execucoes_arquivo, self.cenarios = carregar_cenarios(self.arquivo_cenarios, tuple(self.servidores), taxa_alvo)
+        self.execucoes = execucoes or execucoes_arquivo
+        
+        #Modo padrao de conexao: uma por requisicao (close) ou persistente (keep-alive)
+        self.manter_conexao = manter_conexao
+        self.pool_conexoes = PoolConexoes()
+        
+        #Motor padrao: uma thread por usuario virtual ou corrotinas asyncio num unico processo
+        self.motor = motor
+        
+        #Com mais de um processo, os usuarios virtuais sao divididos entre nucleos
+        self.num_processos = num_processos
+        
+        #Requisicoes enviadas em sequencia por conexao antes de ler as respostas (1 = sem pipelining)
+        self.profundidade_pipeline = profundidade_pipeline
+        
+        #Com taxa alvo (req/s), a carga e em malha aberta: os envios seguem uma agenda fixa
+        #('constante' ou 'poisson') em vez de esperar a resposta anterior
+        self.taxa_alvo = taxa_alvo
+        self.chegadas = chegadas
+        
+        #Corpos sao sempre descartados durante a recepcao (memoria constante); opcionalmente, cada
+        #arquivo estatico recebido e comparado, pedaco a pedaco, com o arquivo de origem (mapeado em memoria
+        #e conferido com o manifesto) ou com os SHA-256 por bloco do manifesto
+        self.verificar_integridade = verificar_integridade
+        self.dir_estaticos = self.localizar_dir_estaticos()
+        self.manifesto = None
+        self.referencias = {}
+        
+        #Sem Docker: `servidor_local` (opcoes de servidor_local.py, ex.: latencia, banda, falhas injetadas)
+        #sobe um servidor por estilo em processo proprio, no loopback, no lugar de cada conteiner;
+        #sem conteiner nem Prometheus, as colunas de recursos e as series ficam vazias
+        self.processos_locais = []
+        if servidor_local is not None:
+            for servidor in self.servidores:
+                processo, porta = iniciar_em_processo(servidor, dir_estaticos=self.dir_estaticos, **servidor_local)
+                self.processos_locais.append(processo)
+                self.servidores[servidor] = ('127.0.0.1', porta)
+            cgroups = {**dict.fromkeys(self.servidores), **(cgroups or {})}
+            url_prometheus = None
+        
+        #CPU e memoria de cada servidor lidas do cgroup v2 do conteiner durante o teste; sem
+        #diretorio informado em `cgroups`, ele e descoberto pelo nome dos processos em raiz_proc
+        self.cgroups = dict(cgroups or {})
+        self.raiz_cgroup = raiz_cgroup
+        self.raiz_proc = raiz_proc
+        self.intervalo_amostragem = intervalo_amostragem
+        
+        #O proprio gerador tambem e amostrado (CPU, threads, atraso dos envios, GC): se ele chegou
+        #ao limite antes do servidor, a linha do resultado e marcada em `gerador_limitado`
+        #threads_motor: threads do gerador com todos os usuarios virtuais ja iniciados (registrar_concorrencia)
+        self.nucleos_gerador = nucleos_disponiveis()
+        self.threads_motor = 0
+        
+        #Janela [inicio, fim] de cada teste, consultada no Prometheus (query_range) ao fim da campanha;
+        #id_teste liga cada linha dos resultados a sua linha em resultados/prometheus.<formato>
+        self.coletor_prometheus = ColetorPrometheus(url_prometheus) if url_prometheus else None
+        self.ids_testes = itertools.count(1)
+        
         #Preparar diretorio e arquivos de saida
-        self.dir_resultados = os.path.join(os.path.dirname(__file__), '..', 'resultados')
+        self.dir_resultados = dir_resultados or os.path.join(os.path.dirname(__file__), '..', 'resultados')
         os.makedirs(self.dir_resultados, exist_ok=True)
         
         self.arquivo_txt = os.path.join(self.dir_resultados, 'resultados_testes.txt')
-        self.arquivo_csv = os.path.join(self.dir_resultados, 'resultados_testes.csv')
-        
         self.txt_file = open(self.arquivo_txt, 'w', encoding='utf-8')
-        self.dados_csv = []
+        
+        #Cada linha de resultado e gravada (CSV ou NDJSON) assim que o teste termina
+        self.formato = formato
+        self.gravador = abrir_gravador(os.path.join(self.dir_resultados, 'resultados_testes'), formato)
+        self.arquivo_resultados = self.gravador.arquivo
+        
+        #Opcional: uma linha por requisicao, gravada em blocos pelas threads do gerador
+        #(amostras = 'csv', 'ndjson' ou 'colunar'; None desliga)
+        self.amostras = abrir_amostras(os.path.join(self.dir_resultados, 'amostras'), amostras) if amostras else None
         
         print(f"\n[INFO] Resultados serao salvos em:")
         print(f"  - TXT: {self.arquivo_txt}")
-        print(f"  - CSV: {self.arquivo_csv}")
+        print(f"  - {formato.upper()}: {self.arquivo_resultados}")
+        if self.amostras is not None:
+            print(f"  - Amostras: {self.amostras.arquivo}")
+        #Opcional: endpoint /metrics com a latencia vista pelo cliente, raspado pelo Prometheus
+        self.metricas = None
+        if porta_metricas is not None:
+            self.metricas = ExportadorMetricas(porta_metricas)
+            self.metricas.iniciar()
+            print(f"  - Metricas do cliente: http://0.0.0.0:{self.metricas.porta}/metrics")
+        
+        if self.processos_locais:
+            print(f"\n[INFO] Servidores locais (sem Docker): " +
+                  ', '.join(f"{servidor} em {host}:{porta}" for servidor, (host, porta) in self.servidores.items()))
         print(f"\n[INFO] Metricas de CPU/Memoria:")
-        print(f"  Coletadas via Prometheus (http://prometheus:9090)")
+        print(f"  Amostradas do cgroup v2 de cada conteiner a cada {self.intervalo_amostragem * 1000:.0f}ms "
+              f"({self.raiz_cgroup}, {self.raiz_proc})")
         print(f"  Visualize em tempo real no Grafana (http://localhost:3000)")
     
+    def localizar_dir_estaticos(self):
+        #Arquivos de origem: no repositorio ou no volume montado no container cliente
+        for candidato in (os.path.join(os.path.dirname(__file__), '..', 'arquivos_estaticos'),
+                          '/app/conteudo-estatico'):
+            if os.path.isdir(candidato):
+                return candidato
+        return None
+    
+    def preparar_referencia(self, caminho):
+        #Carrega (uma vez) o conteudo esperado de um caminho /estatico/: o manifesto e lido na primeira
+        #chamada e o arquivo de origem, conferido com ele, fica mapeado em memoria ate o fim da execucao
+        if not caminho.startswith('/estatico/') or caminho in self.referencias:
+            return self.referencias.get(caminho)
+        referencia = None
+        if self.dir_estaticos:
+            if self.manifesto is None:
+                try:
+                    self.manifesto = ler_manifesto(self.dir_estaticos) or False
+                except ErroManifesto as e:
+                    self.print_e_salvar(f"  [AVISO] Manifesto ignorado: {e}")
+                    self.manifesto = False
+                if not self.manifesto:
+                    self.print_e_salvar(f"  [AVISO] Sem manifesto em {self.dir_estaticos}; os arquivos de origem "
+                                        f"nao serao conferidos (gere-o com src/gerar_arquivos_estaticos.py)")
+            referencia, aviso = ReferenciaEstatica.carregar(self.dir_estaticos, caminho[len('/estatico/'):],
+                                                             self.manifesto or None)
+            if aviso:
+                self.print_e_salvar(f"  [AVISO] {aviso}")
+        else:
+            self.print_e_salvar(f"  [AVISO] Diretorio dos arquivos de origem nao encontrado; "
+                                f"integridade de {caminho} nao verificada")
+        self.referencias[caminho] = referencia
+        return referencia
+    
+    def validador(self, caminho):
+        #Fabrica de validadores do corpo para o cliente, ou None sem verificacao para este caminho
+        if not self.verificar_integridade:
+            return None
+        referencia = self.referencias.get(caminho)
+        return referencia.validador if referencia is not None else None
+    
     def print_e_salvar(self, texto):
         #Imprime no terminal e salva no arquivo TXT
         print(texto)
         self.txt_file.write(texto + '\n')
         self.txt_file.flush()
     
-    def obter_metricas_container(self, servidor):
-        #Obtem metricas de CPU e Memoria do container via Prometheus/HTTP
-        import requests
-        
-        prometheus_url = "http://prometheus:9090"
-        
-        try:
-            cpu_percent = 0.0
-            mem_usage = "0MiB"
-            mem_percent = 0.0
-            
-            #Para Apache, usar metricas nativas do Prometheus
-            if servidor == 'apache':
-                #Query de CPU do Apache
-                cpu_response = requests.get(f'{prometheus_url}/api/v1/query', 
-                                           params={'query': 'apache_cpuload'}, timeout=3)
-                if cpu_response.status_code == 200:
-                    cpu_data = cpu_response.json()
-                    if cpu_data.get('data', {}).get('result'):
-                        cpu_percent = float(cpu_data['data']['result'][0]['value'][1])
-                
-                #Query de workers do Apache
-                workers_response = requests.get(f'{prometheus_url}/api/v1/query',
-                                               params={'query': 'apache_workers{state="busy"}'}, timeout=3)
-                if workers_response.status_code == 200:
-                    workers_data = workers_response.json()
-                    if workers_data.get('data', {}).get('result'):
-                        busy_workers = float(workers_data['data']['result'][0]['value'][1])
-                        #Estimar uso de memoria baseado em workers ativos (cada worker ~10MB)
-                        mem_mib = max(50, busy_workers * 10)  #Minimo 50MB
-                        mem_usage = f"{mem_mib:.1f}MiB"
-                        mem_percent = min(busy_workers * 2, 100.0)
-            
-            #Para Nginx, buscar stub_status diretamente
+    def criar_amostrador(self, servidor):
+        #Amostrador do cgroup do servidor, ou None se o cgroup nao for encontrado (avisa uma vez)
+        if servidor not in self.cgroups:
+            self.cgroups[servidor] = localizar_cgroup(PROCESSOS_SERVIDORES.get(servidor, (servidor,)),
+                                                      self.raiz_cgroup, self.raiz_proc)
+            if self.cgroups[servidor] is None:
+                self.print_e_salvar(f"  [AVISO] cgroup de {servidor} nao encontrado em {self.raiz_cgroup}; "
+                                    f"CPU/memoria nao serao medidas")
             else:
-                try:
-                    nginx_status = requests.get('http://servidor_nginx/status_nginx', timeout=2)
-                    if nginx_status.status_code == 200:
-                        #Parsear stub_status do Nginx
-                        status_text = nginx_status.text
-                        lines = status_text.split('\n')
-                        
-                        #Active connections: X
-                        active_conns = 0
-                        for line in lines:
-                            if 'Active connections:' in line:
-                                active_conns = int(line.split(':')[1].strip())
-                                break
-                        
-                        #Usar conexoes ativas como proxy de carga
-                        if active_conns > 0:
-                            cpu_percent = min(active_conns * 0.5, 100.0)
-                            mem_mib = max(30, active_conns * 2)  #Minimo 30MB
-                            mem_usage = f"{mem_mib:.1f}MiB"
-                            mem_percent = min(active_conns * 0.3, 100.0)
-                except:
-                    #Se falhar stub_status, tentar acessos totais no Prometheus
-                    pass
-            
-            return {
-                'cpu_percent': round(cpu_percent, 2),
-                'mem_usage': mem_usage,
-                'mem_percent': round(mem_percent, 2)
-            }
-            
-        except Exception as e:
-            #Se falhar, retorna valores padrao
-            return {'cpu_percent': 0.0, 'mem_usage': '0MiB', 'mem_percent': 0.0}
+                self.print_e_salvar(f"  [INFO] cgroup de {servidor}: {self.cgroups[servidor]}")
+        if self.cgroups[servidor] is None:
+            return None
+        return AmostradorCgroup(LeitorCgroup(self.cgroups[servidor], self.raiz_proc), self.intervalo_amostragem)
     
     def salvar_resultado_csv(self, teste, servidor, caminho, num_requisicoes, num_threads, 
-                            total, sucessos, falhas, tempo_total, latencia_media, latencia_p50, 
-                            latencia_p95, latencia_p99, desvio_padrao, rps, cpu_percent, 
-                            mem_usage, mem_percent, execucao=None):
+                            total, sucessos, falhas, tempo_total, histograma, rps, recursos=None,
+                            execucao=None, modo_conexao='close', motor='threads',
+                            num_processos=1, profundidade_pipeline=1, bytes_corpo=0, bytes_fio=0, fases=None,
+                            taxa_alvo=None, chegadas=None, histograma_corrigido=None, id_teste=None,
+                            inicio_janela=None, fim_janela=None, mistura=None, recorte='total', gerador=None,
+                            integridade=None, erros_http=0):
         #Salva uma linha no CSV com todas as metricas
+        #Todas as estatisticas de latencia vem do histograma (microssegundos -> ms)
+        #recursos: resumo do AmostradorCgroup (None sem cgroup: colunas vazias)
+        #recorte: 'total' (o teste inteiro) ou 'endpoint' (um caminho da carga mista; sem fases nem recursos)
+        #gerador: resumo do AmostradorGerador (o mesmo para todas as linhas do teste)
+        #integridade: {'curtas', 'corrompidas'} com verificacao de integridade (None: colunas vazias)
+        #erros_http: respostas completas com status 5xx (contadas em falhas)
+        #Sem nenhum sucesso o histograma esta vazio: as colunas de latencia ficam vazias, o resto e gravado
         taxa_erro = round((falhas/total*100) if total > 0 else 0, 2)
         taxa_sucesso = round((sucessos/total*100) if total > 0 else 0, 2)
+        percentis = histograma.percentis((50, 95, 99, 99.9, 99.99))
+        
+        #Media, P50 e P99 de cada fase, e o histograma serializado da fase
+        colunas_fases = {}
+        for fase in FASES:
+            if not fases or not fases[fase].total:
+                colunas_fases.update(dict.fromkeys((f'fase_{fase}_media_ms', f'fase_{fase}_p50_ms',
+                                                    f'fase_{fase}_p99_ms', f'histograma_fase_{fase}'), ''))
+                continue
+            histograma_fase = fases[fase]
+            percentis_fase = histograma_fase.percentis((50, 99))
+            colunas_fases[f'fase_{fase}_media_ms'] = round(histograma_fase.media() / 1000, 3)
+            colunas_fases[f'fase_{fase}_p50_ms'] = round(percentis_fase[50] / 1000, 3)
+            colunas_fases[f'fase_{fase}_p99_ms'] = round(percentis_fase[99] / 1000, 3)
+            colunas_fases[f'histograma_fase_{fase}'] = histograma_fase.codificar()
+        
+        #Malha aberta: percentis corrigidos (desde o instante planejado); vazios em malha fechada
+        corrigido_medido = histograma_corrigido is not None and histograma_corrigido.total > 0
+        colunas_corrigidas = {}
+        for nome, percentil in (('p50', 50), ('p95', 95), ('p99', 99), ('p999', 99.9), ('p9999', 99.99)):
+            colunas_corrigidas[f'latencia_corrigida_{nome}_ms'] = (
+                round(histograma_corrigido.percentil(percentil) / 1000, 2) if corrigido_medido else '')
+        colunas_corrigidas['latencia_corrigida_max_ms'] = (
+            round(histograma_corrigido.maximo / 1000, 2) if corrigido_medido else '')
+        colunas_corrigidas['histograma_latencia_corrigida'] = (
+            histograma_corrigido.codificar() if histograma_corrigido else '')
+        
+        #CPU e memoria do conteiner amostradas durante o teste
+        colunas_recursos = dict.fromkeys(('cpu_percent', 'cpu_percent_pico', 'cpu_segundos', 'cpu_ms_por_requisicao',
+                                          'mem_usage', 'mem_percent', 'mem_media_mib', 'rss_pico_mib',
+                                          'rss_media_mib', 'amostras_recursos'), '')
+        if recursos:
+            mib = 1024 * 1024
+            colunas_recursos.update({
+                'cpu_percent': round(recursos['cpu_percent_medio'], 2),
+                'cpu_percent_pico': round(recursos['cpu_percent_pico'], 2),
+                'cpu_segundos': round(recursos['cpu_segundos'], 4),
+                'cpu_ms_por_requisicao': round(recursos['cpu_segundos'] / total * 1000, 4) if total else '',
+                'mem_usage': f"{recursos['memoria_pico_bytes'] / mib:.1f}MiB",
+                'mem_percent': (round(recursos['memoria_percent_pico'], 2)
+                                if recursos['memoria_percent_pico'] is not None else ''),
+                'mem_media_mib': round(recursos['memoria_media_bytes'] / mib, 1),
+                'rss_pico_mib': round(recursos['rss_pico_bytes'] / mib, 1),
+                'rss_media_mib': round(recursos['rss_media_bytes'] / mib, 1),
+                'amostras_recursos': recursos['amostras']
+            })
         
-        self.dados_csv.append({
+        #Custo do proprio gerador e se ele, e nao o servidor, foi o limite do teste
+        colunas_gerador = dict.fromkeys(('gerador_limitado', 'gerador_motivos', 'gerador_cpu_percent',
+                                         'gerador_cpu_percent_pico', 'gerador_cpu_us_por_requisicao',
+                                         'gerador_capacidade_nucleos', 'gerador_threads_pico',
+                                         'gerador_atraso_p99_ms', 'gerador_atraso_max_ms', 'gerador_despertar_p99_ms',
+                                         'gerador_despertar_max_ms', 'gerador_gc_coletas',
+                                         'gerador_gc_pausa_total_ms', 'gerador_gc_pausa_max_ms'), '')
+        if gerador:
+            colunas_gerador.update({
+                'gerador_limitado': 'sim' if gerador['limitado'] else 'nao',
+                'gerador_motivos': ';'.join(gerador['motivos']),
+                'gerador_cpu_percent': round(gerador['cpu_percent'], 2),
+                'gerador_cpu_percent_pico': round(gerador['cpu_percent_pico'], 2),
+                'gerador_cpu_us_por_requisicao': (round(gerador['cpu_us_por_requisicao'], 1)
+                                                  if gerador['cpu_us_por_requisicao'] is not None else ''),
+                'gerador_capacidade_nucleos': round(gerador['capacidade_nucleos'], 2),
+                'gerador_threads_pico': gerador['threads_pico'],
+                #Atraso dos envios so existe com agenda (malha aberta ou reproducao de log)
+                'gerador_atraso_p99_ms': (round(gerador['atraso_p99_ms'], 3)
+                                          if gerador['atraso_p99_ms'] is not None else ''),
+                'gerador_atraso_max_ms': (round(gerador['atraso_max_ms'], 3)
+                                          if gerador['atraso_max_ms'] is not None else ''),
+                'gerador_despertar_p99_ms': round(gerador['despertar_p99_ms'], 3),
+                'gerador_despertar_max_ms': round(gerador['despertar_max_ms'], 3),
+                'gerador_gc_coletas': gerador['gc_coletas'],
+                'gerador_gc_pausa_total_ms': round(gerador['gc_pausa_total_ms'], 3),
+                'gerador_gc_pausa_max_ms': round(gerador['gc_pausa_max_ms'], 3)
+            })
+        
+        colunas_latencia = dict.fromkeys(('latencia_media_ms', 'latencia_p50_ms', 'latencia_p95_ms', 'latencia_p99_ms',
+                                          'latencia_p999_ms', 'latencia_p9999_ms', 'latencia_max_ms',
+                                          'desvio_padrao_ms'), '')
+        if histograma.total:
+            colunas_latencia.update({
+                'latencia_media_ms': round(histograma.media() / 1000, 2),
+                'latencia_p50_ms': round(percentis[50] / 1000, 2),
+                'latencia_p95_ms': round(percentis[95] / 1000, 2),
+                'latencia_p99_ms': round(percentis[99] / 1000, 2),
+                'latencia_p999_ms': round(percentis[99.9] / 1000, 2),
+                'latencia_p9999_ms': round(percentis[99.99] / 1000, 2),
+                'latencia_max_ms': round(histograma.maximo / 1000, 2),
+                'desvio_padrao_ms': round(histograma.desvio_padrao() / 1000, 2)
+            })
+        
+        linha = {
             'timestamp': datetime.now().isoformat(),
+            'id_teste': id_teste if id_teste is not None else '',
+            'inicio_janela': round(inicio_janela, 3) if inicio_janela is not None else '',
+            'fim_janela': round(fim_janela, 3) if fim_janela is not None else '',
             'execucao': execucao if execucao else 1,
             'teste': teste,
             'servidor': servidor,
             'caminho': caminho,
+            'recorte': recorte,
+            'mistura': mistura or '',
+            'modo_conexao': modo_conexao,
+            'motor': motor,
+            'num_processos': num_processos,
+            'profundidade_pipeline': profundidade_pipeline,
+            'modo_carga': 'aberta' if taxa_alvo else 'fechada',
+            'taxa_alvo_rps': taxa_alvo or '',
+            'chegadas': chegadas if taxa_alvo else '',
             'num_requisicoes': num_requisicoes,
             'num_threads': num_threads,
             'total_requisicoes': total,
             'sucessos': sucessos,
             'falhas': falhas,
+            'respostas_5xx': erros_http,
+            'falhas_transporte': (falhas - erros_http - integridade['curtas'] - integridade['corrompidas']
+                                  if integridade else ''),
+            'respostas_curtas': integridade['curtas'] if integridade else '',
+            'respostas_corrompidas': integridade['corrompidas'] if integridade else '',
             'taxa_sucesso_%': taxa_sucesso,
             'taxa_erro_%': taxa_erro,
             'tempo_total_s': round(tempo_total, 2),
             'requisicoes_por_segundo': round(rps, 2),
-            'latencia_media_ms': round(latencia_media, 2),
-            'latencia_p50_ms': round(latencia_p50, 2),
-            'latencia_p95_ms': round(latencia_p95, 2),
-            'latencia_p99_ms': round(latencia_p99, 2),
-            'desvio_padrao_ms': round(desvio_padrao, 2),
-            'cpu_percent': round(cpu_percent, 2),
-            'mem_usage': mem_usage,
-            'mem_percent': round(mem_percent, 2)
-        })
-    
-    def executar_requisicao(self, servidor, caminho='/'):
+            'bytes_corpo': bytes_corpo,
+            'bytes_fio': bytes_fio,
+            **colunas_latencia,
+            **colunas_recursos,
+            **colunas_gerador,
+            #Histograma serializado, para mesclar execucoes na analise
+            'histograma_latencia': histograma.codificar()
+        }
+        linha.update(colunas_corrigidas)
+        linha.update(colunas_fases)
+        self.gravador.escrever(linha)
+    
+    def executar_requisicao(self, servidor, caminho='/', manter_conexao=False, atraso=None, mista=False,
+                            metodo='GET'):
         #Executa uma unica requisicao e retorna o resultado
+        #atraso: em malha aberta, quanto o envio saiu depois do instante planejado (segundos)
+        #mista: carga mista, o resultado leva o caminho para a divisao por endpoint
         host, porta = self.servidores[servidor]
-        cliente = ClienteHTTP(host, porta)
+        cliente = ClienteHTTP(host, porta, self.pool_conexoes if manter_conexao else None)
         
-        inicio = time.time()
-        resultado = cliente.enviar_requisicao('GET', caminho)
-        tempo_decorrido = time.time() - inicio
+        self.marcar_envio()
+        resultado = cliente.enviar_requisicao(metodo, caminho, descartar_corpo=True,
+                                              validador=self.validador(caminho) if metodo == 'GET' else None)
+        return self.resumir_resultado(servidor, resultado, atraso, caminho if mista else None)
+    
+    def executar_pipeline(self, servidor, caminho, quantidade):
+        #Envia `quantidade` requisicoes em pipeline numa conexao do pool e retorna os resultados
+        host, porta = self.servidores[servidor]
+        cliente = ClienteHTTP(host, porta, self.pool_conexoes)
         
-        return {
+        self.marcar_envio(quantidade)
+        resultados = cliente.enviar_pipeline('GET', caminho, quantidade, descartar_corpo=True,
+                                             validador=self.validador(caminho))
+        return [self.resumir_resultado(servidor, resultado) for resultado in resultados]
+    
+    @staticmethod
+    def falha(caminho=None):
+        #Resultado de uma requisicao que nem chegou a ser medida (excecao no gerador)
+        resultado = {'sucesso': False, 'tempo_resposta': 0}
+        if caminho is not None:
+            resultado['caminho'] = caminho
+        return resultado
+    
+    def registrar_concorrencia(self):
+        #Chamado pelo motor com os usuarios virtuais ja iniciados: o pico de threads nao depende de uma
+        #amostra periodica cair dentro do teste (testes curtos) nem e lido depois do fim do pool
+        self.threads_motor = max(self.threads_motor, threads_processo())
+    
+    def marcar_envio(self, quantidade=1):
+        #Requisicoes em voo no exportador de metricas (a conclusao e contada em resumir_resultado)
+        if self.metricas is not None:
+            self.metricas.requisicao_iniciada(quantidade)
+    
+    @staticmethod
+    def contagem_integridade(estatisticas):
+        return {'curtas': estatisticas.curtas, 'corrompidas': estatisticas.corrompidas}
+    
+    def resumir_resultado(self, servidor, resultado, atraso=None, caminho=None):
+        #Reduz a resposta do cliente aos campos usados nas estatisticas
+        #Tempo total e fases vem do proprio cliente (relogio monotonico em nanossegundos)
+        sucesso = resultado['sucesso']
+        integridade = None
+        #Resposta completa pelo framing, mas com erro do servidor (5xx): falha, sem conferir o corpo
+        #(4xx continua sendo uma resposta do servidor: os cenarios padrao medem rotas /api/* que dao 404)
+        erro_http = sucesso and resultado.get('codigo_status', 0) >= 500
+        if erro_http:
+            sucesso = False
+        elif sucesso and resultado.get('validacao') is not None:
+            #Resposta completa pelo framing, mas o corpo e curto ou nao corresponde ao arquivo de origem
+            integridade = resultado['validacao'].concluir()
+            sucesso = integridade is None
+        resumo = {
             'servidor': servidor,
-            'sucesso': resultado['sucesso'],
+            'sucesso': sucesso,
             'codigo_status': resultado.get('codigo_status', 0),
-            'tempo_resposta': tempo_decorrido,
-            'tamanho_resposta': len(resultado.get('corpo', ''))
+            'tempo_resposta': resultado['tempo_resposta'],
+            'tempo_resposta_ns': resultado.get('tempo_resposta_ns', 0),
+            'fases_ns': resultado.get('fases_ns', {}),
+            'tamanho_resposta': resultado.get('tamanho_corpo', 0),
+            'bytes_fio': resultado.get('bytes_fio', 0),
+            'conexao_reutilizada': resultado.get('conexao_reutilizada', False)
         }
+        if integridade is not None:
+            resumo['integridade'] = integridade
+        if erro_http:
+            resumo['erro_http'] = True
+        if caminho is not None:
+            resumo['caminho'] = caminho
+        if atraso is not None:
+            #Correcao da omissao coordenada: a espera por um usuario livre tambem e latencia
+            resumo['atraso'] = max(atraso, 0.0)
+            resumo['tempo_corrigido'] = resumo['atraso'] + resultado['tempo_resposta']
+        if self.amostras is not None:
+            self.amostras.registrar(time.time_ns(), resumo)
+        if self.metricas is not None:
+            self.metricas.requisicao_concluida(sucesso, resultado['tempo_resposta'])
+        return resumo
+    
+    def executar_com_threads(self, servidor, caminho, num_requisicoes, num_threads, manter_conexao,
+                             profundidade_pipeline=1, agenda=None):
+        #Motor 'threads': cada usuario virtual e uma thread que consome o total de requisicoes
+        #Com `agenda` (malha aberta), cada requisicao sai no seu instante planejado
+        #`caminho` pode ser uma MisturaCaminhos: cada requisicao sorteia o seu (sem pipelining)
+        #Retorna (estatisticas, tempo_total) medido apenas durante o disparo das requisicoes
+        contador = itertools.count()
+        mista = isinstance(caminho, MisturaCaminhos)
+        
+        def usuario_agendado():
+            #Malha aberta: o proximo envio nao depende das respostas anteriores; se nenhum usuario
+            #estiver livre no instante planejado, o atraso entra na latencia corrigida
+            estatisticas = EstatisticasTeste()
+            sortear = caminho.sorteador() if mista else None
+            while True:
+                indice = next(contador)
+                if indice >= num_requisicoes:
+                    break
+                alvo = sortear() if mista else caminho
+                planejado = inicio_agenda + agenda.instante(indice)
+                espera = planejado - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                atraso = time.perf_counter() - planejado
+                try:
+                    estatisticas.registrar(self.executar_requisicao(servidor, alvo, manter_conexao, atraso, mista))
+                except Exception as e:
+                    self.print_e_salvar(f"  [ERRO] Requisicao falhou: {e}")
+                    estatisticas.registrar(self.falha(alvo if mista else None))
+            return estatisticas
+        
+        def usuario_virtual():
+            #Cada thread acumula em suas proprias estatisticas; a uniao e feita no final
+            estatisticas = EstatisticasTeste()
+            sortear = caminho.sorteador() if mista else None
+            while True:
+                #Reserva ate `profundidade_pipeline` requisicoes do total por vez
+                lote = 0
+                while lote < profundidade_pipeline and next(contador) < num_requisicoes:
+                    lote += 1
+                if not lote:
+                    break
+                alvo = sortear() if mista else caminho
+                try:
+                    if profundidade_pipeline > 1:
+                        for resultado in self.executar_pipeline(servidor, caminho, lote):
+                            estatisticas.registrar(resultado)
+                    else:
+                        estatisticas.registrar(self.executar_requisicao(servidor, alvo, manter_conexao, mista=mista))
+                except Exception as e:
+                    self.print_e_salvar(f"  [ERRO] Requisicao falhou: {e}")
+                    for _ in range(lote):
+                        estatisticas.registrar(self.falha(alvo if mista else None))
+            return estatisticas
+        
+        estatisticas = EstatisticasTeste()
+        alvo = usuario_virtual if agenda is None else usuario_agendado
+        tempo_inicio = time.time()
+        inicio_agenda = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=num_threads) as executor:
+            futuros = [executor.submit(alvo) for _ in range(min(num_threads, num_requisicoes))]
+            self.registrar_concorrencia()
+            for futuro in as_completed(futuros):
+                estatisticas.mesclar(futuro.result())
+        tempo_total = time.time() - tempo_inicio
+        
+        #Cada teste comeca com o pool vazio, sem conexoes aquecidas pelo anterior
+        if manter_conexao:
+            self.pool_conexoes.fechar_todas()
+        return estatisticas, tempo_total
+    
+    def executar_reproducao(self, servidor, reproducao, num_usuarios, manter_conexao):
+        #Reproducao de log: uma thread le o log em fluxo e entrega (instante planejado, metodo, caminho)
+        #numa fila limitada; `num_usuarios` threads enviam cada requisicao no seu instante, sem esperar
+        #as anteriores. Usuarios ocupados atrasam os envios, e o atraso entra na latencia corrigida
+        fila = queue.Queue(maxsize=num_usuarios * 4)
+        erros_leitura = []
+        
+        def leitor():
+            try:
+                for deslocamento, metodo, caminho in reproducao:
+                    fila.put((inicio_agenda + deslocamento, metodo, caminho))
+            except (OSError, UnicodeError) as e:
+                erros_leitura.append(str(e) or type(e).__name__)
+            finally:
+                for _ in range(num_usuarios):
+                    fila.put(None)
+        
+        def usuario_virtual():
+            estatisticas = EstatisticasTeste()
+            while True:
+                item = fila.get()
+                if item is None:
+                    break
+                planejado, metodo, caminho = item
+                espera = planejado - time.perf_counter()
+                if espera > 0:
+                    time.sleep(espera)
+                atraso = time.perf_counter() - planejado
+                try:
+                    estatisticas.registrar(self.executar_requisicao(servidor, caminho, manter_conexao, atraso,
+                                                                    metodo=metodo))
+                except Exception as e:
+                    self.print_e_salvar(f"  [ERRO] Requisicao falhou: {e}")
+                    estatisticas.registrar(self.falha())
+            return estatisticas
+        
+        estatisticas = EstatisticasTeste()
+        tempo_inicio = time.time()
+        inicio_agenda = time.perf_counter()
+        thread_leitor = threading.Thread(target=leitor, daemon=True)
+        thread_leitor.start()
+        with ThreadPoolExecutor(max_workers=num_usuarios) as executor:
+            futuros = [executor.submit(usuario_virtual) for _ in range(num_usuarios)]
+            self.registrar_concorrencia()
+            for futuro in as_completed(futuros):
+                estatisticas.mesclar(futuro.result())
+        thread_leitor.join()
+        tempo_total = time.time() - tempo_inicio
+        for erro in erros_leitura:
+            self.print_e_salvar(f"  [ERRO] Leitura do log interrompida: {erro}")
+        
+        if manter_conexao:
+            self.pool_conexoes.fechar_todas()
+        return estatisticas, tempo_total
+    
+    def executar_com_asyncio(self, servidor, caminho, num_requisicoes, num_usuarios, manter_conexao,
+                             profundidade_pipeline=1, agenda=None):
+        #Motor 'asyncio': cada usuario virtual e uma corrotina com sua propria conexao
+        ajustar_limite_descritores(num_usuarios + 256)
+        tempo_inicio = time.time()
+        estatisticas = asyncio.run(self._usuarios_assincronos(servidor, caminho, num_requisicoes, num_usuarios,
+                                                              manter_conexao, profundidade_pipeline, agenda))
+        return estatisticas, time.time() - tempo_inicio
     
-    def teste_concorrente(self, servidor, caminho, num_requisicoes, num_threads, nome_teste="Teste", execucao=None):
+    async def _usuarios_assincronos(self, servidor, caminho, num_requisicoes, num_usuarios, manter_conexao,
+                                    profundidade_pipeline=1, agenda=None):
+        host, porta = self.servidores[servidor]
+        estatisticas = EstatisticasTeste()
+        restantes = [num_requisicoes]
+        mista = isinstance(caminho, MisturaCaminhos)
+        validador = self.validador(caminho) if not mista else None
+        inicio_agenda = time.perf_counter()
+        
+        async def usuario_virtual():
+            cliente = ClienteHTTPAssincrono(host, porta, manter_conexao)
+            sortear = caminho.sorteador() if mista else None
+            try:
+                #Os usuarios consomem o total de requisicoes ate ele acabar
+                while restantes[0] > 0:
+                    if agenda is not None:
+                        #Malha aberta: espera o instante planejado da proxima requisicao do total
+                        indice = num_requisicoes - restantes[0]
+                        restantes[0] -= 1
+                        planejado = inicio_agenda + agenda.instante(indice)
+                        espera = planejado - time.perf_counter()
+                        if espera > 0:
+                            await asyncio.sleep(espera)
+                        atraso = time.perf_counter() - planejado
+                        if mista:
+                            await enviar_misto(cliente, sortear(), atraso)
+                            continue
+                        self.marcar_envio()
+                        resultado = await cliente.enviar_requisicao('GET', caminho, descartar_corpo=True,
+                                                                    validador=validador)
+                        estatisticas.registrar(self.resumir_resultado(servidor, resultado, atraso))
+                        continue
+                    if profundidade_pipeline > 1:
+                        lote = min(profundidade_pipeline, restantes[0])
+                        restantes[0] -= lote
+                        self.marcar_envio(lote)
+                        resultados = await cliente.enviar_pipeline('GET', caminho, lote, descartar_corpo=True,
+                                                                   validador=validador)
+                        for resultado in resultados:
+                            estatisticas.registrar(self.resumir_resultado(servidor, resultado))
+                        continue
+                    restantes[0] -= 1
+                    if mista:
+                        await enviar_misto(cliente, sortear())
+                        continue
+                    self.marcar_envio()
+                    resultado = await cliente.enviar_requisicao('GET', caminho, descartar_corpo=True,
+                                                                validador=validador)
+                    estatisticas.registrar(self.resumir_resultado(servidor, resultado))
+            finally:
+                await cliente.fechar()
+        
+        async def enviar_misto(cliente, alvo, atraso=None):
+            #Carga mista: validacao do corpo e divisao por endpoint seguem o caminho sorteado
+            self.marcar_envio()
+            resultado = await cliente.enviar_requisicao('GET', alvo, descartar_corpo=True,
+                                                        validador=self.validador(alvo))
+            estatisticas.registrar(self.resumir_resultado(servidor, resultado, atraso, alvo))
+        
+        #Corrotinas num unico thread: as threads do processo sao as do proprio gerador
+        self.registrar_concorrencia()
+        await asyncio.gather(*[usuario_virtual() for _ in range(min(num_usuarios, num_requisicoes))])
+        return estatisticas
+    
+    def executar_com_processos(self, servidor, caminho, num_requisicoes, num_usuarios, manter_conexao, motor,
+                               num_processos, profundidade_pipeline=1, agenda=None):
+        #Divide usuarios e requisicoes entre processos (um por nucleo), cada um rodando o motor
+        #escolhido; todos partem juntos de uma barreira e as estatisticas sao unidas no processo pai
+        fatias = []
+        for indice in range(num_processos):
+            usuarios = num_usuarios // num_processos + (1 if indice < num_usuarios % num_processos else 0)
+            requisicoes = num_requisicoes // num_processos + (1 if indice < num_requisicoes % num_processos else 0)
+            if usuarios > 0 and requisicoes > 0:
+                fatias.append((usuarios, requisicoes))
+        
+        #fork: os trabalhadores herdam a configuracao do testador sem precisar serializa-la
+        contexto = multiprocessing.get_context('fork')
+        barreira = contexto.Barrier(len(fatias))
+        fila = contexto.Queue()
+        processos = [
+            contexto.Process(target=self._trabalhador_processo,
+                             args=(fila, barreira, servidor, caminho, requisicoes, usuarios, manter_conexao, motor,
+                                   profundidade_pipeline,
+                                   agenda.fatia(requisicoes, semente=indice) if agenda is not None else None),
+                             daemon=True)
+            for indice, (usuarios, requisicoes) in enumerate(fatias)
+        ]
+        for processo in processos:
+            processo.start()
+        
+        #Le a fila antes do join para nao travar em resultados grandes
+        partes = []
+        while len(partes) < len(processos):
+            try:
+                partes.append(fila.get(timeout=1))
+            except queue.Empty:
+                if all(not p.is_alive() for p in processos) and fila.empty():
+                    break
+        for processo in processos:
+            processo.join()
+        
+        estatisticas = EstatisticasTeste()
+        for parte in partes:
+            if 'erro' in parte:
+                self.print_e_salvar(f"  [ERRO] Processo trabalhador falhou: {parte['erro']}")
+            else:
+                estatisticas.mesclar(parte['estatisticas'])
+        #Threads do gerador: as deste processo mais as de cada trabalhador com seus usuarios iniciados
+        threads_trabalhadores = sum(parte.get('threads', 0) for parte in partes)
+        self.threads_motor = max(self.threads_motor, threads_processo() + threads_trabalhadores)
+        
+        #Requisicoes de processos que morreram sem responder contam como falhas
+        perdidas = num_requisicoes - estatisticas.total
+        for _ in range(max(perdidas, 0)):
+            estatisticas.registrar({'sucesso': False, 'tempo_resposta': 0})
+        
+        #Janela de medicao: da liberacao da barreira ao fim do ultimo trabalhador
+        janelas = [parte for parte in partes if 'inicio' in parte]
+        tempo_total = (max(p['fim'] for p in janelas) - min(p['inicio'] for p in janelas)) if janelas else 0
+        return estatisticas, tempo_total
+    
+    def _trabalhador_processo(self, fila, barreira, servidor, caminho, num_requisicoes, num_usuarios,
+                              manter_conexao, motor, profundidade_pipeline=1, agenda=None):
+        #Corpo de cada processo trabalhador
+        try:
+            barreira.wait(self.TIMEOUT_BARREIRA)
+            inicio = time.time()
+            if motor == 'asyncio':
+                estatisticas, _ = self.executar_com_asyncio(servidor, caminho, num_requisicoes, num_usuarios,
+                                                            manter_conexao, profundidade_pipeline, agenda)
+            else:
+                estatisticas, _ = self.executar_com_threads(servidor, caminho, num_requisicoes, num_usuarios,
+                                                            manter_conexao, profundidade_pipeline, agenda)
+            #Amostras ainda nos buffers deste processo vao para o arquivo antes de ele sair
+            if self.amostras is not None:
+                self.amostras.descarregar()
+            fila.put({'inicio': inicio, 'fim': time.time(), 'estatisticas': estatisticas,
+                      'threads': self.threads_motor})
+        except Exception as e:
+            barreira.abort()
+            fila.put({'erro': str(e) or type(e).__name__})
+    
+    def teste_concorrente(self, servidor, caminho, num_requisicoes, num_threads, nome_teste="Teste", execucao=None,
+                          manter_conexao=None, motor=None, num_processos=None, profundidade_pipeline=None,
+                          taxa_alvo=None, chegadas=None):
         #Executa teste com requisicoes concorrentes
         #Argumentos:
         #    servidor: 'nginx' ou 'apache'
-        #    caminho: Caminho do endpoint a testar
+        #    caminho: Caminho do endpoint a testar, MisturaCaminhos para a carga mista
+        #             (resultado total mais uma linha por endpoint) ou ReproducaoLog para reenviar
+        #             um log de acesso (num_requisicoes e ignorado: o total vem do log)
         #    num_requisicoes: Numero total de requisicoes
         #    num_threads: Numero de threads concorrentes
         #    nome_teste: Nome do teste para o CSV
         #    execucao: Numero da execucao (opcional)
+        #    manter_conexao: True para keep-alive, False para uma conexao por requisicao
+        #                    (None usa o modo padrao do testador)
+        #    motor: 'threads' ou 'asyncio' (None usa o motor padrao do testador)
+        #    num_processos: processos trabalhadores (None usa o padrao do testador; 1 = sem divisao)
+        #    profundidade_pipeline: requisicoes em pipeline por conexao (None usa o padrao do testador);
+        #                           acima de 1 implica keep-alive
+        #    taxa_alvo: req/s em malha aberta (None usa o padrao do testador; sem taxa = malha fechada)
+        #    chegadas: 'constante' ou 'poisson' (None usa o padrao do testador)
+        if profundidade_pipeline is None:
+            profundidade_pipeline = self.profundidade_pipeline
+        profundidade_pipeline = max(1, profundidade_pipeline)
+        if taxa_alvo is None:
+            taxa_alvo = self.taxa_alvo
+        if chegadas is None:
+            chegadas = self.chegadas
+        reproducao = caminho if isinstance(caminho, ReproducaoLog) else None
+        if reproducao is not None:
+            #O proprio log e a agenda (malha aberta); envio de threads num unico processo
+            taxa_alvo, chegadas, motor, num_processos, num_requisicoes = None, 'log', 'threads', 1, 1
+            if profundidade_pipeline > 1:
+                self.print_e_salvar(f"  [AVISO] Pipelining ignorado na reproducao de log")
+                profundidade_pipeline = 1
+        agenda = AgendaChegadas(taxa_alvo, num_requisicoes, chegadas) if taxa_alvo else None
+        if agenda is not None and profundidade_pipeline > 1:
+            self.print_e_salvar(f"  [AVISO] Pipelining ignorado em malha aberta (cada envio segue a agenda)")
+            profundidade_pipeline = 1
+        mistura = caminho if isinstance(caminho, MisturaCaminhos) else None
+        if mistura is not None and profundidade_pipeline > 1:
+            self.print_e_salvar(f"  [AVISO] Pipelining ignorado na carga mista (cada requisicao sorteia o caminho)")
+            profundidade_pipeline = 1
+        if manter_conexao is None:
+            manter_conexao = self.manter_conexao
+        if profundidade_pipeline > 1:
+            manter_conexao = True
+        if motor is None:
+            motor = self.motor
+        if num_processos is None:
+            num_processos = self.num_processos
+        num_processos = max(1, min(num_processos, num_threads, num_requisicoes))
+        modo_conexao = 'keep-alive' if manter_conexao else 'close'
+        
         self.print_e_salvar(f"\n  Testando {servidor.upper()}: {caminho}")
-        self.print_e_salvar(f"  Requisicoes: {num_requisicoes}, Concorrencia: {num_threads}")
+        self.print_e_salvar(f"  Requisicoes: {num_requisicoes if reproducao is None else 'as do log'}, "
+                            f"Concorrencia: {num_threads}, "
+                            f"Conexao: {modo_conexao}, Motor: {motor}, Processos: {num_processos}, "
+                            f"Pipeline: {profundidade_pipeline}")
+        if agenda is not None:
+            self.print_e_salvar(f"  Malha aberta: {taxa_alvo:.1f} req/s, chegadas {chegadas}")
+        if mistura is not None:
+            self.print_e_salvar(f"  Mistura: {mistura.descrever()}")
+        if reproducao is not None:
+            self.print_e_salvar(f"  Reproducao: {reproducao.arquivo} a {reproducao.velocidade:g}x"
+                                f"{f', ate {reproducao.limite} requisicoes' if reproducao.limite else ''}")
+        caminhos = mistura.caminhos if mistura is not None else [caminho] if reproducao is None else []
         
-        resultados = []
-        tempo_inicio = time.time()
+        #Arquivos de origem mapeados antes do disparo (o mapeamento e herdado pelos processos)
+        if self.verificar_integridade and reproducao is not None:
+            self.print_e_salvar(f"  [AVISO] Verificacao de integridade ignorada na reproducao de log")
+        verificados = []
+        if self.verificar_integridade:
+            verificados = [alvo for alvo in caminhos if self.preparar_referencia(alvo) is not None]
         
-        #Coletar metricas ANTES do teste
-        metricas_antes = self.obter_metricas_container(servidor)
+        if self.amostras is not None:
+            self.amostras.definir_contexto(execucao, nome_teste, servidor, str(caminho), caminhos)
+        if self.metricas is not None:
+            self.metricas.definir_contexto(servidor, nome_teste)
         
-        with ThreadPoolExecutor(max_workers=num_threads) as executor:
-            futuros = [
-                executor.submit(self.executar_requisicao, servidor, caminho)
-                for _ in range(num_requisicoes)
-            ]
-            
-            for futuro in as_completed(futuros):
-                try:
-                    resultado = futuro.result()
-                    resultados.append(resultado)
-                except Exception as e:
-                    self.print_e_salvar(f"  [ERRO] Requisicao falhou: {e}")
-                    resultados.append({'sucesso': False, 'tempo_resposta': 0})
+        #CPU/memoria do conteiner amostradas em segundo plano durante todo o disparo
+        amostrador = self.criar_amostrador(servidor)
+        if amostrador is not None:
+            amostrador.iniciar()
+        #Threads e asyncio rodam Python num nucleo so (GIL); com processos, um nucleo por trabalhador
+        amostrador_gerador = AmostradorGerador(float(min(num_processos, self.nucleos_gerador)),
+                                               filhos=num_processos > 1)
+        self.threads_motor = 0
+        amostrador_gerador.iniciar()
         
-        tempo_total = time.time() - tempo_inicio
+        inicio_janela = time.time()
+        if reproducao is not None:
+            estatisticas, tempo_total = self.executar_reproducao(servidor, reproducao, num_threads, manter_conexao)
+        elif num_processos > 1:
+            estatisticas, tempo_total = self.executar_com_processos(servidor, caminho, num_requisicoes, num_threads,
+                                                                    manter_conexao, motor, num_processos,
+                                                                    profundidade_pipeline, agenda)
+        elif motor == 'asyncio':
+            estatisticas, tempo_total = self.executar_com_asyncio(servidor, caminho, num_requisicoes, num_threads,
+                                                                  manter_conexao, profundidade_pipeline, agenda)
+        else:
+            estatisticas, tempo_total = self.executar_com_threads(servidor, caminho, num_requisicoes, num_threads,
+                                                                  manter_conexao, profundidade_pipeline, agenda)
+        
+        fim_janela = time.time()
+        gerador = amostrador_gerador.parar(estatisticas.total, estatisticas.histograma_atraso, self.threads_motor)
+        recursos = amostrador.parar() if amostrador is not None else None
+        if amostrador is not None and amostrador.erro:
+            self.print_e_salvar(f"  [AVISO] Falha ao ler o cgroup de {servidor}: {amostrador.erro}")
         
-        #Coletar metricas DEPOIS do teste
-        metricas_depois = self.obter_metricas_container(servidor)
+        if self.amostras is not None:
+            self.amostras.descarregar()
+        
+        #Taxa planejada: a da agenda ou, na reproducao, a media do log ja acelerada
+        taxa_planejada = taxa_alvo if agenda is not None else None
+        if reproducao is not None:
+            num_requisicoes = estatisticas.total
+            duracao_reproducao = reproducao.duracao_original / reproducao.velocidade
+            taxa_planejada = round(reproducao.reproduzidas / duracao_reproducao, 2) if duracao_reproducao > 0 else ''
+            self.print_e_salvar(f"  Log: {reproducao.linhas} linhas, {reproducao.reproduzidas} reproduzidas, "
+                                f"{reproducao.ignoradas} ignoradas (metodo ou formato); "
+                                f"{reproducao.duracao_original:.1f}s no log -> {duracao_reproducao:.1f}s planejados")
         
         #Calcular estatisticas
-        sucessos = [r for r in resultados if r['sucesso']]
-        falhas = len(resultados) - len(sucessos)
-        tempos = [r['tempo_resposta'] * 1000 for r in sucessos]  #Converter para ms
-        
-        #Usar a metrica MAXIMA (durante o pico da carga)
-        cpu_percent = max(metricas_antes['cpu_percent'], metricas_depois['cpu_percent'])
-        mem_percent = max(metricas_antes['mem_percent'], metricas_depois['mem_percent'])
-        mem_usage = metricas_depois['mem_usage']
-        
-        if tempos:
-            latencia_media = statistics.mean(tempos)
-            latencia_p50 = statistics.median(tempos)
-            latencia_p95 = sorted(tempos)[int(len(tempos)*0.95)] if len(tempos) > 1 else latencia_p50
-            latencia_p99 = sorted(tempos)[int(len(tempos)*0.99)] if len(tempos) > 1 else latencia_p50
-            desvio_padrao = statistics.stdev(tempos) if len(tempos) > 1 else 0
-            rps = len(resultados)/tempo_total
-            taxa_erro = (falhas/len(resultados)*100) if len(resultados) > 0 else 0
-            
-            self.print_e_salvar(f"\n  Resultados:")
-            self.print_e_salvar(f"    Total de requisicoes: {len(resultados)}")
-            self.print_e_salvar(f"    Sucessos: {len(sucessos)} ({len(sucessos)/len(resultados)*100:.1f}%)")
-            self.print_e_salvar(f"    Falhas: {falhas} ({taxa_erro:.1f}%)")
-            self.print_e_salvar(f"    Tempo total: {tempo_total:.2f}s")
-            self.print_e_salvar(f"    Requisicoes/segundo: {rps:.2f}")
-            self.print_e_salvar(f"    Latencia media: {latencia_media:.2f}ms")
-            self.print_e_salvar(f"    Latencia P50: {latencia_p50:.2f}ms")
-            if len(tempos) > 1:
-                self.print_e_salvar(f"    Latencia P95: {latencia_p95:.2f}ms")
-                self.print_e_salvar(f"    Latencia P99: {latencia_p99:.2f}ms")
-                self.print_e_salvar(f"    Desvio padrao: {desvio_padrao:.2f}ms")
-            self.print_e_salvar(f"    CPU: {cpu_percent:.2f}%")
-            self.print_e_salvar(f"    Memoria: {mem_usage} ({mem_percent:.2f}%)")
-            
-            #Salvar no CSV
+        total = estatisticas.total
+        sucessos = estatisticas.sucessos
+        falhas = estatisticas.falhas
+        histograma = estatisticas.histograma
+        rps = total/tempo_total if tempo_total > 0 else 0
+        taxa_erro = (falhas/total*100) if total > 0 else 0
+        
+        taxa_sucesso = (sucessos/total*100) if total > 0 else 0
+        percentis = histograma.percentis((50, 95, 99, 99.9, 99.99))
+        
+        #O resultado e sempre registrado, mesmo sem nenhum sucesso (so as colunas de latencia ficam vazias):
+        #um teste que falhou por inteiro tambem conta na taxa de erro
+        self.print_e_salvar(f"\n  Resultados:")
+        self.print_e_salvar(f"    Total de requisicoes: {total}")
+        self.print_e_salvar(f"    Sucessos: {sucessos} ({taxa_sucesso:.1f}%)")
+        self.print_e_salvar(f"    Falhas: {falhas} ({taxa_erro:.1f}%)")
+        if verificados:
+            self.print_e_salvar(f"      transporte: {estatisticas.falhas_transporte} | status 5xx: "
+                                f"{estatisticas.erros_http} | corpo curto: {estatisticas.curtas} | "
+                                f"corpo corrompido: {estatisticas.corrompidas}")
+        elif estatisticas.erros_http:
+            self.print_e_salvar(f"      transporte: {estatisticas.falhas_transporte} | status 5xx: "
+                                f"{estatisticas.erros_http}")
+        self.print_e_salvar(f"    Tempo total: {tempo_total:.2f}s")
+        self.print_e_salvar(f"    Requisicoes/segundo: {rps:.2f}")
+        self.print_e_salvar(f"    Bytes recebidos: {estatisticas.bytes_corpo} de corpo, "
+                            f"{estatisticas.bytes_fio} no fio")
+        if manter_conexao and total:
+            reutilizadas = estatisticas.reutilizadas
+            self.print_e_salvar(f"    Conexoes reutilizadas: {reutilizadas} ({reutilizadas/total*100:.1f}%)")
+        if sucessos:
+            self.print_e_salvar(f"    Latencia media: {histograma.media()/1000:.2f}ms")
+            self.print_e_salvar(f"    Latencia P50: {percentis[50]/1000:.2f}ms")
+            if sucessos > 1:
+                self.print_e_salvar(f"    Latencia P95: {percentis[95]/1000:.2f}ms")
+                self.print_e_salvar(f"    Latencia P99: {percentis[99]/1000:.2f}ms")
+                self.print_e_salvar(f"    Latencia P99.9: {percentis[99.9]/1000:.2f}ms")
+                self.print_e_salvar(f"    Latencia P99.99: {percentis[99.99]/1000:.2f}ms")
+                self.print_e_salvar(f"    Desvio padrao: {histograma.desvio_padrao()/1000:.2f}ms")
+            corrigido = estatisticas.histograma_corrigido
+            if corrigido is not None and corrigido.total:
+                #Sem correcao, a lentidao do servidor reduz os envios e some das estatisticas
+                corrigidos = corrigido.percentis((50, 99, 99.9))
+                self.print_e_salvar(f"    Latencia corrigida (desde o instante planejado):")
+                self.print_e_salvar(f"      P50: {corrigidos[50]/1000:.2f}ms | P99: {corrigidos[99]/1000:.2f}ms | "
+                                    f"P99.9: {corrigidos[99.9]/1000:.2f}ms | Max: {corrigido.maximo/1000:.2f}ms")
+            self.print_e_salvar(f"    Fases (media / P99):")
+            for fase in FASES:
+                histograma_fase = estatisticas.fases[fase]
+                self.print_e_salvar(f"      {fase:<14} {histograma_fase.media()/1000:8.3f}ms / "
+                                    f"{histograma_fase.percentil(99)/1000:8.3f}ms")
+        else:
+            self.print_e_salvar(f"    Latencia: nenhuma resposta com sucesso")
+        if recursos:
+            mib = 1024 * 1024
+            percentual = recursos['memoria_percent_pico']
+            self.print_e_salvar(f"    CPU: media {recursos['cpu_percent_medio']:.2f}% | "
+                                f"pico {recursos['cpu_percent_pico']:.2f}% | "
+                                f"{recursos['cpu_segundos']:.3f}s de CPU "
+                                f"({recursos['cpu_segundos'] / max(total, 1) * 1000:.4f}ms por requisicao)")
+            self.print_e_salvar(f"    Memoria: pico {recursos['memoria_pico_bytes'] / mib:.1f}MiB"
+                                f"{f' ({percentual:.2f}%)' if percentual is not None else ''} | "
+                                f"media {recursos['memoria_media_bytes'] / mib:.1f}MiB | "
+                                f"RSS pico {recursos['rss_pico_bytes'] / mib:.1f}MiB "
+                                f"({recursos['amostras']} amostras)")
+        else:
+            self.print_e_salvar(f"    CPU/Memoria: nao medidas (cgroup do conteiner indisponivel)")
+        if gerador['atraso_p99_ms'] is not None:
+            atraso_gerador = (f"atraso dos envios P99 {gerador['atraso_p99_ms']:.2f}ms "
+                              f"(max {gerador['atraso_max_ms']:.2f}ms)")
+        else:
+            atraso_gerador = (f"atraso de despertar P99 {gerador['despertar_p99_ms']:.2f}ms "
+                              f"(max {gerador['despertar_max_ms']:.2f}ms)")
+        self.print_e_salvar(f"    Gerador: CPU {gerador['cpu_percent']:.1f}% de "
+                            f"{gerador['capacidade_nucleos'] * 100:.0f}% (pico {gerador['cpu_percent_pico']:.1f}%) | "
+                            f"{gerador['threads_pico']} threads | {atraso_gerador} | "
+                            f"GC {gerador['gc_coletas']} coletas, {gerador['gc_pausa_total_ms']:.1f}ms")
+        if gerador['limitado']:
+            self.print_e_salvar(f"    [AVISO] Gerador de carga no limite ({', '.join(gerador['motivos'])}): "
+                                f"latencia e vazao deste teste refletem o cliente, nao o servidor")
+        if mistura is not None:
+            self.print_e_salvar(f"    Por endpoint:")
+            self.print_e_salvar(f"      {'Caminho':<30} {'Req':>7} {'Falhas':>7} {'P50 (ms)':>10} "
+                                f"{'P99 (ms)':>10} {'Max (ms)':>10}")
+            for alvo in caminhos:
+                parte = estatisticas.por_caminho.get(alvo)
+                if parte is None:
+                    continue
+                percentis_parte = parte.histograma.percentis((50, 99))
+                self.print_e_salvar(f"      {alvo:<30} {parte.total:>7} {parte.falhas:>7} "
+                                    f"{percentis_parte[50]/1000:>10.2f} {percentis_parte[99]/1000:>10.2f} "
+                                    f"{parte.histograma.maximo/1000:>10.2f}")
+        
+        id_teste = next(self.ids_testes)
+        if self.coletor_prometheus is not None:
+            self.coletor_prometheus.registrar_janela(id_teste, servidor, inicio_janela, fim_janela,
+                                                     execucao=execucao if execucao else 1, teste=nome_teste,
+                                                     caminho=str(caminho))
+        
+        #Salvar no CSV
+        descricao_mistura = mistura.descrever() if mistura is not None else None
+        self.salvar_resultado_csv(
+            nome_teste, servidor, str(caminho), num_requisicoes, num_threads,
+            total, sucessos, falhas, tempo_total, histograma, rps, recursos,
+            execucao, modo_conexao, motor, num_processos, profundidade_pipeline,
+            estatisticas.bytes_corpo, estatisticas.bytes_fio, estatisticas.fases,
+            taxa_planejada, chegadas, estatisticas.histograma_corrigido,
+            id_teste, inicio_janela, fim_janela, descricao_mistura, gerador=gerador,
+            integridade=self.contagem_integridade(estatisticas) if verificados else None,
+            erros_http=estatisticas.erros_http
+        )
+        #Carga mista: uma linha por endpoint, com o mesmo id_teste e a mesma janela do total
+        for alvo in caminhos if mistura is not None else ():
+            parte = estatisticas.por_caminho.get(alvo)
+            if parte is None:
+                continue
             self.salvar_resultado_csv(
-                nome_teste, servidor, caminho, num_requisicoes, num_threads,
-                len(resultados), len(sucessos), falhas, tempo_total,
-                latencia_media, latencia_p50, latencia_p95, latencia_p99,
-                desvio_padrao, rps, cpu_percent, 
-                mem_usage, mem_percent, execucao
+                nome_teste, servidor, alvo, parte.total, num_threads,
+                parte.total, parte.sucessos, parte.falhas, tempo_total, parte.histograma,
+                parte.total / tempo_total if tempo_total > 0 else 0, None,
+                execucao, modo_conexao, motor, num_processos, profundidade_pipeline,
+                parte.bytes_corpo, parte.bytes_fio, None,
+                taxa_planejada, chegadas, parte.histograma_corrigido,
+                id_teste, inicio_janela, fim_janela, descricao_mistura, 'endpoint', gerador,
+                self.contagem_integridade(parte) if alvo in verificados else None, parte.erros_http
             )
         
         return {
-            'total': len(resultados),
-            'sucessos': len(sucessos),
+            'total': total,
+            'sucessos': sucessos,
             'tempo_total': tempo_total,
-            'tempos': tempos
+            'rps': rps,
+            'taxa_erro': taxa_erro,
+            'histograma': histograma,
+            'histograma_corrigido': estatisticas.histograma_corrigido,
+            'por_caminho': estatisticas.por_caminho,
+            'gerador': gerador
         }
     
-    def cenario_baixa_carga(self, execucao=None):
-        #Cenario 1: Baixa Carga
-        cfg = self.CENARIO_1_BAIXA_CARGA
-        self.print_e_salvar("\n" + "="*60)
-        self.print_e_salvar("CENARIO 1: BAIXA CARGA")
-        self.print_e_salvar(f"Usuarios Virtuais: {cfg['usuarios']} | Requisicoes: {cfg['requisicoes']}")
-        self.print_e_salvar("="*60)
-        
-        self.print_e_salvar(f"\n[NGINX vs APACHE] Endpoint: {cfg['endpoint']}")
-        nome_teste = "Cenario1_BaixaCarga"
-        self.teste_concorrente('nginx', cfg['endpoint'], cfg['requisicoes'], cfg['usuarios'], nome_teste, execucao)
-        self.teste_concorrente('apache', cfg['endpoint'], cfg['requisicoes'], cfg['usuarios'], nome_teste, execucao)
-    
-    def cenario_media_carga(self, execucao=None):
-        #Cenario 2: Media Carga
-        cfg = self.CENARIO_2_MEDIA_CARGA
-        self.print_e_salvar("\n" + "="*60)
-        self.print_e_salvar("CENARIO 2: MEDIA CARGA")
-        self.print_e_salvar(f"Usuarios Virtuais: {cfg['usuarios']} | Requisicoes: {cfg['requisicoes']}")
-        self.print_e_salvar("="*60)
-        
-        self.print_e_salvar(f"\n[NGINX vs APACHE] Endpoint: {cfg['endpoint']}")
-        nome_teste = "Cenario2_MediaCarga"
-        self.teste_concorrente('nginx', cfg['endpoint'], cfg['requisicoes'], cfg['usuarios'], nome_teste, execucao)
-        self.teste_concorrente('apache', cfg['endpoint'], cfg['requisicoes'], cfg['usuarios'], nome_teste, execucao)
-    
-    def cenario_alta_carga(self, execucao=None):
-        #Cenario 3: Alta Carga
-        cfg = self.CENARIO_3_ALTA_CARGA
+    def executar_cenario(self, cenario, execucao=None):
+        #Executa um cenario expandido do arquivo de cenarios em cada um dos seus servidores
+        #Campos ausentes (None) usam o modo padrao do testador (linha de comando)
         self.print_e_salvar("\n" + "="*60)
-        self.print_e_salvar("CENARIO 3: ALTA CARGA")
-        self.print_e_salvar(f"Usuarios Virtuais: {cfg['usuarios']} | Requisicoes: {cfg['requisicoes']}")
+        self.print_e_salvar(cenario['titulo'])
+        self.print_e_salvar(f"Usuarios Virtuais: {cenario['usuarios']} | Requisicoes: {cenario['requisicoes']}")
         self.print_e_salvar("="*60)
         
-        self.print_e_salvar(f"\n[NGINX vs APACHE] Endpoint: {cfg['endpoint']}")
-        nome_teste = "Cenario3_AltaCarga"
-        self.teste_concorrente('nginx', cfg['endpoint'], cfg['requisicoes'], cfg['usuarios'], nome_teste, execucao)
-        self.teste_concorrente('apache', cfg['endpoint'], cfg['requisicoes'], cfg['usuarios'], nome_teste, execucao)
-    
-    def cenario_arquivo_pequeno(self, execucao=None):
-        #Cenarios 4-6: Arquivos Pequenos (1KB, 10KB, 50KB)
-        for num, cfg_name in [(4, 'CENARIO_4_ARQUIVO_1KB'), 
-                               (5, 'CENARIO_5_ARQUIVO_10KB'), 
-                               (6, 'CENARIO_6_ARQUIVO_50KB')]:
-            cfg = getattr(self, cfg_name)
-            self.print_e_salvar("\n" + "="*60)
-            self.print_e_salvar(f"CENARIO {num}: ARQUIVO PEQUENO ({cfg['tamanho']})")
-            self.print_e_salvar(f"Usuarios Virtuais: {cfg['usuarios']} | Requisicoes: {cfg['requisicoes']}")
-            self.print_e_salvar("="*60)
-            
-            self.print_e_salvar(f"\n[NGINX vs APACHE] Arquivo: {cfg['arquivo']}")
-            caminho = f"/estatico/{cfg['arquivo']}"
-            nome_teste = f"Cenario{num}_ArquivoPequeno"
-            self.teste_concorrente('nginx', caminho, cfg['requisicoes'], cfg['usuarios'], nome_teste, execucao)
-            self.teste_concorrente('apache', caminho, cfg['requisicoes'], cfg['usuarios'], nome_teste, execucao)
-    
-    def cenario_arquivo_medio(self, execucao=None):
-        #Cenarios 7-9: Arquivos Medios (100KB, 500KB, 700KB)
-        for num, cfg_name in [(7, 'CENARIO_7_ARQUIVO_100KB'), 
-                               (8, 'CENARIO_8_ARQUIVO_500KB'), 
-                               (9, 'CENARIO_9_ARQUIVO_700KB')]:
-            cfg = getattr(self, cfg_name)
-            self.print_e_salvar("\n" + "="*60)
-            self.print_e_salvar(f"CENARIO {num}: ARQUIVO MEDIO ({cfg['tamanho']})")
-            self.print_e_salvar(f"Usuarios Virtuais: {cfg['usuarios']} | Requisicoes: {cfg['requisicoes']}")
-            self.print_e_salvar("="*60)
-            
-            self.print_e_salvar(f"\n[NGINX vs APACHE] Arquivo: {cfg['arquivo']}")
-            caminho = f"/estatico/{cfg['arquivo']}"
-            nome_teste = f"Cenario{num}_ArquivoMedio"
-            self.teste_concorrente('nginx', caminho, cfg['requisicoes'], cfg['usuarios'], nome_teste, execucao)
-            self.teste_concorrente('apache', caminho, cfg['requisicoes'], cfg['usuarios'], nome_teste, execucao)
-    
-    def cenario_arquivo_grande(self, execucao=None):
-        #Cenarios 10-12: Arquivos Grandes (1MB, 5MB, 7MB)
-        for num, cfg_name in [(10, 'CENARIO_10_ARQUIVO_1MB'), 
-                               (11, 'CENARIO_11_ARQUIVO_5MB'), 
-                               (12, 'CENARIO_12_ARQUIVO_7MB')]:
-            cfg = getattr(self, cfg_name)
-            self.print_e_salvar("\n" + "="*60)
-            self.print_e_salvar(f"CENARIO {num}: ARQUIVO GRANDE ({cfg['tamanho']})")
-            self.print_e_salvar(f"Usuarios Virtuais: {cfg['usuarios']} | Requisicoes: {cfg['requisicoes']}")
-            self.print_e_salvar("="*60)
-            
-            self.print_e_salvar(f"\n[NGINX vs APACHE] Arquivo: {cfg['arquivo']}")
-            caminho = f"/estatico/{cfg['arquivo']}"
-            nome_teste = f"Cenario{num}_ArquivoGrande"
-            self.teste_concorrente('nginx', caminho, cfg['requisicoes'], cfg['usuarios'], nome_teste, execucao)
-            self.teste_concorrente('apache', caminho, cfg['requisicoes'], cfg['usuarios'], nome_teste, execucao)
-    
-    def executar_testes(self):
-        #Executa todos os cenarios de teste
-        self.print_e_salvar("="*60)
-        self.print_e_salvar("INICIO DOS TESTES DE CARGA")
-        self.print_e_salvar(f"Data/Hora: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
-        self.print_e_salvar("="*60)
-        
-        #Executar todos os cenarios (agora 12 no total)
-        self.cenario_baixa_carga()      #Cenario 1
-        self.cenario_media_carga()      #Cenario 2
-        self.cenario_alta_carga()       #Cenario 3
-        self.cenario_arquivo_pequeno()  #Cenarios 4-6
-        self.cenario_arquivo_medio()    #Cenarios 7-9
-        self.cenario_arquivo_grande()   #Cenarios 10-12
-        
-        self.print_e_salvar("\n" + "="*60)
-        self.print_e_salvar("TESTES CONCLUIDOS!")
-        self.print_e_salvar(f"Resultados salvos em:")
-        self.print_e_salvar(f"  - {self.arquivo_txt}")
-        self.print_e_salvar(f"  - {self.arquivo_csv}")
-        self.print_e_salvar("="*60)
-    
+        confronto = ' vs '.join(servidor.upper() for servidor in cenario['servidores'])
+        if cenario['mistura']:
+            caminho = MisturaCaminhos(cenario['mistura'])
+            self.print_e_salvar(f"\n[{confronto}] Carga mista: {caminho.descrever()}")
+        else:
+            caminho = cenario['endpoint']
+            self.print_e_salvar(f"\n[{confronto}] Endpoint: {caminho}")
+        for servidor in cenario['servidores']:
+            self.teste_concorrente(servidor, caminho, cenario['requisicoes'], cenario['usuarios'],
+                                   cenario['nome'], execucao, manter_conexao=cenario['keep_alive'],
+                                   motor=cenario['motor'], num_processos=cenario['processos'],
+                                   profundidade_pipeline=cenario['pipeline'], taxa_alvo=cenario['taxa'],
+                                   chegadas=cenario['chegadas'])
+
+    def medir_nivel_saturacao(self, servidor, caminho, nome_teste, variavel, carga):
+        #Um nivel da busca: `carga` e a taxa em req/s (malha aberta) ou o numero de usuarios (malha fechada)
+        cfg = self.SATURACAO
+        if variavel == 'taxa':
+            resultado = self.teste_concorrente(servidor, caminho, max(1, int(carga * cfg['duracao'])),
+                                               cfg['usuarios_malha_aberta'], nome_teste,
+                                               profundidade_pipeline=1, taxa_alvo=carga)
+            #Em malha aberta o SLO vale para a latencia corrigida (desde o instante planejado)
+            histograma = resultado['histograma_corrigido']
+        else:
+            #taxa_alvo=0 forca malha fechada mesmo com --taxa
+            resultado = self.teste_concorrente(servidor, caminho, carga * cfg['requisicoes_por_usuario'], carga,
+                                               nome_teste, taxa_alvo=0)
+            histograma = resultado['histograma']
+
+        tempo_total = resultado['tempo_total']
+        return {
+            'carga': carga,
+            'vazao': resultado['sucessos'] / tempo_total if tempo_total > 0 else 0,
+            'p99_ms': histograma.percentil(99) / 1000 if resultado['sucessos'] else float('inf'),
+            'taxa_erro': resultado['taxa_erro'] if resultado['total'] else 100.0,
+            'gerador_limitado': resultado['gerador']['limitado']
+        }
+
+    def buscar_saturacao(self, servidor, caminho, nome_teste, variavel='taxa', slo_p99_ms=None, slo_taxa_erro=None):
+        #Sobe a carga ate o SLO (P99 <= slo_p99_ms e erros <= slo_taxa_erro %) ser violado e retorna:
+        #  - a maior carga aprovada e a maior vazao sustentavel (req/s com sucesso dentro do SLO)
+        #  - o joelho: ultimo nivel antes da vazao deixar de acompanhar a carga oferecida
+        #    ou do P99 disparar em relacao ao primeiro degrau
+        #Argumentos:
+        #    variavel: 'taxa' (req/s em malha aberta) ou 'usuarios' (concorrencia em malha fechada)
+        #    slo_p99_ms / slo_taxa_erro: None usa os valores de SATURACAO
+        cfg = self.SATURACAO
+        if variavel not in self.VARIAVEIS_SATURACAO:
+            raise ValueError(f"Variavel de saturacao invalida: {variavel}")
+        if slo_p99_ms is None:
+            slo_p99_ms = cfg['slo_p99_ms']
+        if slo_taxa_erro is None:
+            slo_taxa_erro = cfg['slo_taxa_erro']
+        unidade = 'req/s' if variavel == 'taxa' else 'usuarios'
+        medicoes = {}
+
+        def medir(carga):
+            if carga not in medicoes:
+                self.print_e_salvar(f"\n  [SATURACAO] {servidor.upper()} {caminho}: {carga} {unidade}")
+                nivel = self.medir_nivel_saturacao(servidor, caminho, nome_teste, variavel, carga)
+                nivel['aprovado'] = nivel['p99_ms'] <= slo_p99_ms and nivel['taxa_erro'] <= slo_taxa_erro
+                medicoes[carga] = nivel
+                situacao = "dentro do SLO" if nivel['aprovado'] else "SLO violado"
+                if nivel['gerador_limitado']:
+                    situacao += " (gerador no limite)"
+                self.print_e_salvar(f"  -> P99 {nivel['p99_ms']:.2f}ms | Erros {nivel['taxa_erro']:.2f}% | "
+                                    f"Vazao {nivel['vazao']:.2f} req/s | {situacao}")
+            return medicoes[carga]
+
+        #Degraus geometricos ate a primeira violacao
+        carga = cfg['taxa_inicial'] if variavel == 'taxa' else cfg['usuarios_iniciais']
+        aprovada = reprovada = None
+        for _ in range(cfg['max_degraus']):
+            if not medir(carga)['aprovado']:
+                reprovada = carga
+                break
+            aprovada = carga
+            carga = carga * cfg['fator'] if variavel == 'taxa' else int(carga * cfg['fator'])
+
+        #Busca binaria entre o ultimo degrau aprovado e o primeiro reprovado
+        if aprovada is not None and reprovada is not None:
+            for _ in range(cfg['refinamentos']):
+                meio = round((aprovada + reprovada) / 2, 1) if variavel == 'taxa' else (aprovada + reprovada) // 2
+                if meio in (aprovada, reprovada):
+                    break
+                if medir(meio)['aprovado']:
+                    aprovada = meio
+                else:
+                    reprovada = meio
+
+        niveis = [medicoes[carga] for carga in sorted(medicoes)]
+        base = niveis[0]
+        joelho = None
+        for anterior, nivel in zip([None] + niveis, niveis):
+            #Em malha fechada, a carga oferecida e a vazao por usuario do primeiro degrau extrapolada
+            if variavel == 'taxa':
+                oferecida = nivel['carga']
+            else:
+                oferecida = nivel['carga'] * base['vazao'] / base['carga']
+            limite_p99 = max(cfg['fator_latencia'] * base['p99_ms'], cfg['p99_minimo_joelho_ms'])
+            if nivel['vazao'] < cfg['queda_vazao'] * oferecida or nivel['p99_ms'] > limite_p99:
+                joelho = anterior
+                break
+
+        aprovados = [nivel for nivel in niveis if nivel['aprovado']]
+        maximo = medicoes[aprovada] if aprovada is not None else None
+        sustentavel = max((nivel['vazao'] for nivel in aprovados), default=None)
+
+        self.print_e_salvar(f"\n  Saturacao {servidor.upper()} {caminho}:")
+        if maximo is None:
+            self.print_e_salvar(f"    Nenhum nivel dentro do SLO (ja violado com {base['carga']} {unidade})")
+        else:
+            self.print_e_salvar(f"    Maior carga dentro do SLO: {aprovada} {unidade} "
+                                f"(P99 {maximo['p99_ms']:.2f}ms)")
+            self.print_e_salvar(f"    Vazao maxima sustentavel: {sustentavel:.2f} req/s")
+            if reprovada is None:
+                self.print_e_salvar(f"    SLO nao violado ate o ultimo degrau: o limite real esta acima")
+        if joelho is not None:
+            self.print_e_salvar(f"    Joelho: {joelho['carga']} {unidade} ({joelho['vazao']:.2f} req/s, "
+                                f"P99 {joelho['p99_ms']:.2f}ms)")
+        else:
+            self.print_e_salvar(f"    Joelho: nao identificado nos niveis medidos")
+        limitados = [nivel['carga'] for nivel in niveis if nivel['gerador_limitado']]
+        if reprovada is not None and medicoes[reprovada]['gerador_limitado']:
+            self.print_e_salvar(f"    [AVISO] O gerador estava no limite em {reprovada} {unidade}: a saturacao "
+                                f"medida pode ser do cliente (use --processos ou --motor asyncio)")
+
+        #Linha com colunas fixas (vazio quando nao se aplica) para o CSV de saturacao
+        return {
+            'timestamp': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+            'teste': nome_teste,
+            'servidor': servidor,
+            'caminho': caminho,
+            'variavel': variavel,
+            'slo_p99_ms': slo_p99_ms,
+            'slo_taxa_erro_pct': slo_taxa_erro,
+            'niveis_medidos': len(niveis),
+            'carga_maxima_aprovada': aprovada if aprovada is not None else '',
+            'primeira_carga_reprovada': reprovada if reprovada is not None else '',
+            'saturou': 'sim' if reprovada is not None else 'nao',
+            'vazao_sustentavel_rps': round(sustentavel, 2) if sustentavel is not None else '',
+            'p99_carga_maxima_ms': round(maximo['p99_ms'], 2) if maximo is not None else '',
+            'joelho_carga': joelho['carga'] if joelho is not None else '',
+            'joelho_vazao_rps': round(joelho['vazao'], 2) if joelho is not None else '',
+            'joelho_p99_ms': round(joelho['p99_ms'], 2) if joelho is not None else '',
+            #Niveis em que o gerador, e nao o servidor, chegou ao limite
+            'niveis_gerador_limitado': ';'.join(str(carga) for carga in limitados),
+            #carga:vazao:p99:erro de cada nivel, em ordem crescente de carga
+            'niveis': ';'.join(f"{nivel['carga']}:{nivel['vazao']:.2f}:{nivel['p99_ms']:.2f}:{nivel['taxa_erro']:.2f}"
+                               for nivel in niveis)
+        }
+
     def executar_testes(self, execucao=None):
-        #Executa todos os 15 cenarios de teste uma vez
-        #Executar TODOS os 12 cenarios
-        self.cenario_baixa_carga(execucao)      #Cenario 1
-        self.cenario_media_carga(execucao)      #Cenario 2
-        self.cenario_alta_carga(execucao)       #Cenario 3
-        self.cenario_arquivo_pequeno(execucao)  #Cenarios 4-6 (1KB, 10KB, 50KB)
-        self.cenario_arquivo_medio(execucao)    #Cenarios 7-9 (100KB, 500KB, 700KB)
-        self.cenario_arquivo_grande(execucao)   #Cenarios 10-12 (1MB, 5MB, 7MB)
+        #Executa todos os cenarios do arquivo de cenarios uma vez
+        for cenario in self.cenarios:
+            self.executar_cenario(cenario, execucao)
     
     def executar_todos_testes(self):
-        #Executa todos os 15 cenarios de teste multiplas vezes
+        #Executa todos os cenarios do arquivo de cenarios multiplas vezes
         self.print_e_salvar("="*70)
         self.print_e_salvar("TESTADOR DE CARGA - NGINX vs APACHE")
         self.print_e_salvar("Trabalho de Redes II - 2025.2")
         self.print_e_salvar("="*70)
         self.print_e_salvar(f"\nID Personalizado: {self.id_customizado}")
-        self.print_e_salvar(f"Numero de execucoes completas: {self.NUM_EXECUCOES}")
-        self.print_e_salvar(f"Cenarios por execucao: 12 (total de {self.NUM_EXECUCOES * 12} testes)")
+        self.print_e_salvar(f"Arquivo de cenarios: {self.arquivo_cenarios}")
+        self.print_e_salvar(f"Numero de execucoes completas: {self.execucoes}")
+        testes_por_execucao = sum(len(cenario['servidores']) for cenario in self.cenarios)
+        self.print_e_salvar(f"Cenarios por execucao: {len(self.cenarios)} "
+                            f"(total de {self.execucoes * testes_por_execucao} testes)")
         
         tempo_inicio_total = time.time()
         
         #Loop principal: executar todas as execucoes
-        for execucao in range(1, self.NUM_EXECUCOES + 1):
+        for execucao in range(1, self.execucoes + 1):
             self.print_e_salvar("\n" + "="*80)
-            self.print_e_salvar(f"EXECUCAO {execucao}/{self.NUM_EXECUCOES} - RODADA COMPLETA DE TESTES")
+            self.print_e_salvar(f"EXECUCAO {execucao}/{self.execucoes} - RODADA COMPLETA DE TESTES")
             self.print_e_salvar("="*80)
             
             tempo_inicio_execucao = time.time()
             
-            #Executar TODOS os 12 cenarios nesta execucao
-            self.executar_testes()
+            #Executar todos os cenarios nesta execucao
+            self.executar_testes(execucao)
             
             tempo_execucao = time.time() - tempo_inicio_execucao
             self.print_e_salvar(f"\nEXECUCAO {execucao} CONCLUIDA em {tempo_execucao/60:.2f} minutos")
@@ -540,18 +1421,65 @@ class TestadorCarga:
         self.print_e_salvar("="*70)
         self.print_e_salvar(f"Tempo total de execucao: {tempo_total/60:.2f} minutos")
         
-        #Exportar CSV
-        print(f"\nExportando dados para CSV...")
-        try:
-            with open(self.arquivo_csv, 'w', newline='') as f:
-                if self.dados_csv:
-                    campos = self.dados_csv[0].keys()
-                    writer = csv.DictWriter(f, fieldnames=campos)
-                    writer.writeheader()
-                    writer.writerows(self.dados_csv)
-                    print(Cores.sucesso(f"CSV salvo: {self.arquivo_csv}"))
-        except Exception as e:
-            print(Cores.erro(f"Erro ao salvar CSV: {e}"))
+        self.coletar_prometheus()
+        self.fechar_arquivos()
+    
+    def executar_reproducao_log(self, arquivo_log, velocidade=1.0, servidores=None, usuarios=100, limite=None):
+        #Reenvia um log de acesso a cada servidor, com o intervalo original entre as requisicoes
+        #dividido por `velocidade`; uma linha de resultado por servidor
+        servidores = servidores or list(self.servidores)
+        reproducao = ReproducaoLog(arquivo_log, velocidade, limite)
+        nome_teste = f"Reproducao_{os.path.splitext(os.path.basename(arquivo_log))[0]}"
+        
+        self.print_e_salvar("="*70)
+        self.print_e_salvar("REPRODUCAO DE LOG DE ACESSO - NGINX vs APACHE")
+        self.print_e_salvar("="*70)
+        self.print_e_salvar(f"\nID Personalizado: {self.id_customizado}")
+        self.print_e_salvar(f"Log: {arquivo_log} | Velocidade: {velocidade:g}x | Usuarios: {usuarios}"
+                            f"{f' | Limite: {limite} requisicoes' if limite else ''}")
+        
+        tempo_inicio = time.time()
+        for execucao in range(1, self.execucoes + 1):
+            for servidor in servidores:
+                self.teste_concorrente(servidor, reproducao, None, usuarios, nome_teste, execucao)
+        self.print_e_salvar(f"\nTempo total de execucao: {(time.time() - tempo_inicio)/60:.2f} minutos")
+        
+        self.coletar_prometheus()
+        self.fechar_arquivos()
+    
+    def coletar_prometheus(self):
+        #Series do Prometheus de cada teste, gravadas em resultados/prometheus.<formato>
+        coletor = self.coletor_prometheus
+        if coletor is None or not coletor.janelas:
+            return
+        print(f"\nColetando series do Prometheus ({coletor.url}) para {len(coletor.janelas)} testes...")
+        coletor.aguardar_ultima_raspagem()
+        linhas = coletor.coletar()
+        coletor.fechar()
+        gravador = abrir_gravador(os.path.join(self.dir_resultados, 'prometheus'), self.formato)
+        for linha in linhas:
+            gravador.escrever(linha)
+        gravador.fechar()
+        falhas = sum(1 for linha in linhas if linha['erro'])
+        print(Cores.sucesso(f"Series do Prometheus salvas: {gravador.arquivo} "
+                            f"({coletor.consultas_feitas} consultas query_range)"))
+        if falhas:
+            print(Cores.aviso(f"{falhas} testes com falha na consulta ao Prometheus (coluna 'erro')"))
+    
+    def fechar_arquivos(self):
+        #As linhas ja estao em disco; aqui so os arquivos sao fechados
+        self.gravador.fechar()
+        print(Cores.sucesso(f"{self.formato.upper()} salvo: {self.arquivo_resultados} ({self.gravador.linhas} linhas)"))
+        if self.amostras is not None:
+            self.amostras.fechar()
+            print(Cores.sucesso(f"Amostras salvas: {self.amostras.arquivo}"))
+        if self.metricas is not None:
+            self.metricas.parar()
+        for processo in self.processos_locais:
+            processo.terminate()
+        for referencia in self.referencias.values():
+            if referencia is not None:
+                referencia.fechar()
         
         #Fechar arquivo TXT
         if hasattr(self, 'txt_file') and self.txt_file:
@@ -559,11 +1487,173 @@ class TestadorCarga:
             print(Cores.sucesso(f"TXT salvo: {self.arquivo_txt}"))
         
         print()  #Linha final no terminal
+    
+    def executar_busca_saturacao(self, variavel='taxa', slo_p99_ms=None, slo_taxa_erro=None):
+        #Busca de saturacao em cada endpoint distinto do arquivo de cenarios, nos servidores de cada cenario
+        cfg = self.SATURACAO
+        slo_p99_ms = cfg['slo_p99_ms'] if slo_p99_ms is None else slo_p99_ms
+        slo_taxa_erro = cfg['slo_taxa_erro'] if slo_taxa_erro is None else slo_taxa_erro
+        unidade = 'req/s' if variavel == 'taxa' else 'usuarios'
+        
+        self.print_e_salvar("="*70)
+        self.print_e_salvar("BUSCA DE SATURACAO - NGINX vs APACHE")
+        self.print_e_salvar("="*70)
+        self.print_e_salvar(f"\nID Personalizado: {self.id_customizado}")
+        self.print_e_salvar(f"Variavel: {variavel} ({'malha aberta' if variavel == 'taxa' else 'malha fechada'})")
+        self.print_e_salvar(f"SLO: P99 <= {slo_p99_ms}ms e erros <= {slo_taxa_erro}%")
+        
+        alvos = {}
+        for cenario in self.cenarios:
+            #Cenarios de carga mista nao tem um endpoint unico para saturar
+            if cenario['mistura']:
+                continue
+            nome_teste, servidores = alvos.setdefault(cenario['endpoint'], (f"Saturacao_{cenario['nome']}", []))
+            servidores += [servidor for servidor in cenario['servidores'] if servidor not in servidores]
+        
+        #Niveis individuais vao para o arquivo principal e o resumo por servidor/caminho para um proprio
+        gravador_saturacao = abrir_gravador(os.path.join(self.dir_resultados, 'saturacao'), self.formato)
+        
+        tempo_inicio = time.time()
+        resumo = []
+        for caminho, (nome_teste, servidores) in alvos.items():
+            self.print_e_salvar("\n" + "="*60)
+            self.print_e_salvar(f"{nome_teste.upper()}: {caminho}")
+            self.print_e_salvar("="*60)
+            for servidor in servidores:
+                linha = self.buscar_saturacao(servidor, caminho, nome_teste, variavel, slo_p99_ms, slo_taxa_erro)
+                gravador_saturacao.escrever(linha)
+                resumo.append(linha)
+        
+        self.print_e_salvar("\n" + "="*70)
+        self.print_e_salvar("RESUMO DA SATURACAO")
+        self.print_e_salvar("="*70)
+        self.print_e_salvar(f"{'Caminho':<28} {'Servidor':<8} {'Carga max (' + unidade + ')':>22} "
+                            f"{'Vazao (req/s)':>14} {'Joelho':>10}")
+        for linha in resumo:
+            self.print_e_salvar(f"{linha['caminho']:<28} {linha['servidor']:<8} "
+                                f"{str(linha['carga_maxima_aprovada'] or '-'):>22} "
+                                f"{str(linha['vazao_sustentavel_rps'] or '-'):>14} "
+                                f"{str(linha['joelho_carga'] or '-'):>10}")
+        self.print_e_salvar(f"\nTempo total de execucao: {(time.time() - tempo_inicio)/60:.2f} minutos")
+        
+        gravador_saturacao.fechar()
+        print(Cores.sucesso(f"Resumo da saturacao salvo: {gravador_saturacao.arquivo}"))
+        self.coletar_prometheus()
+        self.fechar_arquivos()
 
 
 def principal():
-    testador = TestadorCarga()
-    testador.executar_todos_testes()
+    parser = argparse.ArgumentParser(description='Testes de carga Nginx vs Apache')
+    parser.add_argument('--keep-alive', action='store_true',
+                        help='Reutiliza conexoes persistentes em vez de uma conexao por requisicao')
+    parser.add_argument('--motor', choices=TestadorCarga.MOTORES, default='threads',
+                        help='Motor de geracao de carga (padrao: threads)')
+    parser.add_argument('--processos', type=int, nargs='?', const=os.cpu_count(), default=1,
+                        help='Divide os usuarios virtuais entre N processos (sem valor: um por nucleo)')
+    parser.add_argument('--verificar-integridade', action='store_true',
+                        help='Compara o SHA-256 de cada arquivo estatico recebido com o arquivo de origem')
+    parser.add_argument('--pipeline', type=int, default=1, metavar='N',
+                        help='Envia N requisicoes seguidas por conexao antes de ler as respostas (implica keep-alive)')
+    parser.add_argument('--taxa', type=float, metavar='RPS',
+                        help='Malha aberta: envia a RPS requisicoes/s numa agenda fixa, com latencia corrigida')
+    parser.add_argument('--poisson', action='store_true',
+                        help='Com --taxa, usa chegadas de Poisson em vez de intervalos constantes')
+    parser.add_argument('--formato', choices=FORMATOS, default='csv',
+                        help='Formato dos arquivos de resultados, gravados linha a linha (padrao: csv)')
+    parser.add_argument('--amostras', nargs='?', const='', metavar='FORMATO',
+                        help=f"Grava tambem uma linha por requisicao em resultados/amostras.<formato> "
+                             f"({', '.join(FORMATOS_AMOSTRAS)}; sem valor: o mesmo de --formato)")
+    parser.add_argument('--metricas', type=int, nargs='?', const=PORTA_METRICAS, metavar='PORTA',
+                        help=f"Expoe /metrics (Prometheus) com latencia, em voo, RPS e erros do cliente "
+                             f"(sem valor: porta {PORTA_METRICAS})")
+    parser.add_argument('--cgroup', action='append', default=[], metavar='SERVIDOR=DIR',
+                        help='Diretorio do cgroup v2 de um servidor (repetivel); sem ele, o cgroup e '
+                             'descoberto pelo nome dos processos')
+    parser.add_argument('--raiz-cgroup', default=RAIZ_CGROUP, metavar='DIR',
+                        help=f"Raiz do cgroupfs do host (padrao: {RAIZ_CGROUP})")
+    parser.add_argument('--raiz-proc', default=RAIZ_PROC, metavar='DIR',
+                        help=f"Raiz do procfs com os processos dos servidores (padrao: {RAIZ_PROC})")
+    parser.add_argument('--intervalo-amostragem', type=float, default=INTERVALO_AMOSTRAGEM * 1000, metavar='MS',
+                        help=f"Intervalo entre amostras de CPU/memoria (padrao: {INTERVALO_AMOSTRAGEM * 1000:.0f}ms)")
+    parser.add_argument('--prometheus', default=URL_PROMETHEUS, metavar='URL',
+                        help=f"Prometheus consultado (query_range) sobre a janela de cada teste ao fim da "
+                             f"campanha (padrao: {URL_PROMETHEUS})")
+    parser.add_argument('--sem-prometheus', action='store_true',
+                        help='Nao consulta o Prometheus ao fim da campanha')
+    parser.add_argument('--cenarios', metavar='ARQUIVO',
+                        help='Arquivo de cenarios JSON ou TOML, com expansao por matriz '
+                             '(padrao: testes/cenarios/padrao.json)')
+    parser.add_argument('--execucoes', type=int, metavar='N',
+                        help='Numero de rodadas completas dos cenarios (padrao: o do arquivo de cenarios)')
+    parser.add_argument('--reproduzir', metavar='LOG',
+                        help='Reenvia um log de acesso (combined do Apache ou main do Nginx; .gz aceito) '
+                             'com o intervalo original entre as requisicoes, em vez dos cenarios')
+    parser.add_argument('--velocidade', type=float, default=1.0, metavar='FATOR',
+                        help='Com --reproduzir, divide os intervalos do log por FATOR (padrao: 1, tempo real)')
+    parser.add_argument('--usuarios', type=int, default=100, metavar='N',
+                        help='Com --reproduzir, maximo de requisicoes em voo (padrao: 100)')
+    parser.add_argument('--limite', type=int, metavar='N',
+                        help='Com --reproduzir, reenvia no maximo N requisicoes do log')
+    parser.add_argument('--servidor', action='append', choices=('nginx', 'apache'),
+                        help='Com --reproduzir, servidor alvo (repetivel; padrao: ambos)')
+    parser.add_argument('--local', nargs='?', const='', metavar='OPCOES',
+                        help='Testa servidores locais (testes/servidor_local.py) em vez dos conteineres; '
+                             'OPCOES: CHAVE=VALOR separados por virgula, ex.: latencia_ms=5,chunked=1,taxa_erro=0.01')
+    parser.add_argument('--saturacao', choices=TestadorCarga.VARIAVEIS_SATURACAO,
+                        help='Sobe a taxa (malha aberta) ou os usuarios ate violar o SLO, em vez dos cenarios fixos')
+    parser.add_argument('--slo-p99', type=float, metavar='MS',
+                        help=f"SLO de latencia P99 da busca de saturacao "
+                             f"(padrao: {TestadorCarga.SATURACAO['slo_p99_ms']}ms)")
+    parser.add_argument('--slo-erro', type=float, metavar='PCT',
+                        help=f"SLO de taxa de erro da busca de saturacao "
+                             f"(padrao: {TestadorCarga.SATURACAO['slo_taxa_erro']}%%)")
+    args = parser.parse_args()
+    if args.amostras and args.amostras not in FORMATOS_AMOSTRAS:
+        parser.error(f"formato de amostras invalido: {args.amostras} (use {', '.join(FORMATOS_AMOSTRAS)})")
+    amostras = (args.amostras or args.formato) if args.amostras is not None else None
+    cgroups = {}
+    for item in args.cgroup:
+        servidor, separador, diretorio = item.partition('=')
+        if not separador:
+            parser.error(f"--cgroup espera SERVIDOR=DIR, recebido: {item}")
+        cgroups[servidor] = diretorio
+    
+    if args.execucoes is not None and args.execucoes < 1:
+        parser.error("--execucoes deve ser positivo")
+    if args.reproduzir and args.saturacao:
+        parser.error("--reproduzir e --saturacao nao podem ser usados juntos")
+    if args.velocidade <= 0 or args.usuarios < 1 or (args.limite is not None and args.limite < 1):
+        parser.error("--velocidade, --usuarios e --limite devem ser positivos")
+    if args.reproduzir and not os.path.isfile(args.reproduzir):
+        parser.error(f"log de acesso nao encontrado: {args.reproduzir}")
+    try:
+        opcoes_locais = analisar_opcoes(args.local) if args.local is not None else None
+    except ValueError as e:
+        parser.error(str(e))
+    
+    try:
+        testador = TestadorCarga(manter_conexao=args.keep_alive, motor=args.motor, num_processos=args.processos,
+                                 verificar_integridade=args.verificar_integridade,
+                                 profundidade_pipeline=args.pipeline, taxa_alvo=args.taxa,
+                                 chegadas='poisson' if args.poisson else 'constante',
+                                 formato=args.formato, amostras=amostras, porta_metricas=args.metricas,
+                                 cgroups=cgroups, raiz_cgroup=args.raiz_cgroup, raiz_proc=args.raiz_proc,
+                                 intervalo_amostragem=args.intervalo_amostragem / 1000,
+                                 url_prometheus=None if args.sem_prometheus else args.prometheus,
+                                 arquivo_cenarios=args.cenarios, execucoes=args.execucoes,
+                                 servidor_local=opcoes_locais)
+    except (FileNotFoundError, ValueError) as e:
+        #Arquivo de cenarios ausente ou invalido (a mensagem indica o cenario e o campo)
+        parser.error(str(e))
+    if args.reproduzir:
+        #Sem --execucoes, o log e reproduzido uma vez
+        if args.execucoes is None:
+            testador.execucoes = 1
+        testador.executar_reproducao_log(args.reproduzir, args.velocidade, args.servidor, args.usuarios, args.limite)
+    elif args.saturacao:
+        testador.executar_busca_saturacao(args.saturacao, args.slo_p99, args.slo_erro)
+    else:
+        testador.executar_todos_testes()
 
 
 if __name__ == '__main__':